@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+from timing_counters import ABSENCE_GRACE_SECONDS
+
+
+def frame_signature(frame, size=(32, 24)):
+    """Tiny grayscale thumbnail used to detect scene changes between checks"""
+    if frame is None:
+        return None
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def signature_difference(a, b):
+    """Mean absolute pixel difference between two frame signatures (None if not comparable)"""
+    if a is None or b is None or a.shape != b.shape:
+        return None
+    return float(np.mean(np.abs(a - b)))
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) face boxes"""
+    if a is None or b is None:
+        return 0.0
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    intersection = height * width
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+class AdaptiveInterval:
+    """
+    Chooses the delay before the next presence check.
+
+    While the expected user keeps being recognized and passes liveness with
+    high confidence, the interval grows geometrically up to max_ms. A miss,
+    a spoof suspicion, a low-confidence verdict or a scene change drops it
+    straight back to min_ms so the situation is re-checked quickly.
+    Intervals always stay within [min_ms, max_ms].
+
+    Accounting error bound: timing_counters credits each interval to the
+    state seen at its end, so a skipped state change costs at most one
+    interval. max_ms is capped at ABSENCE_GRACE_SECONDS, hence any absence
+    long enough to count as missed time is still observed, and the
+    per-absence error stays below one grace period.
+    """
+
+    def __init__(self, base_ms=5000, min_ms=2000, max_ms=20000, growth=1.5,
+                 stable_checks=3, confidence_threshold=0.9, scene_change_threshold=12.0):
+        self.min_ms = min_ms
+        self.max_ms = min(max_ms, ABSENCE_GRACE_SECONDS * 1000)
+        self.base_ms = max(self.min_ms, min(base_ms, self.max_ms))
+        self.growth = growth
+        self.stable_checks = stable_checks
+        self.confidence_threshold = confidence_threshold
+        self.scene_change_threshold = scene_change_threshold
+
+        self.interval_ms = self.base_ms
+        self.stable_count = 0
+        self.miss_count = 0
+        self.last_signature = None
+
+    def reset(self):
+        self.interval_ms = self.base_ms
+        self.stable_count = 0
+        self.miss_count = 0
+        self.last_signature = None
+
+    def scene_changed(self, signature):
+        if signature is None:
+            return False
+        previous, self.last_signature = self.last_signature, signature
+        difference = signature_difference(previous, signature)
+        return difference is not None and difference > self.scene_change_threshold
+
+    def update(self, face_recognized, is_present, liveness_confidence=0.0, signature=None):
+        """
+        Feed the verdict of the check that just finished and return the
+        interval (ms) to wait before the next one.
+        """
+        changed = self.scene_changed(signature)
+
+        if not face_recognized or not is_present or changed:
+            # Miss, spoof suspicion or scene change - tighten up. A long run of
+            # misses (user away) relaxes back to the base interval.
+            self.stable_count = 0
+            self.miss_count += 1
+            self.interval_ms = self.min_ms if self.miss_count <= self.stable_checks else self.base_ms
+            return self.interval_ms
+
+        self.miss_count = 0
+        if liveness_confidence < self.confidence_threshold:
+            # Present but not convincingly live - hold at the base interval
+            self.stable_count = 0
+            self.interval_ms = min(self.interval_ms, self.base_ms)
+        else:
+            self.stable_count += 1
+            if self.stable_count >= self.stable_checks:
+                self.interval_ms = min(int(self.interval_ms * self.growth), self.max_ms)
+            else:
+                self.interval_ms = max(self.interval_ms, self.base_ms)
+
+        return self.interval_ms
@@ -59,12 +59,13 @@ class AntiSpoofHandler:
             import traceback
             traceback.print_exc()
 
-    def is_real_face(self, image):
+    def is_real_face(self, image, max_models=None):
         """
         Check if the face in the image is real (not spoofed)
 
         Args:
             image: OpenCV image (BGR format)
+            max_models: use only the first N models of the ensemble (None = all)
 
         Returns:
             tuple: (is_real: bool, confidence: float, error_msg: str or None)
@@ -94,8 +95,10 @@ class AntiSpoofHandler:
             prediction = np.zeros((1, 3))
             model_count = 0
 
-            # Process each model in the directory
-            model_files = [f for f in os.listdir(self.model_dir) if f.endswith('.pth')]
+            # Process each model in the directory (sorted, so a reduced ensemble is always the same models)
+            model_files = sorted(f for f in os.listdir(self.model_dir) if f.endswith('.pth'))
+            if max_models is not None:
+                model_files = model_files[:max_models]
 
             for model_name in model_files:
                 try:
@@ -160,12 +163,13 @@ class AntiSpoofHandler:
             # Return False for security - if there's an error, assume it's fake
             return False, 0.0, f"Error: {str(e)}"
 
-    def check_frame_authenticity(self, frame):
+    def check_frame_authenticity(self, frame, max_models=None):
         """
         Convenience method to check frame authenticity
 
         Args:
             frame: OpenCV frame
+            max_models: use only the first N models of the ensemble (None = all)
 
         Returns:
             dict: {
@@ -175,7 +179,7 @@ class AntiSpoofHandler:
                 'error': str or None
             }
         """
-        is_real, confidence, error = self.is_real_face(frame)
+        is_real, confidence, error = self.is_real_face(frame, max_models)
 
         if error and "disabled" not in error.lower():
             status = "error"
@@ -2,14 +2,24 @@ import json
 import os
 import tkinter as tk
 
+import timing_counters
 import util
 from LoginHandler import LoginHandler
 from LogoutHandler import LogoutHandler
 from RecognitionHandler import RecognitionHandler
+from RecognitionOrchestrator import RecognitionOrchestrator
 from RegistrationHandler import RegistrationHandler
 from TimerManager import TimerManager
 from WebcamManager import WebcamManager
 from AntiSpoofHandler import AntiSpoofHandler
+from AttendanceJournal import AttendanceJournal
+from EventJournal import EventJournal
+from FaceStore import open_face_store
+from GalleryCache import GalleryCache
+from AttendanceEngine import MultiUserMonitor
+from SpeculativeRecognizer import SpeculativeRecognizer
+from FrameQuality import BurstSelector
+from LoadGovernor import LoadGovernor
 
 class App:
     def __init__(self):
@@ -30,17 +40,39 @@ class App:
             with open(self.users_file_path, 'w') as f:
                 json.dump({}, f)
         self.log_path = './log.txt'
+        self.spoofing_log_path = 'spoofing_log.txt'
+        self.event_journal = EventJournal(self.log_path, self.spoofing_log_path)
+        self.event_journal.start()
         self.current_user = None
         self.logged_in_emp_ids = set()
 
-        # Load known faces - FIXED: properly pass all three parameters
-        known_encodings, known_names, multi_encodings_dict = util.load_known_faces(self.db_dir)
-        self.recognition_handler = RecognitionHandler(
-            self.db_dir,
-            known_encodings,
-            known_names,  # This was missing before
-            multi_encodings_dict
-        )
+        # Restore today's timers after a restart/crash, then persist every update
+        self.attendance_journal = AttendanceJournal()
+        self.attendance_journal.recover()
+        timing_counters.attach_journal(self.attendance_journal)
+        self.attendance_journal.start()
+
+        # FR_ATTENDANCE_DB=1 also writes daily rows to the PostgreSQL attendance table, batched
+        # in the background (DatabaseModel.AttendanceSync) so the UI never waits on the database
+        self.attendance_sync = None
+        if os.environ.get('FR_ATTENDANCE_DB', '0') == '1':
+            from DatabaseModel.AttendanceSync import AttendanceWriteBehind
+            self.attendance_sync = AttendanceWriteBehind()
+            self.attendance_sync.start()
+
+        # Registered faces live in a FaceStore: FR_FACE_STORE is 'filesystem' (default), 'sqlite'
+        # or 'postgres' (FR_DB_* settings), FR_FACE_STORE_LOCATION the face_db folder or sqlite file.
+        # The gallery itself is read from a memory-mapped cache that rebuilds when the store changes
+        store_kind = os.environ.get('FR_FACE_STORE', 'filesystem')
+        store_location = os.environ.get('FR_FACE_STORE_LOCATION',
+                                        'face_store.sqlite3' if store_kind == 'sqlite' else self.db_dir)
+        self.face_store = GalleryCache(open_face_store(store_kind, store_location))
+
+        # Load known faces into an immutable gallery snapshot
+        # FR_GALLERY_SHARDS=N spreads gallery search over N worker processes (multi-site galleries)
+        self.recognition_handler = RecognitionHandler(self.db_dir, store=self.face_store,
+                                                      shards=int(os.environ.get('FR_GALLERY_SHARDS', '0')))
+        print(f"Total users loaded: {len(self.recognition_handler.gallery)}")
 
         # Replace the threshold to be more strict
         self.anti_spoof_handler = AntiSpoofHandler(threshold=0.7)  # More strict threshold
@@ -50,14 +82,23 @@ class App:
 
         # Webcam manager
         self.webcam = WebcamManager()
+        # Picks the sharpest, best exposed of the last few frames for each recognition job
+        self.frame_selector = BurstSelector(self.webcam, self.recognition_handler)
+
+        # Degrades presence checks (detection scale, liveness reuse, single anti-spoof model)
+        # when their end-to-end latency exceeds FR_PRESENCE_SLO_MS, and restores them after
+        self.load_governor = LoadGovernor(slo_ms=int(os.environ.get('FR_PRESENCE_SLO_MS', '2000')))
+
+        # All recognition work (login/logout/presence) goes through the orchestrator
+        self.orchestrator = RecognitionOrchestrator(self, camera_id=self.webcam.camera_index)
 
         # UI Buttons
-        self.login_handler = LoginHandler(self, self.recognition_handler, self.log_path)
-        btn_login = util.get_button(self.main_window, 'Login', 'green', self.login_handler.login_threaded)
+        self.login_handler = LoginHandler(self, self.recognition_handler)
+        btn_login = util.get_button(self.main_window, 'Login', 'green', self.login_handler.login)
         btn_login.place(x=750, y=200)
 
-        self.logout_handler = LogoutHandler(self, self.recognition_handler, self.log_path)
-        btn_logout = util.get_button(self.main_window, 'Logout', 'red', self.logout_handler.logout_threaded)
+        self.logout_handler = LogoutHandler(self, self.recognition_handler)
+        btn_logout = util.get_button(self.main_window, 'Logout', 'red', self.logout_handler.logout)
         btn_logout.place(x=750, y=300)
 
         self.registration_handler = RegistrationHandler(self, self.recognition_handler)
@@ -69,6 +110,17 @@ class App:
         self.webcam_label = util.get_img_label(self.main_window)
         self.webcam_label.place(x=10, y=0, width=700, height=500)
         self.webcam.start(self.webcam_label)
+        self.orchestrator.start()
+
+        # Optional gallery compaction (pose prototypes per user, float16/int8 pose encodings)
+        pose_dtype = os.environ.get('FR_GALLERY_POSE_DTYPE')
+        max_prototypes = int(os.environ.get('FR_GALLERY_PROTOTYPES', '0')) or None
+        if pose_dtype or max_prototypes:
+            self.orchestrator.submit(
+                'maintenance',
+                lambda frame: self.recognition_handler.compact_gallery(pose_dtype, max_prototypes),
+                lambda report: None
+            )
 
         self.label_present_time = tk.Label(self.main_window, text="Present: 0s", font=("Helvetica", 12))
         self.label_present_time.place(x=750, y=30)
@@ -80,6 +132,18 @@ class App:
         # Timer manager
         self.timer_manager = TimerManager(self, self.recognition_handler, self.users_file_path)
 
+        # CCTV mode (FR_MULTI_USER_MODE=1): track everyone in view instead of a single logged-in user
+        self.multi_user_mode = os.environ.get('FR_MULTI_USER_MODE', '0') == '1'
+        self.multi_user_monitor = MultiUserMonitor(self, self.recognition_handler)
+        if self.multi_user_mode:
+            self.multi_user_monitor.start()
+
+        # Keep a rolling recognition of whoever is in view so Login can answer immediately
+        self.speculative_login = os.environ.get('FR_SPECULATIVE_LOGIN', '1') != '0'
+        self.speculative_recognizer = SpeculativeRecognizer(self, self.recognition_handler)
+        if self.speculative_login and not self.multi_user_mode:
+            self.speculative_recognizer.start()
+
         # Window close
         self.main_window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -94,8 +158,25 @@ class App:
             self.label_emp_id.destroy()
             del self.label_emp_id
 
+    def record_attendance(self, emp_id, status, **fields):
+        """Queue an update of today's attendance row (no-op unless FR_ATTENDANCE_DB=1)"""
+        # attendance.user_id is numeric; users registered without an employee ID are not synced
+        if self.attendance_sync is not None and str(emp_id).isdigit():
+            self.attendance_sync.submit(int(emp_id), status, **fields)
+
     def on_closing(self):
         self.timer_manager.stop()
+        self.multi_user_monitor.stop()
+        self.speculative_recognizer.stop()
+        self.orchestrator.stop()
+        print(f"Load governor: {self.load_governor.metrics()}")
+        self.registration_handler.executor.shutdown(wait=False)
+        self.registration_handler.chip_writer.stop()
+        self.recognition_handler.close()
+        if self.attendance_sync is not None:
+            self.attendance_sync.stop()
+        self.attendance_journal.stop()
+        self.event_journal.stop()
         self.webcam.stop()
         self.main_window.destroy()
 
@@ -0,0 +1,189 @@
+import time
+
+import numpy as np
+
+from timing_counters import ABSENCE_GRACE_SECONDS
+
+
+class AttendanceEngine:
+    """
+    Presence state for every tracked employee, kept in flat NumPy arrays
+    indexed by row (one row per employee) instead of one dict per user.
+
+    tick() takes the set of people recognized in the current frame and updates
+    all rows with a handful of vectorized operations, so its cost is dominated
+    by array length rather than Python-level work per employee.
+
+    The accounting rule is the one timing_counters.apply_observation uses:
+    an absence run that ends before reaching grace_seconds is given back as
+    present time; once a run reaches grace_seconds the whole run, including
+    its first grace_seconds, is added to missed time, and so is the rest of
+    the absence until the user is seen again.
+    """
+
+    def __init__(self, initial_capacity=64, grace_seconds=ABSENCE_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self.index = {}      # user_id -> row
+        self.user_ids = []   # row -> user_id
+        self.size = 0
+        self.last_tick = None
+
+        self.present_seconds = np.zeros(initial_capacity, dtype=np.float64)
+        self.absent_run = np.zeros(initial_capacity, dtype=np.float64)
+        self.missed_seconds = np.zeros(initial_capacity, dtype=np.float64)
+        self.last_seen = np.full(initial_capacity, np.nan, dtype=np.float64)
+        self.active = np.zeros(initial_capacity, dtype=bool)
+
+    def _grow(self):
+        capacity = len(self.active) * 2
+        for attr in ('present_seconds', 'absent_run', 'missed_seconds'):
+            old = getattr(self, attr)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, attr, new)
+        last_seen = np.full(capacity, np.nan, dtype=np.float64)
+        last_seen[:self.size] = self.last_seen[:self.size]
+        self.last_seen = last_seen
+        active = np.zeros(capacity, dtype=bool)
+        active[:self.size] = self.active[:self.size]
+        self.active = active
+
+    def track(self, user_id):
+        """Start tracking user_id (no-op if already tracked). Returns its row."""
+        row = self.index.get(user_id)
+        if row is None:
+            if self.size == len(self.active):
+                self._grow()
+            row = self.size
+            self.index[user_id] = row
+            self.user_ids.append(user_id)
+            self.size += 1
+        self.active[row] = True
+        return row
+
+    def untrack(self, user_id):
+        """Stop accruing time for user_id; its totals are kept."""
+        row = self.index.get(user_id)
+        if row is not None:
+            self.active[row] = False
+
+    def tick(self, present_ids, now=None):
+        """
+        Update every tracked employee for one observation.
+
+        Args:
+            present_ids: iterable of user ids recognized (and live) in this tick.
+                Unknown ids are tracked automatically.
+            now: observation timestamp, defaults to time.time()
+        """
+        if now is None:
+            now = time.time()
+
+        rows = [self.track(user_id) for user_id in present_ids]
+
+        if self.last_tick is None or now <= self.last_tick:
+            if self.last_tick is None:
+                self.last_tick = now
+            self.last_seen[rows] = now
+            return
+        dt = now - self.last_tick
+        self.last_tick = now
+
+        n = self.size
+        seen = np.zeros(n, dtype=bool)
+        seen[rows] = True
+        active = self.active[:n]
+        present = seen & active
+        absent = ~seen & active
+
+        run = self.absent_run[:n]
+        # Short absences are forgiven and credited as present time
+        forgiven = present & (run > 0) & (run < self.grace_seconds)
+        self.present_seconds[:n] += np.where(forgiven, run, 0.0) + np.where(present, dt, 0.0)
+        run[present] = 0.0
+
+        # Absences reaching the grace period become missed time, and so does
+        # the rest of the absence; the run stays open until the user is seen
+        confirmed = absent & (run >= self.grace_seconds)
+        run[absent] += dt
+        reached = absent & ~confirmed & (run >= self.grace_seconds)
+        self.missed_seconds[:n] += np.where(reached, run, 0.0) + np.where(confirmed, dt, 0.0)
+
+        self.last_seen[:n][present] = now
+
+    def get_user_timer_data(self, user_id):
+        """Same shape as timing_counters.get_user_timer_data"""
+        row = self.index.get(user_id)
+        if row is None:
+            return {'presentCounter': 0, 'absentCounter': 0, 'absentTimeCounter': 0}
+        return {
+            'presentCounter': int(self.present_seconds[row]),
+            'absentCounter': int(self.absent_run[row]),
+            'absentTimeCounter': int(self.missed_seconds[row]),
+        }
+
+    def currently_present(self, within_seconds=None):
+        """User ids seen within the grace period (or within_seconds) of the last tick"""
+        if self.last_tick is None:
+            return []
+        window = self.grace_seconds if within_seconds is None else within_seconds
+        n = self.size
+        recent = self.active[:n] & (self.last_tick - self.last_seen[:n] < window)
+        return [self.user_ids[row] for row in np.flatnonzero(recent)]
+
+
+class MultiUserMonitor:
+    """
+    CCTV mode: periodically recognizes every face in the frame and feeds the
+    result into an AttendanceEngine. Runs its work on the app orchestrator and
+    reschedules itself from the Tk thread, like TimerManager.
+    """
+
+    def __init__(self, app, recognition_handler, engine=None, interval_ms=5000):
+        self.app = app
+        self.recognition = recognition_handler
+        self.engine = engine or AttendanceEngine()
+        self.interval_ms = interval_ms
+        self.job_id = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        print("MultiUserMonitor started")
+        self._perform_update()
+
+    def stop(self):
+        self.running = False
+        if self.job_id:
+            self.app.main_window.after_cancel(self.job_id)
+            self.job_id = None
+        print("MultiUserMonitor stopped")
+
+    def _schedule_next(self):
+        if self.running:
+            self.job_id = self.app.main_window.after(self.interval_ms, self._perform_update)
+
+    def _perform_update(self):
+        self.job_id = None
+        if not self.running:
+            return
+        submitted_at = time.monotonic()
+        status = self.app.orchestrator.submit('multi_presence', self._recognize,
+                                              lambda result: self._apply(result, submitted_at),
+                                              on_error=lambda e: self._on_error(submitted_at))
+        if status != self.app.orchestrator.QUEUED:
+            self._schedule_next()
+
+    def _recognize(self, frame):
+        return time.time(), self.recognition.recognize_all_faces(frame, self.app.load_governor.detection_scale)
+
+    def _on_error(self, submitted_at):
+        self.app.load_governor.record((time.monotonic() - submitted_at) * 1000)
+        self._schedule_next()
+
+    def _apply(self, result, submitted_at):
+        self.app.load_governor.record((time.monotonic() - submitted_at) * 1000)
+        observed_at, names = result
+        if self.running:
+            self.engine.tick(names, now=observed_at)
+        self._schedule_next()
@@ -0,0 +1,217 @@
+import datetime
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import timing_counters
+
+# Record layout: crc32 | timestamp (f64) | is_present (u8) | len(user_id) (u16) | user_id (utf-8)
+CRC = struct.Struct('<I')
+RECORD = struct.Struct('<dBH')
+
+
+def encode_record(user_id, is_present, timestamp):
+    name = str(user_id).encode('utf-8')
+    body = RECORD.pack(timestamp, 1 if is_present else 0, len(name)) + name
+    return CRC.pack(zlib.crc32(body)) + body
+
+
+def decode_records(data):
+    """
+    Yield (end_offset, user_id, is_present, timestamp) for every complete,
+    intact record in data. Stops at the first torn or corrupt record.
+    """
+    pos = 0
+    header_size = CRC.size + RECORD.size
+    while pos + header_size <= len(data):
+        (crc,) = CRC.unpack_from(data, pos)
+        timestamp, is_present, name_len = RECORD.unpack_from(data, pos + CRC.size)
+        end = pos + header_size + name_len
+        if end > len(data):
+            break
+        body = data[pos + CRC.size:end]
+        if zlib.crc32(body) != crc:
+            break
+        user_id = body[RECORD.size:].decode('utf-8')
+        yield end, user_id, bool(is_present), timestamp
+        pos = end
+
+
+class AttendanceJournal:
+    """
+    Crash-safe persistence for timing_counters.userTimers.
+
+    Every applied attendance observation is appended to a per-day binary
+    journal (attendance_state/journal-YYYY-MM-DD.bin). Since accounting is
+    driven by observation timestamps, replaying the journal rebuilds the
+    exact same counters. Every snapshot_every records the writer pickles its
+    replica of the counters together with the journal offset they cover, so
+    recovery loads the snapshot and replays only the tail after it.
+
+    append() only enqueues; a background thread writes records and fsyncs
+    them in batches every flush_interval seconds, so nothing touches the
+    disk on the recognition path.
+    """
+
+    def __init__(self, state_dir='attendance_state', flush_interval=1.0, snapshot_every=500):
+        self.state_dir = state_dir
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.running = False
+
+        # Writer-side state, only touched by the writer thread after start()
+        self.day = None
+        self.file = None
+        self.offset = 0
+        self.state = {}
+        self.records_since_snapshot = 0
+
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def journal_path(self, day):
+        return os.path.join(self.state_dir, f'journal-{day}.bin')
+
+    def snapshot_path(self, day):
+        return os.path.join(self.state_dir, f'snapshot-{day}.p')
+
+    def recover(self, day=None):
+        """
+        Rebuild today's counters into timing_counters.userTimers.
+        Call before attaching the journal and before start().
+        Returns the number of journal records replayed.
+        """
+        day = day or datetime.date.today().isoformat()
+        state, offset = {}, 0
+
+        snapshot_path = self.snapshot_path(day)
+        if os.path.exists(snapshot_path):
+            try:
+                with open(snapshot_path, 'rb') as f:
+                    snapshot = pickle.load(f)
+                state, offset = snapshot['timers'], snapshot['offset']
+            except Exception as e:
+                print(f"Error loading attendance snapshot, replaying full journal: {e}")
+                state, offset = {}, 0
+
+        replayed = 0
+        journal_path = self.journal_path(day)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+            end = 0
+            for end, user_id, is_present, timestamp in decode_records(tail):
+                timing_counters.apply_observation(state, user_id, is_present, timestamp)
+                replayed += 1
+            offset += end
+            if end < len(tail):
+                # Torn write from a crash - drop the partial record so new appends stay readable
+                print(f"Truncating {len(tail) - end} bytes of incomplete journal data")
+                with open(journal_path, 'r+b') as f:
+                    f.truncate(offset)
+
+        timing_counters.set_current_day(day)
+        timing_counters.userTimers.clear()
+        timing_counters.userTimers.update({user: dict(timers) for user, timers in state.items()})
+
+        self.day = day
+        self.state = state
+        self.offset = offset
+        print(f"Recovered attendance for {len(state)} users ({replayed} journal records replayed)")
+        return replayed
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="attendance-journal", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Flush everything still queued, take a final snapshot and close"""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def append(self, user_id, is_present, timestamp):
+        self.queue.put((user_id, is_present, timestamp))
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.time() + self.flush_interval
+            while True:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                if batch:
+                    self._write_batch(batch)
+                if stopping and self.file is not None:
+                    self._snapshot()
+            except Exception as e:
+                print(f"Error writing attendance journal: {e}")
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open_day(self, day):
+        if self.file is not None:
+            self._sync()
+            self._snapshot()
+            self.file.close()
+        if day != self.day:
+            self.state = {}
+        self.day = day
+        self.file = open(self.journal_path(day), 'ab')
+        self.offset = self.file.tell()
+
+    def _write_batch(self, batch):
+        for user_id, is_present, timestamp in batch:
+            day = timing_counters.day_of(timestamp)
+            if self.file is None or day != self.day:
+                self._open_day(day)
+            record = encode_record(user_id, is_present, timestamp)
+            self.file.write(record)
+            self.offset += len(record)
+            timing_counters.apply_observation(self.state, user_id, is_present, timestamp)
+            self.records_since_snapshot += 1
+        self._sync()
+        if self.records_since_snapshot >= self.snapshot_every:
+            self._snapshot()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _snapshot(self):
+        path = self.snapshot_path(self.day)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'day': self.day, 'offset': self.offset, 'timers': self.state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.records_since_snapshot = 0
@@ -0,0 +1,274 @@
+import argparse
+import datetime
+import glob
+import gzip
+import json
+import os
+import re
+from collections import namedtuple
+
+from EventJournal import parse_event
+
+# end is None while the session is still open (no logout yet)
+Session = namedtuple('Session', 'name emp_id day start end')
+
+
+class LogIndex:
+    """
+    Sidecar byte-offset index (<log>.idx) for one attendance log.
+
+    For every day it stores the byte range holding that day's lines and the
+    users still logged in when the day started, so a query for one day reads
+    only that range. The index remembers how far it has scanned and only
+    parses newly appended lines on refresh(). Works for rotated .gz logs as
+    well; offsets then refer to the decompressed stream.
+
+    A session can span files (log.txt is rotated daily), so refresh() takes
+    the sessions still open at the end of the previous file as the state
+    at the start of this one; the index is rebuilt if that seed changes.
+
+    Rotated .gz archives never change, and seeking in one means
+    decompressing it, so once an archive has been indexed to the end its
+    size and mtime are recorded and later refreshes skip it unopened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.days = {}          # 'YYYY-MM-DD' -> {'start', 'end', 'open_at_start'}
+        self.indexed_size = 0
+        self.head = None        # first line, to notice the file being replaced
+        self.seed = {}          # sessions open when this file starts
+        self.open_sessions = {}  # name -> [emp_id, iso timestamp] at indexed_size
+        self.complete = None    # [size, mtime_ns] of a .gz archive indexed to the end
+        self._load()
+
+    def _open(self):
+        return gzip.open(self.path, 'rb') if self.path.endswith('.gz') else open(self.path, 'rb')
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            self.days = data['days']
+            self.indexed_size = data['indexed_size']
+            self.head = data['head']
+            self.seed = data.get('seed', {})
+            self.open_sessions = data['open_sessions']
+            self.complete = data.get('complete')
+        except Exception as e:
+            print(f"Ignoring unreadable index {self.index_path}: {e}")
+            self._reset()
+
+    def _save(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'days': self.days,
+                'indexed_size': self.indexed_size,
+                'head': self.head,
+                'seed': self.seed,
+                'open_sessions': self.open_sessions,
+                'complete': self.complete,
+            }, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _reset(self, seed=None):
+        self.days = {}
+        self.indexed_size = 0
+        self.head = None
+        self.seed = dict(seed or {})
+        self.open_sessions = dict(self.seed)
+        self.complete = None
+
+    def refresh(self, seed=None):
+        """
+        Index lines appended since the last refresh. seed: sessions open at the
+        start of the file (the previous file's open_sessions). Returns number of new lines.
+        """
+        seed = seed or {}
+        if seed != self.seed:
+            self._reset(seed)
+        if not os.path.exists(self.path):
+            return 0
+        archive = self.path.endswith('.gz')
+        if archive:
+            stat = os.stat(self.path)
+            if self.complete == [stat.st_size, stat.st_mtime_ns]:
+                return 0
+
+        with self._open() as f:
+            head = f.readline().decode('utf-8', 'replace')
+            if self.head is not None and head != self.head:
+                # Log was rotated or rewritten - start over
+                self._reset(seed)
+            self.head = head
+
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            count = 0
+            current_day = max(self.days) if self.days else None
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    # Partially written line, pick it up next time
+                    break
+                event = parse_event(raw.decode('utf-8', 'replace'))
+                line_start, offset = offset, offset + len(raw)
+                if event is None or not hasattr(event, 'direction'):
+                    continue
+                day = event.timestamp.date().isoformat()
+                if day != current_day:
+                    entry = self.days.get(day)
+                    if entry is None:
+                        entry = self.days[day] = {'start': line_start, 'end': offset,
+                                                  'open_at_start': dict(self.open_sessions)}
+                    current_day = day
+                self.days[day]['end'] = offset
+
+                if event.direction == 'in':
+                    self.open_sessions.setdefault(event.name, [event.emp_id, event.timestamp.isoformat()])
+                elif event.direction == 'out':
+                    self.open_sessions.pop(event.name, None)
+                count += 1
+
+        self.indexed_size = offset
+        if archive:
+            # Everything up to the end is indexed; a torn last line would not be finished later anyway
+            self.complete = [stat.st_size, stat.st_mtime_ns]
+        if count or archive or not os.path.exists(self.index_path):
+            self._save()
+        return count
+
+    def read_day(self, day):
+        """Returns (open_at_start, events) for one day using only that day's byte range"""
+        entry = self.days.get(day)
+        if entry is None:
+            return dict(self.open_sessions), []
+        with self._open() as f:
+            f.seek(entry['start'])
+            data = f.read(entry['end'] - entry['start'])
+        events = []
+        for line in data.decode('utf-8', 'replace').splitlines():
+            event = parse_event(line)
+            if event is not None and hasattr(event, 'direction') and event.timestamp.date().isoformat() == day:
+                events.append(event)
+        return entry['open_at_start'], events
+
+
+class AttendanceReport:
+    """
+    Per-user, per-day work sessions from the login/logout log (log.txt plus
+    its rotated log.*.txt.gz archives), served from LogIndex sidecars.
+    Files are read oldest first and each one starts with the sessions the
+    previous one left open, so sessions crossing a rotation are kept.
+    """
+
+    def __init__(self, log_path='./log.txt'):
+        self.log_path = log_path
+        base, ext = os.path.splitext(log_path)
+        archives = sorted(glob.glob(f"{base}.*{ext}.gz"), key=lambda path: archive_order(path, base, ext))
+        self.indexes = [LogIndex(path) for path in archives] + [LogIndex(log_path)]
+        self.refresh()
+
+    def refresh(self):
+        count, carry = 0, {}
+        for index in self.indexes:
+            count += index.refresh(carry)
+            carry = index.open_sessions
+        return count
+
+    def days(self):
+        return sorted({day for index in self.indexes for day in index.days})
+
+    def sessions(self, day, user=None):
+        """
+        Sessions on day (date or 'YYYY-MM-DD'), optionally for one user
+        (matched by name or emp_id). Sessions spanning midnight are split.
+        """
+        day = day.isoformat() if isinstance(day, datetime.date) else day
+        day_start = datetime.datetime.fromisoformat(day)
+        day_end = day_start + datetime.timedelta(days=1)
+        days = self.days()
+        is_last_day = day >= days[-1] if days else True
+
+        # A day may be split over several files (size rotation); read them in order
+        holding = [index for index in self.indexes if day in index.days]
+        if holding:
+            open_at_start, events = holding[0].read_day(day)
+            for index in holding[1:]:
+                events += index.read_day(day)[1]
+        else:
+            # No events that day: whoever was logged in stays logged in all day
+            open_at_start, events = self._open_at_start(day), []
+
+        result = []
+        open_sessions = {name: (emp_id, day_start) for name, (emp_id, _) in open_at_start.items()}
+        for event in events:
+            if event.direction == 'in':
+                open_sessions.setdefault(event.name, (event.emp_id, event.timestamp))
+            elif event.direction == 'out' and event.name in open_sessions:
+                emp_id, start = open_sessions.pop(event.name)
+                result.append(Session(event.name, emp_id, day, start, event.timestamp))
+        for name, (emp_id, start) in open_sessions.items():
+            result.append(Session(name, emp_id, day, start, None if is_last_day else day_end))
+
+        if user is not None:
+            user = str(user)
+            result = [s for s in result if s.name == user or str(s.emp_id) == user]
+        return sorted(result, key=lambda s: s.start)
+
+    def _open_at_start(self, day):
+        """Sessions open at the start of a day without events: the state at the next day that has some"""
+        for index in self.indexes:
+            later = [d for d in index.days if d > day]
+            if later:
+                return index.days[min(later)]['open_at_start']
+        return self.indexes[-1].open_sessions
+
+    def worked_seconds(self, day, user, now=None):
+        """Total logged-in time for user on day; an open session counts up to now"""
+        now = now or datetime.datetime.now()
+        total = 0.0
+        for session in self.sessions(day, user):
+            end = session.end or now
+            total += max(0.0, (end - session.start).total_seconds())
+        return total
+
+    def daily_totals(self, day, now=None):
+        """{name: seconds} for everyone with a session on day"""
+        now = now or datetime.datetime.now()
+        totals = {}
+        for session in self.sessions(day):
+            end = session.end or now
+            totals[session.name] = totals.get(session.name, 0.0) + max(0.0, (end - session.start).total_seconds())
+        return totals
+
+
+def archive_order(path, base, ext):
+    """Sort key for rotated logs named <base>.YYYY-MM-DD[.N]<ext>.gz: (date, N)"""
+    match = re.fullmatch(re.escape(base) + r'\.(\d{4}-\d{2}-\d{2})(?:\.(\d+))?' + re.escape(ext) + r'\.gz', path)
+    if match is None:
+        return '', 0, path
+    return match.group(1), int(match.group(2) or 0), path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Attendance report from the login/logout log")
+    parser.add_argument("--log", type=str, default="./log.txt", help="path to log.txt")
+    parser.add_argument("--day", type=str, required=True, help="YYYY-MM-DD")
+    parser.add_argument("--user", type=str, default=None, help="name or employee id")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = AttendanceReport(args.log)
+    if args.user:
+        for session in report.sessions(args.day, args.user):
+            print(f"{session.name} ({session.emp_id}): {session.start} -> {session.end or 'still in'}")
+        print(f"Worked: {report.worked_seconds(args.day, args.user):.0f}s")
+    else:
+        for name, seconds in sorted(report.daily_totals(args.day).items()):
+            print(f"{name}: {seconds:.0f}s")
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from datetime import date
+
+from DatabaseModel.MethodProvider import ATTENDANCE_FIELDS as FIELDS, upsert_attendance_batch
+
+# Default for submit() fields that should keep their current value (None clears a field)
+UNCHANGED = object()
+
+
+class AttendanceWriteBehind:
+    """
+    Write-behind queue in front of the attendance table.
+
+    submit() only updates an in-memory dict keyed by (user_id, date), so many
+    updates for the same person and day collapse into one row. A background
+    thread flushes the dict with one multi-row upsert every flush_interval
+    seconds, or sooner once batch_size keys are pending. Only the fields
+    that were submitted are written; the others keep their stored value.
+
+    If the database is unreachable the batch is appended to a local spill file
+    (JSON lines) instead of being lost. Each later flush first merges the spill
+    file back in, and the file is removed once that flush succeeds.
+    """
+
+    def __init__(self, spill_path='attendance_spill.jsonl', flush_interval=10.0, batch_size=200,
+                 upsert_batch=upsert_attendance_batch):
+        self.spill_path = spill_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.upsert_batch = upsert_batch
+
+        self.pending = {}  # (user_id, 'YYYY-MM-DD') -> {field: value} for the fields submitted
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="attendance-sync", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the flusher and push out (or spill) everything still pending"""
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=30)
+        self.flush()
+
+    def submit(self, user_id, status, time_in=UNCHANGED, time_out=UNCHANGED, worked_time=UNCHANGED,
+               absent_time=UNCHANGED, day=None):
+        """
+        Same arguments as MethodProvider.upsert_attendance. Fields left at
+        UNCHANGED keep their previous value; None clears the field.
+        """
+        day = (day or date.today()).isoformat()
+        update = {'status': status, 'time_in': time_in, 'time_out': time_out,
+                  'worked_time': worked_time, 'absent_time': absent_time}
+        with self.lock:
+            row = self.pending.setdefault((user_id, day), {})
+            _merge(row, update)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def _run(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write pending rows (plus any spilled rows) in one batch. Returns rows written."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+            spilled = self._read_spill()
+            if not batch and not spilled:
+                return 0
+
+            # Spilled rows are older, so pending updates win
+            for key, row in batch.items():
+                _merge(spilled.setdefault(key, {}), row)
+            merged = spilled
+
+            # One upsert per combination of submitted fields, so unsent columns are left alone
+            groups = {}
+            for (user_id, day), row in merged.items():
+                fields = tuple(field for field in FIELDS if field in row)
+                groups.setdefault(fields, []).append((user_id, day) + tuple(row[field] for field in fields))
+            try:
+                for fields, rows in groups.items():
+                    self.upsert_batch(rows, fields)
+            except Exception as e:
+                print(f"Attendance sync failed, spilling {len(merged)} rows to {self.spill_path}: {e}")
+                self._write_spill(merged)
+                return 0
+
+            if os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+            return len(merged)
+
+    def _read_spill(self):
+        merged = {}
+        if not os.path.exists(self.spill_path):
+            return merged
+        with open(self.spill_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line
+                key = (record['user_id'], record['date'])
+                _merge(merged.setdefault(key, {}), record['fields'])
+        return merged
+
+    def _write_spill(self, rows):
+        # Rewrite the whole file: rows already contain everything read from it
+        tmp_path = self.spill_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for (user_id, day), fields in rows.items():
+                f.write(json.dumps({'user_id': user_id, 'date': day, 'fields': fields}, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+
+
+def _merge(row, update):
+    for field in FIELDS:
+        value = update.get(field, UNCHANGED)
+        if value is not UNCHANGED:
+            row[field] = value
@@ -1,49 +1,287 @@
-import psycopg2
-from psycopg2 import OperationalError, sql
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:
+    # Only pools built with a connect_factory (e.g. the sqlite3 stand-in) work without it
+    psycopg2 = None
+
+# Defaults, overridden by db_config.json (next to this file or FR_DB_CONFIG)
+# and then by FR_DB_* environment variables.
+DEFAULT_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "FaceRecognition",
+    "user": "postgres",
+    "password": "",
+    "connect_timeout": 5,
+    "min_connections": 1,
+    "max_connections": 10,
+    "health_check_after": 30,  # seconds idle before a connection is pinged on checkout
+    "checkout_timeout": 10,  # seconds to wait for a free connection when all are in use
+}
+
+_ENV_KEYS = {
+    "host": "FR_DB_HOST",
+    "port": "FR_DB_PORT",
+    "database": "FR_DB_NAME",
+    "user": "FR_DB_USER",
+    "password": "FR_DB_PASSWORD",
+    "connect_timeout": "FR_DB_CONNECT_TIMEOUT",
+    "min_connections": "FR_DB_MIN_CONNECTIONS",
+    "max_connections": "FR_DB_MAX_CONNECTIONS",
+    "health_check_after": "FR_DB_HEALTH_CHECK_AFTER",
+    "checkout_timeout": "FR_DB_CHECKOUT_TIMEOUT",
+}
+
+
+def load_config(path=None):
+    """
+    Build the connection settings from defaults, an optional JSON file and
+    the environment (highest priority).
+    """
+    config = dict(DEFAULT_CONFIG)
+    path = path or os.environ.get("FR_DB_CONFIG") or os.path.join(os.path.dirname(__file__), "db_config.json")
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    for key, env_key in _ENV_KEYS.items():
+        if env_key in os.environ:
+            config[key] = os.environ[env_key]
+    for key in ("port", "connect_timeout", "min_connections", "max_connections", "health_check_after"):
+        config[key] = int(config[key])
+    config["checkout_timeout"] = float(config["checkout_timeout"])
+    return config
+
+
+class PoolExhausted(Exception):
+    """No connection became free within checkout_timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Use connection() as a context manager: it checks a connection out,
+    commits on success, rolls back on error and always returns it to the
+    pool. Connections idle for longer than health_check_after are pinged
+    before being handed out and replaced if they are dead. When all
+    max_connections are checked out, getconn() waits up to checkout_timeout
+    for one to come back and then raises PoolExhausted.
+
+    connect_factory lets tests plug in another DB-API driver (see
+    sqlite_connect_factory); by default psycopg2's ThreadedConnectionPool is
+    used. The stand-in exercises the pool itself only: MethodProvider's SQL
+    (%s placeholders, cursor context managers, named cursors) is
+    PostgreSQL-specific.
+    """
+
+    def __init__(self, config=None, connect_factory=None):
+        self.config = config or load_config()
+        self.health_check_after = self.config["health_check_after"]
+        self.checkout_timeout = self.config.get("checkout_timeout", DEFAULT_CONFIG["checkout_timeout"])
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config["max_connections"])
+
+        if connect_factory is None:
+            if psycopg2 is None:
+                raise ImportError("psycopg2 is required for PostgreSQL connections")
+            self._pool = ThreadedConnectionPool(
+                self.config["min_connections"],
+                self.config["max_connections"],
+                host=self.config["host"],
+                port=self.config["port"],
+                database=self.config["database"],
+                user=self.config["user"],
+                password=self.config["password"],
+                connect_timeout=self.config["connect_timeout"]
+            )
+        else:
+            self._pool = _SimplePool(connect_factory, self.config["max_connections"])
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolExhausted(f"no database connection free after {self.checkout_timeout}s "
+                                f"({self.config['max_connections']} in use)")
+        try:
+            conn = self._pool.getconn()
+            with self._lock:
+                last_used = self._last_used.get(id(conn))
+            if last_used is not None and time.time() - last_used > self.health_check_after and not _is_alive(conn):
+                print("Replacing dead database connection")
+                with self._lock:
+                    self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+        return conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.time()
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken or getattr(conn, 'closed', 0) != 0)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+class _SimplePool:
+    """Minimal bounded pool for non-psycopg2 drivers"""
+
+    def __init__(self, connect_factory, max_connections):
+        self.connect_factory = connect_factory
+        self.idle = []
+        self.in_use = 0
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        with self.lock:
+            if self.idle:
+                self.in_use += 1
+                return self.idle.pop()
+            if self.in_use >= self.max_connections:
+                raise RuntimeError("connection pool exhausted")
+            self.in_use += 1
+        return self.connect_factory()
+
+    def putconn(self, conn, close=False):
+        with self.lock:
+            self.in_use -= 1
+            if not close:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def closeall(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+def sqlite_connect_factory(path=':memory:'):
+    """connect_factory for a sqlite3 stand-in pool (tests, demos without a PostgreSQL server)"""
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def _is_alive(conn):
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1;")
+        cur.fetchone()
+        cur.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = ConnectionPool()
+                except Exception as e:
+                    # Print/log the error, then re-raise so caller knows it failed
+                    print(f"Failed to connect to PostgreSQL: {e}")
+                    raise
+    return _pool
+
+
+def set_pool(pool):
+    """Install a custom pool (e.g. built with sqlite_connect_factory for tests)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool is not pool:
+            _pool.closeall()
+        _pool = pool
+
+
+def connection():
+    """
+    Context manager yielding a pooled connection:
+
+        with connection() as conn:
+            with conn.cursor() as cur:
+                ...
+    """
+    return get_pool().connection()
 
-# Hardcoded connection parameters; adjust as needed.
-DB_HOST = "localhost"
-DB_PORT = 5432
-DB_NAME = "FaceRecognition"
-DB_USER = "postgres"
-DB_PASSWORD = "somil123"
 
 def get_connection():
     """
     Returns a new psycopg2 connection instance if successful, or raises an exception.
-    Caller is responsible for closing the connection.
+    Caller is responsible for closing the connection. Prefer connection().
     """
+    if psycopg2 is None:
+        raise ImportError("psycopg2 is required for PostgreSQL connections")
+    config = load_config()
     try:
         conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            connect_timeout=5
+            host=config["host"],
+            port=config["port"],
+            database=config["database"],
+            user=config["user"],
+            password=config["password"],
+            connect_timeout=config["connect_timeout"]
         )
         return conn
-    except OperationalError as e:
+    except psycopg2.OperationalError as e:
         # Print/log the error, then re-raise so caller knows it failed
         print(f"Failed to connect to PostgreSQL: {e}")
         raise
 
+
 def test_query():
     """
     Simple function to test that the connection works by running a trivial query.
     Returns the PostgreSQL version string.
     """
-    conn = None
-    try:
-        conn = get_connection()
+    with connection() as conn:
         cur = conn.cursor()
         cur.execute("SELECT version();")
         version = cur.fetchone()[0]
         cur.close()
         return version
-    finally:
-        if conn:
-            conn.close()
 
 # Example usage when run as script
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import struct
+
+import numpy as np
+
+# Binary face-encoding format stored in users.face_encoding (bytea):
+#   magic b'FE' | version (u8) | dtype code (u8) | dim (u16, little endian) | dim * float32 (little endian)
+# 6 + 128 * 4 = 518 bytes for a dlib encoding, versus ~1 KB float64 / several KB as text.
+MAGIC = b'FE'
+VERSION = 1
+DTYPE_FLOAT32 = 0
+HEADER = struct.Struct('<2sBBH')
+ENCODING_DTYPE = np.dtype('<f4')
+
+
+def encode_encoding(encoding):
+    """Serialize one face encoding to the versioned float32 format"""
+    values = np.asarray(encoding, dtype=ENCODING_DTYPE).ravel()
+    return HEADER.pack(MAGIC, VERSION, DTYPE_FLOAT32, values.size) + values.tobytes()
+
+
+def is_encoded(data):
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == MAGIC
+
+
+def _raw_dtype(size, dim=128):
+    """Element type of a raw legacy bytea value (no header): float64 or float32 bytes of dim values"""
+    if size == dim * 8:
+        return np.dtype('<f8')
+    if size == dim * 4:
+        return np.dtype('<f4')
+    raise ValueError(f"Legacy encoding of {size} bytes is neither {dim} float64 nor {dim} float32 values")
+
+
+def decode_encoding(data, out=None, dim=128):
+    """
+    Deserialize an encoding. Values stored by older code are accepted as
+    well: float arrays or lists, and raw bytea holding dim float64 or
+    float32 values (anything else raises ValueError). If out is given (a
+    float32 row of the right size) the values are written there without an
+    intermediate copy.
+    """
+    if not is_encoded(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            raw = memoryview(data).cast('B')
+            values = np.frombuffer(raw, dtype=_raw_dtype(len(raw), dim)).astype(np.float32)
+        else:
+            values = np.asarray(data, dtype=np.float32).ravel()
+        if out is None:
+            return values
+        out[:] = values
+        return out
+
+    magic, version, dtype_code, dim = HEADER.unpack_from(data, 0)
+    if version != VERSION or dtype_code != DTYPE_FLOAT32:
+        raise ValueError(f"Unsupported encoding format version={version} dtype={dtype_code}")
+    values = np.frombuffer(data, dtype=ENCODING_DTYPE, count=dim, offset=HEADER.size)
+    if out is None:
+        return values.astype(np.float32)
+    out[:] = values
+    return out
+
+
+def encoding_dim(data, default=128):
+    if is_encoded(data):
+        return HEADER.unpack_from(data, 0)[3]
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        size = memoryview(data).nbytes
+        # Raw legacy bytea; None if it does not hold default values of either float type
+        return default if size in (default * 8, default * 4) else None
+    try:
+        return len(data)
+    except TypeError:
+        return default
+
+
+def encode_many(encodings):
+    """Serialize several encodings (e.g. the pose encodings of one user) into one blob"""
+    return b''.join(encode_encoding(encoding) for encoding in encodings)
+
+
+def decode_many(data):
+    """Inverse of encode_many. Returns an (n, dim) float32 matrix."""
+    if not data:
+        return np.empty((0, 0), dtype=np.float32)
+    data = memoryview(data)
+    dim = HEADER.unpack_from(data, 0)[3]
+    record_size = HEADER.size + dim * ENCODING_DTYPE.itemsize
+    count = len(data) // record_size
+    out = np.empty((count, dim), dtype=np.float32)
+    for i in range(count):
+        decode_encoding(data[i * record_size:(i + 1) * record_size], out=out[i])
+    return out
@@ -1,50 +1,186 @@
 from datetime import date
 
-from DatabaseModel.DBInstanceProvider import get_connection
+import numpy as np
+
+from DatabaseModel.DBInstanceProvider import connection
+from DatabaseModel.EncodingFormat import decode_encoding, encode_encoding, encoding_dim, is_encoded
 
 
 def add_user_with_id(user_id, name, encoding):
-    conn = get_connection()
-    with conn.cursor() as cursor:
-        cursor.execute(
-            """
-            INSERT INTO users (user_id, name, face_encoding)
-            VALUES (%s, %s, %s);
-            """,
-            (user_id, name, encoding)
-        )
-        conn.commit()
-        return True
+    from psycopg2 import Binary
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO users (user_id, name, face_encoding)
+                VALUES (%s, %s, %s);
+                """,
+                (user_id, name, Binary(encode_encoding(encoding)))
+            )
+    return True
+
+
 def get_user_encodings():
-    conn = get_connection()
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id, face_encoding FROM users;")
-        rows = cursor.fetchall()
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT user_id, face_encoding FROM users;")
+            rows = cursor.fetchall()
 
     # Convert to dictionary
-    encoding_map = {user_id: encoding for user_id, encoding in rows}
+    encoding_map = {user_id: decode_encoding(encoding) for user_id, encoding in rows}
     return encoding_map
+
+
+def load_gallery(dim=128, itersize=5000, id_dtype=np.int64):
+    """
+    Bulk-load every user's encoding into a preallocated float32 matrix.
+
+    Rows are streamed through a server-side (named) cursor, itersize at a
+    time, and decoded straight into the matrix, so memory stays at roughly
+    the size of the result plus one batch.
+
+    Returns (ids, encodings): ids is a 1-D array of user_id, encodings an
+    (N, dim) float32 matrix with row i belonging to ids[i].
+    """
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM users;")
+            capacity = cur.fetchone()[0]
+
+        ids = np.empty(capacity, dtype=id_dtype)
+        encodings = np.empty((capacity, dim), dtype=np.float32)
+        count = 0
+
+        with conn.cursor(name='gallery_load') as cur:
+            cur.itersize = itersize
+            cur.execute("SELECT user_id, face_encoding FROM users ORDER BY user_id;")
+            for user_id, encoding in cur:
+                if encoding is None:
+                    continue
+                if encoding_dim(encoding, dim) != dim:
+                    print(f"Skipping encoding of user {user_id}: unexpected size")
+                    continue
+                if count == capacity:
+                    # Users added since the count - grow geometrically
+                    capacity = max(16, capacity * 2)
+                    ids = np.resize(ids, capacity)
+                    encodings = np.resize(encodings, (capacity, dim))
+                ids[count] = user_id
+                decode_encoding(encoding, out=encodings[count], dim=dim)
+                count += 1
+
+    return ids[:count], encodings[:count]
+
+
+# Legacy face_encoding column types whose values psycopg2 returns as Python lists
+_CONVERTIBLE_TYPES = ('ARRAY', 'json', 'jsonb')
+
+
+def migrate_encodings_to_binary():
+    """
+    Rewrite face_encoding values stored by older code in the binary format.
+    If the column is not bytea yet (float arrays or JSON from older schemas)
+    it is converted: the encodings are written to a new bytea column that
+    then replaces the old one, all in one transaction. Any other column type
+    is refused with an error instead of guessing.
+    """
+    from psycopg2 import Binary
+    converted = 0
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT data_type FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'face_encoding';
+            """)
+            row = cur.fetchone()
+            if row is None:
+                raise RuntimeError("users.face_encoding does not exist")
+            column_type = row[0]
+            if column_type != 'bytea' and column_type not in _CONVERTIBLE_TYPES:
+                raise RuntimeError(f"users.face_encoding has type {column_type}; expected bytea or one of "
+                                   f"{', '.join(_CONVERTIBLE_TYPES)} - convert it manually first")
+
+            cur.execute("SELECT user_id, face_encoding FROM users;")
+            rows = cur.fetchall()
+            if column_type == 'bytea':
+                for user_id, encoding in rows:
+                    if encoding is None or is_encoded(encoding):
+                        continue
+                    try:
+                        values = decode_encoding(encoding)
+                    except ValueError as e:
+                        # Nothing has been committed yet; leave the table as it was
+                        raise RuntimeError(f"Cannot migrate the encoding of user {user_id}: {e}") from e
+                    cur.execute("UPDATE users SET face_encoding = %s WHERE user_id = %s;",
+                                (Binary(encode_encoding(values)), user_id))
+                    converted += 1
+            else:
+                print(f"Converting users.face_encoding from {column_type} to bytea")
+                cur.execute("ALTER TABLE users ADD COLUMN face_encoding_bin bytea;")
+                for user_id, encoding in rows:
+                    if encoding is None:
+                        continue
+                    cur.execute("UPDATE users SET face_encoding_bin = %s WHERE user_id = %s;",
+                                (Binary(encode_encoding(decode_encoding(encoding))), user_id))
+                    converted += 1
+                cur.execute("ALTER TABLE users DROP COLUMN face_encoding;")
+                cur.execute("ALTER TABLE users RENAME COLUMN face_encoding_bin TO face_encoding;")
+    print(f"Converted {converted} encodings to binary float32 format")
+    return converted
+
+
 def get_user_name_by_id(user_id):
-    conn = get_connection()
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT name FROM users WHERE user_id = %s;", (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else None
+    with connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT name FROM users WHERE user_id = %s;", (user_id,))
+            result = cursor.fetchone()
+    return result[0] if result else None
+
 
 def upsert_attendance(user_id, status, time_in=None, time_out=None, worked_time=None, absent_time=None):
-    conn = get_connection()
     today = date.today()
-    with conn.cursor() as cur:
-        cur.execute("""
-            INSERT INTO attendance (user_id, date, status, time_in, time_out, worked_time, absent_time)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (user_id, date)
-            DO UPDATE SET
-                status = EXCLUDED.status,
-                time_in = EXCLUDED.time_in,
-                time_out = EXCLUDED.time_out,
-                worked_time = EXCLUDED.worked_time,
-                absent_time = EXCLUDED.absent_time;
-        """, (user_id, today, status, time_in, time_out, worked_time, absent_time))
-        conn.commit()
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO attendance (user_id, date, status, time_in, time_out, worked_time, absent_time)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, date)
+                DO UPDATE SET
+                    status = EXCLUDED.status,
+                    time_in = EXCLUDED.time_in,
+                    time_out = EXCLUDED.time_out,
+                    worked_time = EXCLUDED.worked_time,
+                    absent_time = EXCLUDED.absent_time;
+            """, (user_id, today, status, time_in, time_out, worked_time, absent_time))
+
+
+ATTENDANCE_FIELDS = ('status', 'time_in', 'time_out', 'worked_time', 'absent_time')
+
 
+def upsert_attendance_batch(rows, fields=ATTENDANCE_FIELDS, page_size=500):
+    """
+    Multi-row upsert. rows: iterable of (user_id, date, *values), one value
+    per entry of fields (a subset of ATTENDANCE_FIELDS, in that order), at
+    most one row per (user_id, date). Columns not in fields keep their
+    current value on conflict.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    unknown = set(fields) - set(ATTENDANCE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown attendance fields: {sorted(unknown)}")
+    columns = ', '.join(('user_id', 'date') + tuple(fields))
+    if fields:
+        conflict = "DO UPDATE SET " + ', '.join(f"{field} = EXCLUDED.{field}" for field in fields)
+    else:
+        conflict = "DO NOTHING"
+    from psycopg2.extras import execute_values
+    with connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, f"""
+                INSERT INTO attendance ({columns})
+                VALUES %s
+                ON CONFLICT (user_id, date) {conflict};
+            """, rows, page_size=page_size)
+    return len(rows)
@@ -0,0 +1,234 @@
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque, namedtuple
+
+# Typed records. timestamp is a datetime.datetime.
+AttendanceEvent = namedtuple('AttendanceEvent', 'timestamp name emp_id direction')
+SpoofingEvent = namedtuple('SpoofingEvent', 'timestamp name status confidence')
+
+EVENT_TYPES = {
+    'attendance': AttendanceEvent,
+    'spoofing': SpoofingEvent,
+}
+_TYPE_NAMES = {cls: name for name, cls in EVENT_TYPES.items()}
+
+
+def event_to_json(event):
+    record = {'type': _TYPE_NAMES[type(event)]}
+    record.update(event._asdict())
+    record['timestamp'] = event.timestamp.isoformat()
+    return json.dumps(record)
+
+
+def parse_event(line, default_type='attendance'):
+    """
+    Parse one journal line into a typed record, or None if it is unreadable.
+    JSON lines are the current format; plain CSV lines written by older
+    versions (name,emp_id,datetime,in|out and the spoofing log layout) are
+    still understood so history stays queryable.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith('{'):
+            record = json.loads(line)
+            cls = EVENT_TYPES[record.pop('type')]
+            record['timestamp'] = datetime.datetime.fromisoformat(record['timestamp'])
+            return cls(**record)
+
+        parts = line.split(',')
+        if default_type == 'attendance' and len(parts) == 4:
+            name, emp_id, timestamp, direction = parts
+            return AttendanceEvent(datetime.datetime.fromisoformat(timestamp), name, emp_id, direction)
+        if default_type == 'spoofing' and len(parts) == 5:
+            timestamp, name, _, status, confidence = parts
+            return SpoofingEvent(datetime.datetime.fromisoformat(timestamp), name, status, float(confidence))
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def read_events(path, default_type='attendance'):
+    """Yield typed records from a journal file (plain or rotated .gz)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            event = parse_event(line, default_type)
+            if event is not None:
+                yield event
+
+
+class _Sink:
+    """One output file with size/day based rotation"""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.file = None
+        self.day = None
+
+    def open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self.day = datetime.date.fromtimestamp(os.path.getmtime(self.path))
+        else:
+            # Empty file: it belongs to the day of the first event written to it
+            self.day = None
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if self._ends_with_legacy_line():
+            # Written by an older version as CSV: archive it so no file mixes CSV and JSON lines
+            self.rotate()
+
+    def _ends_with_legacy_line(self):
+        with open(self.path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(self.path) - 4096))
+            lines = [line for line in f.read().splitlines() if line.strip()]
+        return bool(lines) and not lines[-1].lstrip().startswith(b'{')
+
+    def write(self, lines, day):
+        """Append lines of events from day; a later day rotates, a late event from an earlier one does not"""
+        if self.file is None:
+            self.open()
+        if self.day is None:
+            self.day = day
+        if day > self.day or (self.max_bytes and self.file.tell() >= self.max_bytes):
+            self.rotate()
+            self.day = max(self.day, day)
+        self.file.write(''.join(lines))
+        self.file.flush()
+
+    def rotate(self):
+        self.file.close()
+        if os.path.getsize(self.path) > 0 and self.day is not None:
+            base, ext = os.path.splitext(self.path)
+            target = f"{base}.{self.day.isoformat()}{ext}"
+            n = 1
+            while os.path.exists(target + '.gz'):
+                target = f"{base}.{self.day.isoformat()}.{n}{ext}"
+                n += 1
+            os.replace(self.path, target)
+            with open(target, 'rb') as src, gzip.open(target + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+            print(f"Rotated {self.path} -> {target}.gz")
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class EventJournal:
+    """
+    Single writer for log.txt (attendance in/out) and spoofing_log.txt.
+
+    emit() never blocks: records go onto a bounded queue and a background
+    thread writes them as JSON lines in batches, flushing every
+    flush_interval seconds. Files are rotated when the day of the events
+    (their timestamp, not the time of writing) changes or they exceed
+    max_bytes; rotated files are gzip-compressed. If the queue is full a
+    spoofing event is dropped and counted in dropped_events; attendance
+    in/out events are never dropped but kept in an overflow list, in order,
+    until the writer catches up.
+    """
+
+    def __init__(self, attendance_path='./log.txt', spoofing_path='spoofing_log.txt',
+                 flush_interval=0.5, max_bytes=10 * 1024 * 1024, max_queue=10000):
+        self.sinks = {
+            AttendanceEvent: _Sink(attendance_path, max_bytes),
+            SpoofingEvent: _Sink(spoofing_path, max_bytes),
+        }
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped_events = 0
+        self.overflow = deque()  # attendance events that found the queue full
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        if not self.running:
+            return
+        self.running = False
+        try:
+            # The writer keeps draining, so a full queue frees up quickly unless it is stuck
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"Event journal writer not draining, {self.queue.qsize()} events may be lost")
+            return
+        self.thread.join(timeout=timeout)
+
+    def emit(self, event):
+        if isinstance(event, AttendanceEvent) and self.overflow:
+            # Keep in/out order: once one is waiting in the overflow, the rest queue behind it
+            self.overflow.append(event)
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            if isinstance(event, AttendanceEvent):
+                self.overflow.append(event)
+                print("Event journal queue full, holding attendance event until the writer catches up")
+                return
+            self.dropped_events += 1
+            print(f"Event journal queue full, dropped {type(event).__name__}")
+
+    def log_attendance(self, name, emp_id, direction, timestamp=None):
+        self.emit(AttendanceEvent(timestamp or datetime.datetime.now(), name, emp_id, direction))
+
+    def log_spoofing(self, name, status, confidence, timestamp=None):
+        self.emit(SpoofingEvent(timestamp or datetime.datetime.now(), name, status, float(confidence)))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.time() + self.flush_interval
+            while True:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            # Everything in the overflow was emitted after the queued attendance events
+            while self.overflow:
+                batch.append(self.overflow.popleft())
+            if batch:
+                self._write_batch(batch)
+        for sink in self.sinks.values():
+            sink.close()
+
+    def _write_batch(self, batch):
+        # Per file, runs of consecutive events from the same day
+        grouped = {}
+        for event in batch:
+            runs = grouped.setdefault(type(event), [])
+            day = event.timestamp.date()
+            if not runs or runs[-1][0] != day:
+                runs.append((day, []))
+            runs[-1][1].append(event_to_json(event) + '\n')
+        for event_type, runs in grouped.items():
+            try:
+                for day, lines in runs:
+                    self.sinks[event_type].write(lines, day)
+            except Exception as e:
+                print(f"Error writing {event_type.__name__} records: {e}")
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import queue
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Enrollment images are stored as aligned face chips instead of full frames:
+# the face is rotated so the eyes are level, cropped with some margin and
+# scaled to CHIP_SIZE x CHIP_SIZE. At WebP quality 80 a chip is ~5-10 KB,
+# versus ~60-100 KB for a 640x480 JPEG of mostly background.
+CHIP_SIZE = 200
+CHIP_PADDING = 0.25  # margin around the face box, as a fraction of its size
+CHIP_FORMAT = 'webp'
+CHIP_QUALITY = 80
+
+CONTAINER_NAME = 'chips.zip'
+MANIFEST_NAME = 'manifest.json'
+
+
+def extract_chip(rgb_frame, face_location, size=CHIP_SIZE, padding=CHIP_PADDING):
+    """Aligned, fixed-size crop of one face. face_location is (top, right, bottom, left)."""
+    top, right, bottom, left = face_location
+    center = ((left + right) / 2.0, (top + bottom) / 2.0)
+
+    # Level the eyes when landmarks are available; a plain crop otherwise
+    angle = 0.0
+    try:
+        import face_recognition
+        landmarks = face_recognition.face_landmarks(rgb_frame, [face_location], model='small')
+        if landmarks and 'left_eye' in landmarks[0] and 'right_eye' in landmarks[0]:
+            eyes = sorted([np.mean(landmarks[0]['left_eye'], axis=0), np.mean(landmarks[0]['right_eye'], axis=0)],
+                          key=lambda point: point[0])
+            angle = float(np.degrees(np.arctan2(eyes[1][1] - eyes[0][1], eyes[1][0] - eyes[0][0])))
+    except Exception:
+        pass
+
+    box = max(right - left, bottom - top) * (1 + 2 * padding)
+    matrix = cv2.getRotationMatrix2D(center, angle, size / box)
+    matrix[0, 2] += size / 2.0 - center[0]
+    matrix[1, 2] += size / 2.0 - center[1]
+    return cv2.warpAffine(rgb_frame, matrix, (size, size), flags=cv2.INTER_AREA, borderMode=cv2.BORDER_REPLICATE)
+
+
+def chip_face_location(size=CHIP_SIZE, padding=CHIP_PADDING):
+    """Where the face sits inside a chip, so chips can be re-encoded without detection"""
+    margin = int(round(size * padding / (1 + 2 * padding)))
+    return margin, size - margin, size - margin, margin
+
+
+def encode_chip(chip_rgb, fmt=CHIP_FORMAT, quality=CHIP_QUALITY):
+    bgr = cv2.cvtColor(chip_rgb, cv2.COLOR_RGB2BGR)
+    if fmt == 'webp':
+        ok, data = cv2.imencode('.webp', bgr, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        ok, data = cv2.imencode('.jpg', bgr, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+    if not ok:
+        raise ValueError(f"Could not encode face chip as {fmt}")
+    return data.tobytes()
+
+
+def make_chip(rgb_frame, face_location, fmt=CHIP_FORMAT, quality=CHIP_QUALITY):
+    return encode_chip(extract_chip(rgb_frame, face_location), fmt, quality)
+
+
+def image_extension(data):
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    return 'jpg'
+
+
+def write_container(path, images, meta=None):
+    """
+    Write {pose: image bytes} as one zip file, atomically. Entries are stored
+    uncompressed (the images already are compressed); manifest.json records
+    the chip size/padding and the entry for each pose.
+    """
+    manifest = {'size': CHIP_SIZE, 'padding': CHIP_PADDING, 'poses': {}}
+    manifest.update(meta or {})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_STORED) as container:
+            for pose, data in images.items():
+                entry = f'{pose}.{image_extension(data)}'
+                manifest['poses'][pose] = entry
+                container.writestr(entry, data)
+            container.writestr(MANIFEST_NAME, json.dumps(manifest))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_container(path):
+    """Returns ({pose: image bytes}, manifest)"""
+    with zipfile.ZipFile(path, 'r') as container:
+        manifest = json.loads(container.read(MANIFEST_NAME))
+        images = {pose: container.read(entry) for pose, entry in manifest.get('poses', {}).items()}
+    return images, manifest
+
+
+class ChipWriter:
+    """
+    Writes enrollment images to the face store on a background thread, so
+    the (slow, disk-bound) image write never delays registration. The
+    identity itself is stored synchronously; only images go through here.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="chip-writer", daemon=True)
+            self.thread.start()
+
+    def submit(self, name, images):
+        self.start()
+        self.queue.put((name, images))
+
+    def stop(self):
+        """Write everything still queued, then stop"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=30)
+        self.thread = None
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            name, images = item
+            try:
+                self.store.put_images(name, images)
+            except Exception as e:
+                print(f"Failed to store face chips for {name}: {e}")
+
+
+def _migrate_user(task):
+    """Worker: turn one user's full-frame pose JPGs into chips. Returns (name, paths, {pose: bytes}, notes)."""
+    import face_recognition
+    name, paths, fmt, quality = task
+    chips, notes = {}, []
+    for path in paths:
+        pose = os.path.splitext(os.path.basename(path))[0].lower()
+        with open(path, 'rb') as f:
+            original = f.read()
+        frame = cv2.imdecode(np.frombuffer(original, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            notes.append(f"{pose}: unreadable, kept as-is")
+            chips[pose] = original
+            continue
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb_frame)
+        if len(locations) != 1:
+            notes.append(f"{pose}: {len(locations)} faces, kept full frame")
+            chips[pose] = original
+            continue
+        chips[pose] = make_chip(rgb_frame, locations[0], fmt, quality)
+    return name, paths, chips, notes
+
+
+def migrate(args):
+    """Convert face_db/<name>/<pose>.jpg full frames into one chips.zip per user"""
+    from FaceStore import FilesystemFaceStore
+    store = FilesystemFaceStore(args.db)
+    tasks, before = [], 0
+    for name in store.list_users():
+        user_dir = store.user_dir(name)
+        if not os.path.isdir(user_dir) or os.path.exists(os.path.join(user_dir, CONTAINER_NAME)):
+            continue
+        paths = sorted(os.path.join(user_dir, f) for f in os.listdir(user_dir) if f.lower().endswith('.jpg'))
+        if paths:
+            before += sum(os.path.getsize(p) for p in paths)
+            tasks.append((name, paths, args.format, args.quality))
+    if not tasks:
+        print("Nothing to migrate")
+        return
+
+    after = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for name, paths, chips, notes in pool.map(_migrate_user, tasks):
+            for note in notes:
+                print(f"  {name}: {note}")
+            if args.dry_run:
+                after += sum(len(data) for data in chips.values())
+                continue
+            if args.keep_originals:
+                backup_dir = os.path.join(args.db, '.originals', name)
+                os.makedirs(backup_dir, exist_ok=True)
+                for path in paths:
+                    shutil.copy2(path, backup_dir)
+            store.put_images(name, chips)
+            after += os.path.getsize(os.path.join(store.user_dir(name), CONTAINER_NAME))
+    print(f"Migrated {len(tasks)} users: {before / 1e6:.1f} MB of frames -> {after / 1e6:.1f} MB of chips"
+          + (" (dry run)" if args.dry_run else ""))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Face chip storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="convert face_db pose JPGs into per-user chip containers")
+    migrate_parser.add_argument("--db", type=str, default="face_db")
+    migrate_parser.add_argument("--format", type=str, default=CHIP_FORMAT, help="webp / jpg")
+    migrate_parser.add_argument("--quality", type=int, default=CHIP_QUALITY)
+    migrate_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    migrate_parser.add_argument("--keep-originals", action="store_true",
+                                help="copy the full frames to <db>/.originals/ first")
+    migrate_parser.add_argument("--dry-run", action="store_true")
+    migrate_parser.set_defaults(func=migrate)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,631 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from FaceChips import CONTAINER_NAME, read_container, write_container
+from Gallery import GallerySnapshot
+from DatabaseModel.EncodingFormat import decode_encoding, decode_many, encode_encoding, encode_many
+
+ENCODING_DIM = 128
+
+# One registered identity
+FaceRecord = namedtuple('FaceRecord', 'name emp_id avg_encoding multi_encodings')
+
+# Whole gallery in matrix form:
+#   names[i], emp_ids[i] and avg_encodings[i] describe identity i
+#   multi_encodings[j] is a pose encoding of identity multi_owner[j]
+GalleryData = namedtuple('GalleryData', 'names emp_ids avg_encodings multi_encodings multi_owner')
+
+
+class DuplicateEmpIdError(ValueError):
+    """An employee ID is already registered to a different name"""
+
+
+def check_emp_ids(records, registered_name):
+    """
+    Raise DuplicateEmpIdError if records give one emp_id to two names, or an
+    emp_id that registered_name(emp_id) says belongs to another name.
+    Every backend calls this before writing a batch.
+    """
+    owners = {}
+    for record in records:
+        emp_id = str(record.emp_id)
+        if owners.setdefault(emp_id, record.name) != record.name:
+            raise DuplicateEmpIdError(f"Emp ID {emp_id} given to both {owners[emp_id]} and {record.name}")
+        name = registered_name(emp_id)
+        if name is not None and name != record.name:
+            raise DuplicateEmpIdError(f"Emp ID {emp_id} is already registered to {name}")
+
+
+def build_gallery_data(records, dim=ENCODING_DIM):
+    """Pack an iterable of FaceRecord into GalleryData (float32 matrices)"""
+    records = [r for r in records if r.avg_encoding is not None]
+    n = len(records)
+    avg = np.empty((n, dim), dtype=np.float32)
+    multi_counts = [len(r.multi_encodings) for r in records]
+    multi = np.empty((sum(multi_counts), dim), dtype=np.float32)
+    owner = np.empty(sum(multi_counts), dtype=np.int32)
+    pos = 0
+    for i, record in enumerate(records):
+        avg[i] = record.avg_encoding
+        k = multi_counts[i]
+        if k:
+            multi[pos:pos + k] = np.asarray(record.multi_encodings, dtype=np.float32)
+            owner[pos:pos + k] = i
+            pos += k
+    return GalleryData([r.name for r in records], [r.emp_id for r in records], avg, multi, owner)
+
+
+class FaceStore:
+    """
+    Interface for where registered faces live. The app talks to a FaceStore
+    instead of walking face_db/ itself.
+
+    Implementations: FilesystemFaceStore (the face_db/ layout),
+    SQLiteFaceStore and PostgresFaceStore.
+
+    Every change (add/delete) gets a sequence number; changes_since(token)
+    returns the (op, name) changes after token plus the new token, so callers
+    can update in-memory galleries incrementally.
+    """
+
+    def list_users(self):
+        """{name: emp_id}"""
+        raise NotImplementedError
+
+    def get_user(self, name):
+        """FaceRecord or None"""
+        raise NotImplementedError
+
+    def add_user(self, name, emp_id, avg_encoding, multi_encodings, images=None):
+        """
+        Store one identity in a single transactional write.
+        images: optional {pose_name: encoded image bytes}
+        """
+        raise NotImplementedError
+
+    def add_users(self, records, images=None):
+        """Bulk version of add_user. images: optional {name: {pose_name: bytes}}"""
+        for record in records:
+            self.add_user(record.name, record.emp_id, record.avg_encoding, record.multi_encodings,
+                          (images or {}).get(record.name))
+
+    def delete_user(self, name):
+        raise NotImplementedError
+
+    def put_images(self, name, images):
+        """Replace the enrollment images (face chips) of an existing identity"""
+        raise NotImplementedError
+
+    def get_images(self, name):
+        """{pose_name: encoded image bytes}"""
+        raise NotImplementedError
+
+    def load_gallery(self):
+        """All identities as GalleryData"""
+        raise NotImplementedError
+
+    def load_snapshot(self):
+        """All identities as a GallerySnapshot (GalleryCache serves it without copying)"""
+        return GallerySnapshot.from_gallery_data(self.load_gallery())
+
+    def changes_since(self, token):
+        """Returns ([(op, name), ...], new_token); op is 'add' or 'delete'"""
+        raise NotImplementedError
+
+    def fingerprint(self):
+        """Cheap value that changes whenever the stored identities change"""
+        raise NotImplementedError
+
+
+class FilesystemFaceStore(FaceStore):
+    """
+    The original layout: face_db/<name>/avg_encoding.pkl, multi_encodings.pkl
+    and the enrollment images, plus face_db/users.json mapping name -> emp_id.
+    Images live in one chips.zip container per user (older folders have
+    loose <pose>.jpg full frames; FaceChips.py migrate converts them).
+
+    Writes go to a temporary folder that is renamed into place, so a user
+    folder is either complete or absent. Changes are recorded in
+    face_db/.changes.jsonl.
+    """
+
+    def __init__(self, db_dir):
+        self.db_dir = db_dir
+        self.users_file = os.path.join(db_dir, 'users.json')
+        self.changes_file = os.path.join(db_dir, '.changes.jsonl')
+        self.lock = threading.Lock()
+        os.makedirs(db_dir, exist_ok=True)
+
+    def user_dir(self, name):
+        return os.path.join(self.db_dir, name)
+
+    def list_users(self):
+        if not os.path.exists(self.users_file) or os.path.getsize(self.users_file) == 0:
+            return {}
+        try:
+            with open(self.users_file, 'r') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    def _write_users(self, users):
+        tmp_path = self.users_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(users, f, indent=4)
+        os.replace(tmp_path, self.users_file)
+
+    def _user_folders(self):
+        return [entry.name for entry in os.scandir(self.db_dir)
+                if entry.is_dir() and not entry.name.startswith('.')]
+
+    def _read_record(self, name, emp_id):
+        user_path = self.user_dir(name)
+        avg_encoding = None
+        multi_encodings = []
+
+        encoding_path = os.path.join(user_path, 'avg_encoding.pkl')
+        if os.path.exists(encoding_path):
+            try:
+                with open(encoding_path, 'rb') as f:
+                    avg_encoding = pickle.load(f)
+            except Exception as e:
+                print(f"Error loading average encoding for {name}: {e}")
+
+        multi_path = os.path.join(user_path, 'multi_encodings.pkl')
+        if os.path.exists(multi_path):
+            try:
+                with open(multi_path, 'rb') as f:
+                    multi_encodings = pickle.load(f)
+            except Exception as e:
+                print(f"Error loading multi-encodings for {name}: {e}")
+
+        return FaceRecord(name, emp_id, avg_encoding, multi_encodings)
+
+    def get_user(self, name):
+        if not os.path.isdir(self.user_dir(name)):
+            return None
+        return self._read_record(name, self.list_users().get(name, "N/A"))
+
+    def _write_user_dir(self, name, avg_encoding, multi_encodings, images):
+        tmp_dir = os.path.join(self.db_dir, f'.tmp-{name}')
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        final_dir = self.user_dir(name)
+        if images:
+            write_container(os.path.join(tmp_dir, CONTAINER_NAME), images)
+        elif images is None and os.path.isdir(final_dir):
+            # Encodings only (e.g. images still being written): keep the stored images
+            for entry in os.listdir(final_dir):
+                if not entry.endswith('.pkl'):
+                    shutil.copy2(os.path.join(final_dir, entry), tmp_dir)
+        with open(os.path.join(tmp_dir, 'avg_encoding.pkl'), 'wb') as f:
+            pickle.dump(np.asarray(avg_encoding), f)
+        with open(os.path.join(tmp_dir, 'multi_encodings.pkl'), 'wb') as f:
+            pickle.dump([np.asarray(e) for e in multi_encodings], f)
+
+        if os.path.exists(final_dir):
+            old_dir = os.path.join(self.db_dir, f'.old-{name}')
+            os.replace(final_dir, old_dir)
+            os.replace(tmp_dir, final_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, final_dir)
+
+    def add_user(self, name, emp_id, avg_encoding, multi_encodings, images=None):
+        with self.lock:
+            users = self.list_users()
+            self._check_emp_ids(users, [FaceRecord(name, emp_id, avg_encoding, multi_encodings)])
+            self._write_user_dir(name, avg_encoding, multi_encodings, images)
+            users[name] = emp_id
+            self._write_users(users)
+            self._record_changes([('add', name)])
+
+    def add_users(self, records, images=None):
+        # One users.json rewrite and one change-log append for the whole batch
+        with self.lock:
+            users = self.list_users()
+            self._check_emp_ids(users, records)
+            for record in records:
+                self._write_user_dir(record.name, record.avg_encoding, record.multi_encodings,
+                                     (images or {}).get(record.name))
+                users[record.name] = record.emp_id
+            self._write_users(users)
+            self._record_changes([('add', record.name) for record in records])
+
+    @staticmethod
+    def _check_emp_ids(users, records):
+        names_by_emp_id = {str(emp_id): name for name, emp_id in users.items()}
+        check_emp_ids(records, names_by_emp_id.get)
+
+    def delete_user(self, name):
+        with self.lock:
+            shutil.rmtree(self.user_dir(name), ignore_errors=True)
+            users = self.list_users()
+            if users.pop(name, None) is not None:
+                self._write_users(users)
+            self._record_changes([('delete', name)])
+
+    def put_images(self, name, images):
+        # Same lock as add_user: _write_user_dir swaps the whole folder out
+        with self.lock:
+            user_dir = self.user_dir(name)
+            if not os.path.isdir(user_dir):
+                raise KeyError(f"No such user: {name}")
+            write_container(os.path.join(user_dir, CONTAINER_NAME), images)
+            for entry in os.listdir(user_dir):
+                if entry.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                    os.remove(os.path.join(user_dir, entry))
+
+    def get_images(self, name):
+        user_dir = self.user_dir(name)
+        container = os.path.join(user_dir, CONTAINER_NAME)
+        if os.path.exists(container):
+            return read_container(container)[0]
+        images = {}
+        if os.path.isdir(user_dir):
+            for entry in sorted(os.listdir(user_dir)):
+                if entry.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                    with open(os.path.join(user_dir, entry), 'rb') as f:
+                        images[os.path.splitext(entry)[0].lower()] = f.read()
+        return images
+
+    def load_gallery(self):
+        users = self.list_users()
+        records = [self._read_record(name, users.get(name, "N/A")) for name in self._user_folders()]
+        return build_gallery_data(records)
+
+    def _record_changes(self, changes):
+        with open(self.changes_file, 'a') as f:
+            for op, name in changes:
+                f.write(json.dumps({'op': op, 'name': name, 'time': time.time()}) + '\n')
+
+    def changes_since(self, token):
+        token = token or 0
+        if not os.path.exists(self.changes_file):
+            return [], 0
+        with open(self.changes_file, 'r') as f:
+            lines = f.readlines()
+        changes = []
+        for line in lines[token:]:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            changes.append((record['op'], record['name']))
+        return changes, len(lines)
+
+    def fingerprint(self):
+        """
+        Adding/removing a user folder changes the directory mtime; every write
+        through the store rewrites users.json and appends to .changes.jsonl,
+        whose contents are hashed too, so a change that keeps the mtime (and
+        size) is still noticed. Not covered: files edited by hand inside a
+        user folder without going through the store - delete
+        .gallery/CURRENT (or call GalleryCache.rebuild) after doing that.
+        """
+        parts = []
+        for path in (self.db_dir, self.users_file, self.changes_file):
+            try:
+                stat = os.stat(path)
+                parts.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+            except OSError:
+                parts.append('-')
+        digest = hashlib.blake2b(digest_size=16)
+        for path in (self.users_file, self.changes_file):
+            try:
+                with open(path, 'rb') as f:
+                    # The change log only grows; its size plus the last block identify its contents
+                    f.seek(max(0, os.path.getsize(path) - 65536) if path == self.changes_file else 0)
+                    digest.update(f.read())
+            except OSError:
+                pass
+        parts.append(digest.hexdigest())
+        return '|'.join(parts)
+
+
+class SQLiteFaceStore(FaceStore):
+    """
+    Single-file store. WAL mode lets the app read while a registration or
+    bulk import writes. users is keyed by name with a unique index on
+    emp_id; encodings are stored in the binary float32 format.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            name TEXT PRIMARY KEY,
+            emp_id TEXT NOT NULL,
+            avg_encoding BLOB NOT NULL,
+            multi_encodings BLOB,
+            updated_at REAL NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS users_emp_id ON users (emp_id);
+        CREATE TABLE IF NOT EXISTS pose_images (
+            name TEXT NOT NULL,
+            pose TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (name, pose)
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            name TEXT NOT NULL,
+            changed_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path='face_store.sqlite3'):
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            self.local.conn = conn
+        return conn
+
+    def list_users(self):
+        rows = self._conn().execute("SELECT name, emp_id FROM users;").fetchall()
+        return dict(rows)
+
+    def get_user(self, name):
+        row = self._conn().execute(
+            "SELECT name, emp_id, avg_encoding, multi_encodings FROM users WHERE name = ?;", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return FaceRecord(row[0], row[1], decode_encoding(row[2]), list(decode_many(row[3])))
+
+    def get_user_by_emp_id(self, emp_id):
+        row = self._conn().execute("SELECT name FROM users WHERE emp_id = ?;", (str(emp_id),)).fetchone()
+        return self.get_user(row[0]) if row else None
+
+    def add_user(self, name, emp_id, avg_encoding, multi_encodings, images=None):
+        self.add_users([FaceRecord(name, emp_id, avg_encoding, multi_encodings)],
+                       {name: images} if images else None)
+
+    def add_users(self, records, images=None):
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            self._check_emp_ids(conn, records)
+            # Upsert by name only: INSERT OR REPLACE would also silently delete another
+            # user holding the same emp_id (unique index) without a change record
+            conn.executemany(
+                "INSERT INTO users (name, emp_id, avg_encoding, multi_encodings, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET emp_id = excluded.emp_id, avg_encoding = excluded.avg_encoding, "
+                "multi_encodings = excluded.multi_encodings, updated_at = excluded.updated_at;",
+                [(r.name, str(r.emp_id), encode_encoding(r.avg_encoding), encode_many(r.multi_encodings), now)
+                 for r in records]
+            )
+            for name, poses in (images or {}).items():
+                conn.executemany(
+                    "INSERT OR REPLACE INTO pose_images (name, pose, data) VALUES (?, ?, ?);",
+                    [(name, pose, data) for pose, data in poses.items()]
+                )
+            conn.executemany("INSERT INTO changes (op, name, changed_at) VALUES ('add', ?, ?);",
+                             [(r.name, now) for r in records])
+
+    @staticmethod
+    def _check_emp_ids(conn, records):
+        def registered_name(emp_id):
+            row = conn.execute("SELECT name FROM users WHERE emp_id = ?;", (emp_id,)).fetchone()
+            return row[0] if row else None
+        check_emp_ids(records, registered_name)
+
+    def delete_user(self, name):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM users WHERE name = ?;", (name,))
+            conn.execute("DELETE FROM pose_images WHERE name = ?;", (name,))
+            conn.execute("INSERT INTO changes (op, name, changed_at) VALUES ('delete', ?, ?);", (name, time.time()))
+
+    def put_images(self, name, images):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM pose_images WHERE name = ?;", (name,))
+            conn.executemany("INSERT INTO pose_images (name, pose, data) VALUES (?, ?, ?);",
+                             [(name, pose, data) for pose, data in images.items()])
+
+    def get_images(self, name):
+        rows = self._conn().execute("SELECT pose, data FROM pose_images WHERE name = ?;", (name,)).fetchall()
+        return {pose: bytes(data) for pose, data in rows}
+
+    def load_gallery(self):
+        conn = self._conn()
+        n = conn.execute("SELECT count(*) FROM users;").fetchone()[0]
+        names, emp_ids = [], []
+        avg = np.empty((n, ENCODING_DIM), dtype=np.float32)
+        multi_blocks, owners = [], []
+        for i, (name, emp_id, avg_blob, multi_blob) in enumerate(conn.execute(
+                "SELECT name, emp_id, avg_encoding, multi_encodings FROM users ORDER BY name;")):
+            if i >= n:
+                break
+            names.append(name)
+            emp_ids.append(emp_id)
+            decode_encoding(avg_blob, out=avg[i])
+            if multi_blob:
+                block = decode_many(multi_blob)
+                multi_blocks.append(block)
+                owners.append(np.full(len(block), i, dtype=np.int32))
+        count = len(names)
+        multi = np.concatenate(multi_blocks) if multi_blocks else np.empty((0, ENCODING_DIM), dtype=np.float32)
+        owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int32)
+        return GalleryData(names, emp_ids, avg[:count], multi, owner)
+
+    def changes_since(self, token):
+        rows = self._conn().execute(
+            "SELECT seq, op, name FROM changes WHERE seq > ? ORDER BY seq;", (token or 0,)
+        ).fetchall()
+        new_token = rows[-1][0] if rows else (token or 0)
+        return [(op, name) for _, op, name in rows], new_token
+
+    def fingerprint(self):
+        row = self._conn().execute("SELECT max(seq) FROM changes;").fetchone()
+        return f'sqlite:{row[0] or 0}'
+
+
+class PostgresFaceStore(FaceStore):
+    """
+    Store backed by the PostgreSQL database in DatabaseModel (pooled
+    connections). Uses its own face_store_* tables, created on first use.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS face_store_users (
+            name TEXT PRIMARY KEY,
+            emp_id TEXT NOT NULL UNIQUE,
+            avg_encoding BYTEA NOT NULL,
+            multi_encodings BYTEA,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        CREATE TABLE IF NOT EXISTS face_store_images (
+            name TEXT NOT NULL,
+            pose TEXT NOT NULL,
+            data BYTEA NOT NULL,
+            PRIMARY KEY (name, pose)
+        );
+        CREATE TABLE IF NOT EXISTS face_store_changes (
+            seq BIGSERIAL PRIMARY KEY,
+            op TEXT NOT NULL,
+            name TEXT NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """
+
+    def __init__(self):
+        from DatabaseModel.DBInstanceProvider import connection
+        self.connection = connection
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(self.SCHEMA)
+
+    def _query(self, query, params=None, fetch=True):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall() if fetch else None
+
+    def list_users(self):
+        return dict(self._query("SELECT name, emp_id FROM face_store_users;"))
+
+    def get_user(self, name):
+        rows = self._query("SELECT name, emp_id, avg_encoding, multi_encodings FROM face_store_users "
+                           "WHERE name = %s;", (name,))
+        if not rows:
+            return None
+        name, emp_id, avg_blob, multi_blob = rows[0]
+        return FaceRecord(name, emp_id, decode_encoding(avg_blob), list(decode_many(multi_blob)))
+
+    def add_user(self, name, emp_id, avg_encoding, multi_encodings, images=None):
+        self.add_users([FaceRecord(name, emp_id, avg_encoding, multi_encodings)],
+                       {name: images} if images else None)
+
+    def add_users(self, records, images=None):
+        from psycopg2 import Binary, errors
+        from psycopg2.extras import execute_values
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT emp_id, name FROM face_store_users WHERE emp_id = ANY(%s);",
+                            ([str(r.emp_id) for r in records],))
+                check_emp_ids(records, dict(cur.fetchall()).get)
+                try:
+                    execute_values(cur, """
+                        INSERT INTO face_store_users (name, emp_id, avg_encoding, multi_encodings)
+                        VALUES %s
+                        ON CONFLICT (name) DO UPDATE SET
+                            emp_id = EXCLUDED.emp_id,
+                            avg_encoding = EXCLUDED.avg_encoding,
+                            multi_encodings = EXCLUDED.multi_encodings,
+                            updated_at = now();
+                    """, [(r.name, str(r.emp_id), Binary(encode_encoding(r.avg_encoding)),
+                           Binary(encode_many(r.multi_encodings))) for r in records])
+                except errors.UniqueViolation as e:
+                    # Conflicts on name are upserts, so this is emp_id (registered concurrently)
+                    raise DuplicateEmpIdError(f"Emp ID already registered: {e.diag.message_detail}") from e
+                image_rows = [(name, pose, Binary(data))
+                              for name, poses in (images or {}).items() for pose, data in poses.items()]
+                if image_rows:
+                    execute_values(cur, """
+                        INSERT INTO face_store_images (name, pose, data) VALUES %s
+                        ON CONFLICT (name, pose) DO UPDATE SET data = EXCLUDED.data;
+                    """, image_rows)
+                execute_values(cur, "INSERT INTO face_store_changes (op, name) VALUES %s;",
+                               [('add', r.name) for r in records])
+
+    def delete_user(self, name):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM face_store_users WHERE name = %s;", (name,))
+                cur.execute("DELETE FROM face_store_images WHERE name = %s;", (name,))
+                cur.execute("INSERT INTO face_store_changes (op, name) VALUES ('delete', %s);", (name,))
+
+    def put_images(self, name, images):
+        from psycopg2 import Binary
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM face_store_images WHERE name = %s;", (name,))
+                cur.executemany("INSERT INTO face_store_images (name, pose, data) VALUES (%s, %s, %s);",
+                                [(name, pose, Binary(data)) for pose, data in images.items()])
+
+    def get_images(self, name):
+        rows = self._query("SELECT pose, data FROM face_store_images WHERE name = %s;", (name,))
+        return {pose: bytes(data) for pose, data in rows}
+
+    def load_gallery(self):
+        names, emp_ids, avg_rows, multi_blocks, owners = [], [], [], [], []
+        with self.connection() as conn:
+            with conn.cursor(name='face_store_gallery') as cur:
+                cur.itersize = 5000
+                cur.execute("SELECT name, emp_id, avg_encoding, multi_encodings FROM face_store_users "
+                            "ORDER BY name;")
+                for i, (name, emp_id, avg_blob, multi_blob) in enumerate(cur):
+                    names.append(name)
+                    emp_ids.append(emp_id)
+                    avg_rows.append(decode_encoding(avg_blob))
+                    if multi_blob:
+                        block = decode_many(multi_blob)
+                        multi_blocks.append(block)
+                        owners.append(np.full(len(block), i, dtype=np.int32))
+        avg = np.vstack(avg_rows) if avg_rows else np.empty((0, ENCODING_DIM), dtype=np.float32)
+        multi = np.concatenate(multi_blocks) if multi_blocks else np.empty((0, ENCODING_DIM), dtype=np.float32)
+        owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int32)
+        return GalleryData(names, emp_ids, avg, multi, owner)
+
+    def changes_since(self, token):
+        rows = self._query("SELECT seq, op, name FROM face_store_changes WHERE seq > %s ORDER BY seq;",
+                           (token or 0,))
+        new_token = rows[-1][0] if rows else (token or 0)
+        return [(op, name) for _, op, name in rows], new_token
+
+    def fingerprint(self):
+        rows = self._query("SELECT max(seq) FROM face_store_changes;")
+        return f'postgres:{rows[0][0] or 0}'
+
+
+def open_face_store(kind='filesystem', location='face_db'):
+    """Factory used by the app: kind is 'filesystem', 'sqlite' or 'postgres'"""
+    if kind == 'filesystem':
+        return FilesystemFaceStore(location)
+    if kind == 'sqlite':
+        return SQLiteFaceStore(location)
+    if kind == 'postgres':
+        return PostgresFaceStore()
+    raise ValueError(f"Unknown face store: {kind}")
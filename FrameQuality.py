@@ -0,0 +1,117 @@
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Quality of one frame, measured on a small grayscale copy (about 1 ms per frame):
+#   sharpness   variance of the Laplacian (motion blur / out of focus -> low)
+#   brightness  mean gray level 0-255
+#   contrast    gray level standard deviation
+#   face_size   height of the last known face box as a fraction of the frame (None if unknown)
+#   score       higher is better; 0 for hopeless frames
+#   reason      why a frame is hopeless, else None
+FrameScore = namedtuple('FrameScore', 'score sharpness brightness contrast face_size reason')
+
+POOR_FRAME_MESSAGE = "The camera image is too dark or blurry. Please face the camera and hold still."
+
+SCORE_WIDTH = 160
+MIN_SHARPNESS = 8.0
+MIN_BRIGHTNESS = 25
+MAX_BRIGHTNESS = 235
+MIN_CONTRAST = 6.0
+MIN_FACE_SIZE = 0.08
+
+
+def score_frame(frame, face_location=None):
+    """
+    Cheap quality score. If face_location (top, right, bottom, left) from a
+    recent detection is given, sharpness and exposure are measured on that
+    region, which is what the encoder will actually look at.
+    """
+    height, width = frame.shape[:2]
+    scale = SCORE_WIDTH / float(width)
+    small = cv2.resize(frame, (SCORE_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    face_size = None
+    region = gray
+    if face_location is not None:
+        top, right, bottom, left = (int(v * scale) for v in face_location)
+        face_size = (bottom - top) / float(gray.shape[0])
+        crop = gray[max(0, top):bottom, max(0, left):right]
+        if crop.size >= 64:
+            region = crop
+
+    sharpness = float(cv2.Laplacian(region, cv2.CV_64F).var())
+    brightness = float(region.mean())
+    contrast = float(region.std())
+
+    reason = None
+    if brightness < MIN_BRIGHTNESS:
+        reason = 'too_dark'
+    elif brightness > MAX_BRIGHTNESS:
+        reason = 'too_bright'
+    elif contrast < MIN_CONTRAST:
+        reason = 'no_contrast'
+    elif sharpness < MIN_SHARPNESS:
+        reason = 'blurred'
+    elif face_size is not None and face_size < MIN_FACE_SIZE:
+        reason = 'face_too_small'
+    if reason is not None:
+        return FrameScore(0.0, sharpness, brightness, contrast, face_size, reason)
+
+    # Best exposure around mid-gray; blur matters most
+    exposure = 1.0 - abs(brightness - 128.0) / 128.0
+    size = 1.0 if face_size is None else min(1.0, face_size / 0.3)
+    score = np.log1p(sharpness) * (0.5 + 0.5 * exposure) * (0.5 + 0.5 * size)
+    return FrameScore(float(score), sharpness, brightness, contrast, face_size, None)
+
+
+class BurstSelector:
+    """
+    Picks the best of the last burst_size webcam frames before the expensive
+    detection/encoding/liveness work runs, and rejects bursts in which every
+    frame is hopeless (too dark, blurred, ...) without running any detector.
+
+    Face size comes from the last face box RecognitionHandler found, if it
+    is recent; the frames themselves are only measured, never searched.
+    """
+
+    def __init__(self, webcam, recognition_handler=None, burst_size=5, max_age_ms=400, face_box_ttl=5.0):
+        self.webcam = webcam
+        self.recognition = recognition_handler
+        self.burst_size = burst_size
+        self.max_age_ms = max_age_ms
+        self.face_box_ttl = face_box_ttl
+        self.rejected = 0
+        self.selected = 0
+
+    def _face_location(self, shape):
+        last = getattr(self.recognition, 'last_face_location', None)
+        if last is None:
+            return None
+        location, frame_shape, seen_at = last
+        if frame_shape != shape or time.time() - seen_at > self.face_box_ttl:
+            return None
+        return location
+
+    def pick(self, fallback_frame=None):
+        """Returns (frame, FrameScore); frame is None if the whole burst is hopeless"""
+        frames = self.webcam.get_recent_frames(self.burst_size, self.max_age_ms)
+        if not frames and fallback_frame is not None:
+            frames = [fallback_frame]
+        if not frames:
+            return None, None
+
+        best_frame, best_score = None, None
+        for frame in frames:
+            score = score_frame(frame, self._face_location(frame.shape))
+            if best_score is None or score.score > best_score.score:
+                best_frame, best_score = frame, score
+
+        if best_score.reason is not None:
+            self.rejected += 1
+            return None, best_score
+        self.selected += 1
+        return best_frame, best_score
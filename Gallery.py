@@ -0,0 +1,480 @@
+import threading
+
+import numpy as np
+
+from GalleryCompaction import PoseCodec, reduce_prototypes
+
+ENCODING_DIM = 128
+
+
+class _Storage:
+    """
+    Append-only arrays shared by consecutive snapshots.
+
+    A snapshot only ever looks at rows below its own count, so appending a
+    row beyond that count does not disturb readers of older snapshots. When
+    capacity runs out the arrays are copied into larger ones (doubling), which
+    keeps appends amortized O(1); older snapshots keep the old arrays.
+    """
+
+    def __init__(self, capacity=64, multi_capacity=320, dim=ENCODING_DIM, codec=None):
+        self.avg = np.zeros((capacity, dim), dtype=np.float32)
+        # Pose encodings may be held compactly (float16 / int8), see GalleryCompaction.PoseCodec
+        self.codec = codec or PoseCodec()
+        self.max_prototypes = None  # if set, new identities keep at most this many pose prototypes
+        self.multi = np.zeros((multi_capacity, dim), dtype=self.codec.storage_dtype)
+        self.multi_owner = np.zeros(multi_capacity, dtype=np.int32)
+        # Pose encodings of one identity are contiguous: rows pose_start[i]:pose_start[i] + pose_count[i]
+        self.pose_start = np.zeros(capacity, dtype=np.int64)
+        self.pose_count = np.zeros(capacity, dtype=np.int32)
+        self.names = []
+        self.emp_ids = []
+        self.index = {}  # name -> most recently appended row (shared, see GallerySnapshot.row_of)
+        self.read_only = False  # mapped arrays (see mapped()); appending copies first
+
+    @classmethod
+    def mapped(cls, arrays, dim=ENCODING_DIM):
+        """
+        Read-only storage directly over the arrays of a GalleryCache version
+        (np.load(mmap_mode='r')), including its pose slices and name index,
+        so nothing is copied or rebuilt per identity.
+        """
+        storage = cls(0, 0, dim)
+        storage.avg = arrays['avg']
+        storage.multi = arrays['multi']
+        storage.multi_owner = arrays['multi_owner']
+        storage.pose_start = arrays['pose_start']
+        storage.pose_count = arrays['pose_count']
+        storage.names = arrays['names']
+        storage.emp_ids = arrays['emp_ids']
+        storage.index = _SortedIndex(arrays['names_sorted'], arrays['name_order'])
+        storage.read_only = True
+        return storage
+
+
+class _SortedIndex:
+    """name -> row lookup by binary search over a persisted, sorted copy of the names"""
+
+    def __init__(self, sorted_names, order):
+        self.sorted_names = sorted_names
+        self.order = order  # row of each sorted name (stable sort: duplicates in row order)
+
+    def get(self, name, default=None):
+        pos = int(np.searchsorted(self.sorted_names, name, side='right')) - 1
+        if pos >= 0 and self.sorted_names[pos] == name:
+            return int(self.order[pos])
+        return default
+
+
+class GallerySnapshot:
+    """
+    Immutable view of the gallery at one point in time.
+
+    RecognitionHandler publishes a new snapshot by rebinding a single
+    attribute, so readers (login, logout, TimerManager threads) just grab
+    handler.gallery once and use it without locks; they can never see
+    encodings and names from different versions.
+
+    with_identity()/without_identity() return a new snapshot in O(1)
+    amortized time: new rows are appended to shared storage and deletions are
+    recorded as a small set of dead rows that searches mask out. compacted()
+    rebuilds dense storage once too many rows are dead.
+    """
+
+    def __init__(self, storage, count, multi_count, deleted=frozenset(), dim=ENCODING_DIM):
+        self._storage = storage
+        self.count = count
+        self.multi_count = multi_count
+        self.deleted = deleted
+        self.dim = dim
+        self._cache = {}
+
+    @classmethod
+    def empty(cls, dim=ENCODING_DIM):
+        return cls(_Storage(dim=dim), 0, 0, dim=dim)
+
+    @classmethod
+    def from_gallery_data(cls, data, dim=ENCODING_DIM):
+        """Build from FaceStore.GalleryData (copies into fresh storage once)"""
+        n, m = len(data.names), len(data.multi_owner)
+        storage = _Storage(max(64, n * 2), max(320, m * 2), dim)
+        if n:
+            storage.avg[:n] = data.avg_encodings
+        if m:
+            # Group pose encodings by owner so each identity's poses are one slice
+            order = np.argsort(data.multi_owner, kind='stable')
+            storage.multi[:m] = storage.codec.encode(np.asarray(data.multi_encodings)[order])
+            storage.multi_owner[:m] = np.asarray(data.multi_owner)[order]
+        _index_poses(storage, n, m)
+        storage.names = _as_list(data.names)
+        storage.emp_ids = _as_list(data.emp_ids)
+        storage.index = {name: row for row, name in enumerate(storage.names)}
+        return cls(storage, n, m, dim=dim)
+
+    @classmethod
+    def from_mapped(cls, arrays, dim=ENCODING_DIM):
+        """Snapshot over a GalleryCache version without copying it (see _Storage.mapped)"""
+        return cls(_Storage.mapped(arrays, dim), len(arrays['names']), len(arrays['multi']), dim=dim)
+
+    @classmethod
+    def from_lists(cls, known_encodings, known_names, multi_encodings_dict=None, emp_ids=None, dim=ENCODING_DIM):
+        snapshot = cls.empty(dim)
+        multi_encodings_dict = multi_encodings_dict or {}
+        emp_ids = emp_ids or {}
+        for name, encoding in zip(known_names, known_encodings):
+            snapshot = snapshot.with_identity(name, emp_ids.get(name, "N/A"), encoding,
+                                              multi_encodings_dict.get(name, []))
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+
+    @property
+    def avg_encodings(self):
+        return self._storage.avg[:self.count]
+
+    @property
+    def pose_codec(self):
+        return self._storage.codec
+
+    @property
+    def multi_encodings(self):
+        """All pose encodings as float32 (decoded copy if the gallery is compacted)"""
+        return self._storage.codec.decode(self._storage.multi[:self.multi_count])
+
+    def _pose_distances(self, query):
+        return self._storage.codec.distances(self._storage.multi[:self.multi_count], query)
+
+    @property
+    def multi_owner(self):
+        return self._storage.multi_owner[:self.multi_count]
+
+    def name(self, row):
+        return self._storage.names[row]
+
+    def emp_id(self, row):
+        return self._storage.emp_ids[row]
+
+    def __len__(self):
+        return self.count - len(self.deleted)
+
+    def row_of(self, name):
+        row = self._storage.index.get(name)
+        if row is None:
+            # Never appended to this storage, so not in any snapshot sharing it
+            return None
+        if row >= self.count or row in self.deleted:
+            # The shared index may already point at a row a newer snapshot
+            # appended (name replaced or re-added); look in our own rows
+            return self._scan_row_of(name)
+        return row
+
+    def _scan_row_of(self, name):
+        rows = self._cache.setdefault('scanned_rows', {})
+        if name not in rows:
+            names = self._storage.names
+            rows[name] = next((row for row in range(self.count - 1, -1, -1)
+                               if names[row] == name and row not in self.deleted), None)
+        return rows[name]
+
+    def emp_id_of(self, name, default="N/A"):
+        row = self.row_of(name)
+        return default if row is None else self._storage.emp_ids[row]
+
+    def alive(self):
+        """Boolean mask over rows (None if nothing was deleted)"""
+        if not self.deleted:
+            return None
+        if 'alive' not in self._cache:
+            mask = np.ones(self.count, dtype=bool)
+            mask[list(self.deleted)] = False
+            self._cache['alive'] = mask
+        return self._cache['alive']
+
+    def multi_alive(self):
+        if not self.deleted:
+            return None
+        if 'multi_alive' not in self._cache:
+            self._cache['multi_alive'] = ~np.isin(self.multi_owner, list(self.deleted))
+        return self._cache['multi_alive']
+
+    def pose_encodings(self, row):
+        """Pose encodings of one identity (a view, no search)"""
+        start = self._storage.pose_start[row]
+        return self._storage.codec.decode(self._storage.multi[start:start + self._storage.pose_count[row]])
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def avg_distances(self, encoding):
+        """Distance to every row's average encoding (dead rows are inf)"""
+        distances = np.linalg.norm(self.avg_encodings - np.asarray(encoding, dtype=np.float32), axis=1)
+        alive = self.alive()
+        if alive is not None:
+            distances[~alive] = np.inf
+        return distances
+
+    def nearest(self, encoding, k=1):
+        """[(name, emp_id, distance)] for the k closest identities by average encoding"""
+        if len(self) == 0:
+            return []
+        distances = self.avg_distances(encoding)
+        k = min(k, len(self))
+        rows = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        rows = rows[np.argsort(distances[rows])]
+        return [(self.name(r), self.emp_id(r), float(distances[r])) for r in rows if np.isfinite(distances[r])]
+
+    def identity_distances(self, encoding):
+        """Per row, the smaller of the average-encoding and closest pose-encoding distance"""
+        distances = self.avg_distances(encoding)
+        if self.multi_count:
+            np.minimum.at(distances, self.multi_owner, self._pose_distances(encoding))
+            alive = self.alive()
+            if alive is not None:
+                distances[~alive] = np.inf
+        return distances
+
+    def identity_distance_matrix(self, encodings):
+        """(len(encodings), count) matrix of identity_distances for a batch of queries"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        distances = pairwise_distances(queries, self.avg_encodings)
+        if self.multi_count:
+            # Block by block so a compact gallery is never decoded as a whole
+            query_rows = np.arange(len(queries))[:, None]
+            for start, block in self._storage.codec.blocks(self._storage.multi[:self.multi_count]):
+                owners = self.multi_owner[start:start + len(block)]
+                np.minimum.at(distances, (query_rows, owners[None, :]), pairwise_distances(queries, block))
+        alive = self.alive()
+        if alive is not None:
+            distances[:, ~alive] = np.inf
+        return distances
+
+    def nearest_identities(self, encoding, k=3):
+        """[(name, emp_id, distance)] for the k closest identities over average and pose encodings"""
+        if len(self) == 0:
+            return []
+        distances = self.identity_distances(encoding)
+        k = min(k, len(self))
+        rows = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        rows = rows[np.argsort(distances[rows])]
+        return [(self.name(r), self.emp_id(r), float(distances[r])) for r in rows if np.isfinite(distances[r])]
+
+    def nearest_cascade(self, encoding, shortlist=10):
+        """
+        Coarse-to-fine match, (name, emp_id, distance) or None: shortlist the
+        closest identities by average encoding, then re-rank only those by
+        their pose encodings. distance is the closest pose distance (the
+        average distance for identities without poses), so results are
+        comparable with nearest_multi() while reading N + shortlist * poses
+        rows instead of every pose encoding.
+        """
+        if len(self) == 0:
+            return None
+        query = np.asarray(encoding, dtype=np.float32)
+        avg_distances = self.avg_distances(query)
+        k = min(shortlist, len(self))
+        rows = np.argpartition(avg_distances, k - 1)[:k] if k < len(avg_distances) else np.arange(len(avg_distances))
+        rows = rows[np.isfinite(avg_distances[rows])]
+
+        starts = self._storage.pose_start[rows]
+        counts = self._storage.pose_count[rows].astype(np.int64)
+        best_distances = avg_distances[rows].copy()
+        has_poses = counts > 0
+        if has_poses.any():
+            pose_rows = np.concatenate([np.arange(s, s + c) for s, c in zip(starts[has_poses], counts[has_poses])])
+            pose_distances = np.linalg.norm(self._storage.codec.decode(self._storage.multi[pose_rows]) - query, axis=1)
+            offsets = np.concatenate([[0], np.cumsum(counts[has_poses])[:-1]])
+            best_distances[has_poses] = np.minimum.reduceat(pose_distances, offsets)
+        best = int(np.argmin(best_distances))
+        row = int(rows[best])
+        return self.name(row), self.emp_id(row), float(best_distances[best])
+
+    def nearest_multi(self, encoding):
+        """(name, emp_id, distance) of the closest pose encoding, or None"""
+        if self.multi_count == 0:
+            return None
+        distances = self._pose_distances(encoding)
+        alive = self.multi_alive()
+        if alive is not None:
+            distances[~alive] = np.inf
+        best = int(np.argmin(distances))
+        if not np.isfinite(distances[best]):
+            return None
+        row = int(self.multi_owner[best])
+        return self.name(row), self.emp_id(row), float(distances[best])
+
+    # ------------------------------------------------------------------
+    # Updates (return new snapshots)
+    # ------------------------------------------------------------------
+
+    def with_identity(self, name, emp_id, avg_encoding, multi_encodings=()):
+        """New snapshot with one identity added (replacing an existing one of the same name)"""
+        base = self
+        if self.row_of(name) is not None:
+            base = self.without_identity(name)
+
+        storage = base._storage
+        n, m = base.count, base.multi_count
+        multi = np.asarray(multi_encodings, dtype=np.float32).reshape(-1, self.dim)
+        if storage.max_prototypes and len(multi):
+            multi = np.asarray(reduce_prototypes(multi, storage.max_prototypes), dtype=np.float32)
+
+        codec = storage.codec.widened(multi)
+        if codec is not storage.codec:
+            print(f"Pose encodings of {name} exceed the {codec.dtype} scales - re-encoding the gallery")
+        if (n >= len(storage.avg) or m + len(multi) > len(storage.multi) or len(storage.names) != n
+                or codec is not storage.codec or storage.read_only):
+            storage = base._grown_storage(len(multi), codec)
+
+        storage.avg[n] = avg_encoding
+        storage.multi[m:m + len(multi)] = storage.codec.encode(multi)
+        storage.multi_owner[m:m + len(multi)] = n
+        storage.pose_start[n] = m
+        storage.pose_count[n] = len(multi)
+        storage.names.append(name)
+        storage.emp_ids.append(emp_id)
+        storage.index[name] = n
+        return GallerySnapshot(storage, n + 1, m + len(multi), base.deleted, self.dim)
+
+    def without_identity(self, name):
+        row = self.row_of(name)
+        if row is None:
+            return self
+        return GallerySnapshot(self._storage, self.count, self.multi_count, self.deleted | {row}, self.dim)
+
+    def _grown_storage(self, extra_multi, codec=None):
+        """
+        Copy into fresh storage with room to grow. Also used when the shared
+        storage has already been appended to by a newer snapshot, and to
+        re-encode the poses with a different codec.
+        """
+        old = self._storage
+        n, m = self.count, self.multi_count
+        codec = codec or old.codec
+        storage = _Storage(max(64, (n + 1) * 2), max(320, (m + extra_multi) * 2), self.dim, codec)
+        storage.max_prototypes = old.max_prototypes
+        storage.avg[:n] = old.avg[:n]
+        if codec is old.codec:
+            storage.multi[:m] = old.multi[:m]
+        else:
+            for start, block in old.codec.blocks(old.multi[:m]):
+                storage.multi[start:start + len(block)] = codec.encode(block)
+        storage.multi_owner[:m] = old.multi_owner[:m]
+        storage.pose_start[:n] = old.pose_start[:n]
+        storage.pose_count[:n] = old.pose_count[:n]
+        # Mapped storage holds names as a NumPy array; appends need lists
+        storage.names = _as_list(old.names[:n])
+        storage.emp_ids = _as_list(old.emp_ids[:n])
+        storage.index = {name: row for row, name in enumerate(storage.names) if row not in self.deleted}
+        return storage
+
+    def needs_compaction(self, ratio=0.25):
+        return len(self.deleted) > max(16, ratio * self.count)
+
+    def compacted(self, pose_dtype=None, max_prototypes=None):
+        """
+        Dense copy without dead rows (O(N), run occasionally). Optionally
+        reduces every identity's poses to at most max_prototypes prototypes
+        and re-encodes poses as pose_dtype ('float32', 'float16', 'int8');
+        both default to the gallery's current settings.
+        """
+        old = self._storage
+        pose_dtype = pose_dtype or old.codec.dtype
+        if max_prototypes is None:
+            max_prototypes = old.max_prototypes
+
+        alive_rows = self.live_rows()
+        n = len(alive_rows)
+        poses = []
+        for row in alive_rows:
+            encodings = self.pose_encodings(row)
+            if max_prototypes and len(encodings):
+                encodings = np.asarray(reduce_prototypes(encodings, max_prototypes), dtype=np.float32)
+            poses.append(encodings.reshape(-1, self.dim))
+        counts = [len(p) for p in poses]
+        m = sum(counts)
+        all_poses = np.concatenate(poses) if m else np.empty((0, self.dim), dtype=np.float32)
+
+        codec = PoseCodec.fit(all_poses, pose_dtype)
+        storage = _Storage(max(64, n * 2), max(320, m * 2), self.dim, codec)
+        storage.max_prototypes = max_prototypes
+        storage.avg[:n] = self.avg_encodings[alive_rows]
+        storage.multi[:m] = codec.encode(all_poses)
+        storage.multi_owner[:m] = np.repeat(np.arange(n, dtype=np.int32), counts)
+        _index_poses(storage, n, m)
+        storage.names = [old.names[row] for row in alive_rows]
+        storage.emp_ids = [old.emp_ids[row] for row in alive_rows]
+        storage.index = {name: row for row, name in enumerate(storage.names)}
+        return GallerySnapshot(storage, n, m, dim=self.dim)
+
+    # ------------------------------------------------------------------
+    # Legacy list/dict views (built once per snapshot)
+    # ------------------------------------------------------------------
+
+    def live_rows(self):
+        if 'live_rows' not in self._cache:
+            self._cache['live_rows'] = [row for row in range(self.count) if row not in self.deleted]
+        return self._cache['live_rows']
+
+    @property
+    def known_names(self):
+        if 'names' not in self._cache:
+            self._cache['names'] = [self._storage.names[row] for row in self.live_rows()]
+        return self._cache['names']
+
+    @property
+    def known_encodings(self):
+        if 'encodings' not in self._cache:
+            self._cache['encodings'] = [self._storage.avg[row] for row in self.live_rows()]
+        return self._cache['encodings']
+
+    @property
+    def multi_encodings_dict(self):
+        if 'multi_dict' not in self._cache:
+            # Each identity's poses are one contiguous slice; decode just those
+            self._cache['multi_dict'] = {self._storage.names[row]: list(self.pose_encodings(row))
+                                         for row in self.live_rows()}
+        return self._cache['multi_dict']
+
+    @property
+    def emp_ids(self):
+        return {self._storage.names[row]: self._storage.emp_ids[row] for row in self.live_rows()}
+
+
+def _index_poses(storage, n, m):
+    """Fill pose_start/pose_count from multi_owner (which must be grouped by owner)"""
+    counts = np.bincount(storage.multi_owner[:m], minlength=n)[:n] if m else np.zeros(n, dtype=np.int64)
+    storage.pose_count[:n] = counts
+    storage.pose_start[:n] = np.concatenate([[0], np.cumsum(counts)[:-1]]) if n else []
+
+
+def _as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def pairwise_distances(a, b):
+    """Euclidean distances between every row of a and every row of b, via one matrix product"""
+    sq = np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :] - 2.0 * (a @ b.T)
+    return np.sqrt(np.maximum(sq, 0.0))
+
+
+class GalleryPublisher:
+    """
+    Holds the current GallerySnapshot. Writers are serialized by a lock;
+    readers just read .current.
+    """
+
+    def __init__(self, snapshot=None):
+        self.current = snapshot or GallerySnapshot.empty()
+        self._lock = threading.Lock()
+
+    def publish(self, update):
+        """Apply update(snapshot) -> snapshot under the writer lock and swap it in"""
+        with self._lock:
+            snapshot = update(self.current)
+            if snapshot.needs_compaction():
+                snapshot = snapshot.compacted()
+            self.current = snapshot
+            return snapshot
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from FaceStore import FaceStore, GalleryData
+from Gallery import GallerySnapshot
+
+
+class GalleryCache(FaceStore):
+    """
+    Wraps a FaceStore and serves load_gallery() from a compiled, memory-mapped
+    artifact instead of reading every user from the store.
+
+    Layout (cache_dir, default <db_dir>/.gallery for the filesystem store):
+        CURRENT                        name of the active version directory
+        v<timestamp>/avg.npy           (N, 128) float32
+        v<timestamp>/multi.npy         (M, 128) float32, grouped by owner
+        v<timestamp>/multi_owner.npy   (M,) int32, row in avg.npy
+        v<timestamp>/pose_start.npy    (N,) int64, first row of each identity's poses in multi.npy
+        v<timestamp>/pose_count.npy    (N,) int32
+        v<timestamp>/names.npy         (N,) unicode
+        v<timestamp>/emp_ids.npy       (N,) unicode
+        v<timestamp>/names_sorted.npy  (N,) unicode, names in sorted order (name index)
+        v<timestamp>/name_order.npy    (N,) int64, row of each sorted name
+        v<timestamp>/meta.json         store fingerprint the version was built from
+
+    Opening is a handful of np.load(mmap_mode='r') calls regardless of
+    headcount, and load_snapshot() serves the GallerySnapshot straight from
+    those mappings (see Gallery._Storage.mapped): nothing is copied or
+    re-indexed per identity, and every process mapping the same version
+    shares the same page-cache pages. The first identity added afterwards
+    copies the rows into private storage once. A new version is written next
+    to the old one and published by atomically replacing CURRENT, so readers
+    never see a half-written gallery. If the store's fingerprint differs
+    from the one in meta.json the artifact is rebuilt on load.
+    """
+
+    FILES = ('avg', 'multi', 'multi_owner', 'pose_start', 'pose_count', 'names', 'emp_ids',
+             'names_sorted', 'name_order')
+
+    def __init__(self, store, cache_dir=None, keep_versions=2):
+        self.store = store
+        if cache_dir is None:
+            base = getattr(store, 'db_dir', None)
+            cache_dir = os.path.join(base, '.gallery') if base else 'gallery_cache'
+        self.cache_dir = cache_dir
+        self.keep_versions = keep_versions
+        # Create the directory up front so it doesn't change the store fingerprint later
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # Everything except load_gallery goes straight to the wrapped store
+    def list_users(self):
+        return self.store.list_users()
+
+    def get_user(self, name):
+        return self.store.get_user(name)
+
+    def add_user(self, name, emp_id, avg_encoding, multi_encodings, images=None):
+        self.store.add_user(name, emp_id, avg_encoding, multi_encodings, images)
+
+    def add_users(self, records, images=None):
+        self.store.add_users(records, images)
+
+    def delete_user(self, name):
+        self.store.delete_user(name)
+
+    def put_images(self, name, images):
+        self.store.put_images(name, images)
+
+    def get_images(self, name):
+        return self.store.get_images(name)
+
+    def changes_since(self, token):
+        return self.store.changes_since(token)
+
+    def fingerprint(self):
+        return self.store.fingerprint()
+
+    def _current_dir(self):
+        try:
+            with open(os.path.join(self.cache_dir, 'CURRENT'), 'r') as f:
+                return os.path.join(self.cache_dir, f.read().strip())
+        except OSError:
+            return None
+
+    def _open(self, version_dir):
+        with open(os.path.join(version_dir, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(version_dir, f'{name}.npy'), mmap_mode='r') for name in self.FILES}
+        return meta, arrays
+
+    def _load_arrays(self):
+        version_dir = self._current_dir()
+        if version_dir is not None:
+            try:
+                meta, arrays = self._open(version_dir)
+                if meta.get('fingerprint') == self.store.fingerprint():
+                    return arrays
+                print("Face store changed - rebuilding gallery cache")
+            except Exception as e:
+                print(f"Gallery cache unreadable, rebuilding: {e}")
+        return self.rebuild()
+
+    def load_gallery(self):
+        arrays = self._load_arrays()
+        return GalleryData(arrays['names'], arrays['emp_ids'], arrays['avg'], arrays['multi'], arrays['multi_owner'])
+
+    def load_snapshot(self):
+        return GallerySnapshot.from_mapped(self._load_arrays())
+
+    def rebuild(self):
+        """Compile the store into a new version and publish it; returns the mapped arrays"""
+        started = time.time()
+        fingerprint = self.store.fingerprint()
+        gallery = self.store.load_gallery()
+
+        n = len(gallery.names)
+        owner = np.asarray(gallery.multi_owner, dtype=np.int32)
+        # Poses grouped by owner so each identity's poses are one slice
+        order = np.argsort(owner, kind='stable')
+        counts = np.bincount(owner, minlength=n)[:n].astype(np.int32) if len(owner) else np.zeros(n, dtype=np.int32)
+        starts = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)[:-1]]) if n else np.zeros(0)
+        names = np.asarray(gallery.names, dtype=str)
+        name_order = np.argsort(names, kind='stable')
+        arrays = {
+            'avg': np.ascontiguousarray(gallery.avg_encodings, dtype=np.float32),
+            'multi': np.ascontiguousarray(np.asarray(gallery.multi_encodings, dtype=np.float32)[order]),
+            'multi_owner': owner[order],
+            'pose_start': starts.astype(np.int64),
+            'pose_count': counts,
+            'names': names,
+            'emp_ids': np.asarray([str(e) for e in gallery.emp_ids], dtype=str),
+            'names_sorted': names[name_order],
+            'name_order': name_order.astype(np.int64),
+        }
+
+        version = f'v{time.time_ns()}'
+        version_dir = os.path.join(self.cache_dir, version)
+        os.makedirs(version_dir)
+        for name in self.FILES:
+            np.save(os.path.join(version_dir, f'{name}.npy'), arrays[name])
+        with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'count': n, 'built_at': time.time()}, f)
+
+        current_tmp = os.path.join(self.cache_dir, 'CURRENT.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(version)
+        os.replace(current_tmp, os.path.join(self.cache_dir, 'CURRENT'))
+        self._cleanup(version)
+
+        print(f"Gallery cache rebuilt: {n} users in {time.time() - started:.2f}s")
+        return self._open(version_dir)[1]
+
+    def _cleanup(self, current):
+        versions = sorted(d for d in os.listdir(self.cache_dir) if d.startswith('v') and d != current)
+        # Older versions may still be mapped by other processes; on POSIX that is fine
+        for old in versions[:max(0, len(versions) - (self.keep_versions - 1))]:
+            shutil.rmtree(os.path.join(self.cache_dir, old), ignore_errors=True)
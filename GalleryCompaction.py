@@ -0,0 +1,206 @@
+import argparse
+import time
+
+import numpy as np
+
+# Pose encodings decoded per block when scanning a compact matrix, so the
+# float32 temporary stays small no matter how large the gallery is
+DECODE_BLOCK = 32768
+
+
+class PoseCodec:
+    """
+    How pose encodings are held in memory:
+        float32  4 bytes/dim, exact
+        float16  2 bytes/dim, ~1e-3 relative error
+        int8     1 byte/dim, symmetric scalar quantization with one scale per
+                 dimension: value = code * scale[dim]
+
+    Scales are fitted when the gallery is compacted, with some headroom so
+    encodings added later usually fit. One that doesn't is not clipped:
+    GallerySnapshot.with_identity widens the scales (widened()) and
+    re-encodes the stored poses first.
+    """
+
+    DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+    def __init__(self, dtype='float32', scale=None):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unknown pose encoding dtype: {dtype}")
+        if dtype == 'int8' and scale is None:
+            raise ValueError("int8 codec needs per-dimension scales (use PoseCodec.fit)")
+        self.dtype = dtype
+        self.storage_dtype = self.DTYPES[dtype]
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, encodings, dtype='float32', headroom=1.25):
+        if dtype != 'int8':
+            return cls(dtype)
+        encodings = np.asarray(encodings, dtype=np.float32)
+        if len(encodings) == 0:
+            # Typical dlib encoding values stay well within +-0.5
+            return cls(dtype, np.full(encodings.shape[1] if encodings.ndim == 2 else 128, 0.5 / 127,
+                                      dtype=np.float32))
+        scale = np.abs(encodings).max(axis=0) * headroom / 127.0
+        return cls(dtype, np.maximum(scale, 1e-6))
+
+    @property
+    def exact(self):
+        return self.dtype == 'float32'
+
+    def bytes_per_encoding(self, dim):
+        return dim * np.dtype(self.storage_dtype).itemsize
+
+    def fits(self, encodings):
+        """True if encode() represents encodings without clipping"""
+        if self.dtype != 'int8' or len(encodings) == 0:
+            return True
+        return bool(np.abs(np.asarray(encodings, dtype=np.float32) / self.scale).max() <= 127)
+
+    def widened(self, encodings, headroom=1.25):
+        """int8 codec whose scales also cover encodings (self if they already fit)"""
+        if self.fits(encodings):
+            return self
+        needed = np.abs(np.asarray(encodings, dtype=np.float32)).max(axis=0) * headroom / 127.0
+        return PoseCodec(self.dtype, np.maximum(self.scale, needed))
+
+    def encode(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        if self.dtype == 'int8':
+            return np.clip(np.rint(encodings / self.scale), -127, 127).astype(np.int8)
+        return encodings.astype(self.storage_dtype)
+
+    def decode(self, codes):
+        if self.dtype == 'int8':
+            return codes.astype(np.float32) * self.scale
+        return codes.astype(np.float32, copy=False)
+
+    def blocks(self, codes):
+        """(start, float32 rows) over codes, at most DECODE_BLOCK rows at a time"""
+        if self.exact:
+            yield 0, codes
+            return
+        for start in range(0, len(codes), DECODE_BLOCK):
+            yield start, self.decode(codes[start:start + DECODE_BLOCK])
+
+    def distances(self, codes, query):
+        """Distances from query to every encoded row, decoding block by block"""
+        query = np.asarray(query, dtype=np.float32)
+        if self.exact:
+            return np.linalg.norm(codes - query, axis=1)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start, block in self.blocks(codes):
+            out[start:start + len(block)] = np.linalg.norm(block - query, axis=1)
+        return out
+
+
+def reduce_prototypes(encodings, max_prototypes=3, merge_distance=0.15):
+    """
+    Cluster one identity's pose encodings into at most max_prototypes
+    prototypes (cluster means). Near-duplicates closer than merge_distance
+    are merged even when under the limit. Greedy agglomerative merging of
+    the closest pair - fine for the handful of poses per user.
+    """
+    clusters = [[np.asarray(e, dtype=np.float32)] for e in encodings]
+    if len(clusters) <= 1:
+        return [c[0] for c in clusters]
+    centers = [c[0] for c in clusters]
+    while len(centers) > 1:
+        matrix = np.stack(centers)
+        distances = np.linalg.norm(matrix[:, None, :] - matrix[None, :, :], axis=2)
+        np.fill_diagonal(distances, np.inf)
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        if len(centers) <= max_prototypes and distances[i, j] >= merge_distance:
+            break
+        i, j = min(i, j), max(i, j)
+        clusters[i].extend(clusters.pop(j))
+        centers.pop(j)
+        centers[i] = np.mean(clusters[i], axis=0)
+    return centers
+
+
+def memory_report(snapshot):
+    """Bytes held by the live gallery, and what the same poses cost in other forms"""
+    poses = snapshot.multi_count
+    dim = snapshot.dim
+    return {
+        'identities': len(snapshot),
+        'pose_encodings': poses,
+        'pose_dtype': snapshot.pose_codec.dtype,
+        'pose_bytes': poses * snapshot.pose_codec.bytes_per_encoding(dim),
+        'pose_bytes_float64': poses * dim * 8,
+        'avg_bytes': snapshot.count * dim * 4,
+    }
+
+
+def accuracy_report(reference, compact, queries, tolerance=0.62):
+    """
+    Compare pose matching of a compacted snapshot with the reference one on
+    the same queries: identity agreement, accept/reject agreement at the
+    tolerance and the distance error.
+    """
+    agree = decision_agree = 0
+    errors = []
+    for query in queries:
+        expected = reference.nearest_multi(query)
+        actual = compact.nearest_multi(query)
+        if expected is None or actual is None:
+            agree += expected is actual
+            decision_agree += expected is actual
+            continue
+        agree += expected[0] == actual[0]
+        decision_agree += (expected[2] <= tolerance) == (actual[2] <= tolerance)
+        errors.append(abs(expected[2] - actual[2]))
+    count = max(1, len(queries))
+    return {
+        'queries': len(queries),
+        'identity_agreement': agree / count,
+        'decision_agreement': decision_agree / count,
+        'mean_distance_error': float(np.mean(errors)) if errors else 0.0,
+        'max_distance_error': float(np.max(errors)) if errors else 0.0,
+    }
+
+
+def print_report(reference, compact, queries):
+    before, after = memory_report(reference), memory_report(compact)
+    print(f"Identities: {after['identities']}")
+    print(f"Pose encodings: {before['pose_encodings']} -> {after['pose_encodings']} "
+          f"({before['pose_dtype']} -> {after['pose_dtype']})")
+    print(f"Pose memory: {before['pose_bytes'] / 1e6:.2f} MB -> {after['pose_bytes'] / 1e6:.2f} MB "
+          f"(float64 pickles: {before['pose_bytes_float64'] / 1e6:.2f} MB)")
+    accuracy = accuracy_report(reference, compact, queries)
+    print(f"Identity agreement on {accuracy['queries']} queries: {accuracy['identity_agreement']:.4f}, "
+          f"accept/reject agreement: {accuracy['decision_agreement']:.4f}")
+    print(f"Distance error: mean {accuracy['mean_distance_error']:.5f}, max {accuracy['max_distance_error']:.5f}")
+    return before, after, accuracy
+
+
+def report(args):
+    """Memory/accuracy report for compacting the gallery in a face store"""
+    from FaceStore import open_face_store
+    from Gallery import GallerySnapshot
+    store = open_face_store(args.store, args.location)
+    reference = GallerySnapshot.from_gallery_data(store.load_gallery())
+    started = time.time()
+    compact = reference.compacted(pose_dtype=args.dtype, max_prototypes=args.max_prototypes)
+    print(f"Compacted in {time.time() - started:.2f}s")
+    # Every stored pose, slightly perturbed, stands in for a new camera frame
+    rng = np.random.default_rng(0)
+    queries = reference.multi_encodings[rng.permutation(reference.multi_count)[:args.queries]]
+    queries = queries + rng.normal(0, 0.02, queries.shape).astype(np.float32)
+    print_report(reference, compact, queries)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gallery compaction report")
+    parser.add_argument("--store", type=str, default="filesystem", help="filesystem / sqlite / postgres")
+    parser.add_argument("--location", type=str, default="face_db", help="face_db folder or sqlite file")
+    parser.add_argument("--dtype", type=str, default="int8", help="float32 / float16 / int8")
+    parser.add_argument("--max-prototypes", type=int, default=3, help="pose prototypes kept per user")
+    parser.add_argument("--queries", type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    report(parse_args())
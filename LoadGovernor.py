@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+# Degradation levels, cumulative: each level keeps the savings of the ones before it
+Level = namedtuple('Level', 'name detection_scale skip_recent_liveness anti_spoof_models')
+LEVELS = (
+    Level('full', 1.0, False, None),           # full-size detection, liveness every check, whole ensemble
+    Level('reduced_scale', 0.5, False, None),  # detect faces on a half-size frame
+    Level('skip_liveness', 0.5, True, None),   # reuse a recent liveness pass of the same tracked face
+    Level('single_model', 0.5, True, 1),       # one anti-spoof model instead of the ensemble
+)
+
+
+class LoadGovernor:
+    """
+    Keeps presence checks within a latency SLO by trading accuracy for speed.
+
+    Every finished (or dropped) check reports its end-to-end latency, from
+    submit to result. When the p95 of the recent window is over slo_ms the
+    governor steps one level down (see LEVELS); when it has been under
+    recover_ratio * slo_ms for a full window it steps back up. After each
+    change it waits for `window` fresh samples before judging again, so one
+    slow check never moves it twice.
+
+    Read by the CV workers (detection_scale, skip_recent_liveness,
+    anti_spoof_models), fed from the Tk thread (record); thread-safe.
+    """
+
+    def __init__(self, slo_ms=2000, window=10, recover_ratio=0.5, liveness_reuse_s=30.0, max_level=None):
+        self.slo_ms = slo_ms
+        self.window = window
+        self.recover_ratio = recover_ratio
+        self.liveness_reuse_s = liveness_reuse_s
+        self.max_level = len(LEVELS) - 1 if max_level is None else min(max_level, len(LEVELS) - 1)
+
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.level = 0
+        self._level_since = time.monotonic()
+        self._time_at_level = [0.0] * len(LEVELS)
+        self.transitions = 0
+        self.total_samples = 0
+        self.over_slo = 0
+
+    @property
+    def current(self):
+        return LEVELS[self.level]
+
+    @property
+    def detection_scale(self):
+        return self.current.detection_scale
+
+    @property
+    def skip_recent_liveness(self):
+        return self.current.skip_recent_liveness
+
+    @property
+    def anti_spoof_models(self):
+        return self.current.anti_spoof_models
+
+    def record(self, latency_ms):
+        """Feed the end-to-end latency of one check; returns the (possibly new) level"""
+        with self._lock:
+            self._samples.append(latency_ms)
+            self.total_samples += 1
+            self.over_slo += latency_ms > self.slo_ms
+            if len(self._samples) < self.window:
+                return self.level
+            p95 = float(np.percentile(self._samples, 95))
+            if p95 > self.slo_ms and self.level < self.max_level:
+                self._set_level(self.level + 1, p95)
+            elif p95 < self.slo_ms * self.recover_ratio and self.level > 0:
+                self._set_level(self.level - 1, p95)
+            return self.level
+
+    def _set_level(self, level, p95):
+        now = time.monotonic()
+        self._time_at_level[self.level] += now - self._level_since
+        direction = "down" if level > self.level else "up"
+        print(f"LoadGovernor: stepping {direction} to level {level} ({LEVELS[level].name}), "
+              f"check latency p95 {p95:.0f} ms vs SLO {self.slo_ms} ms")
+        self.level = level
+        self._level_since = now
+        self.transitions += 1
+        self._samples.clear()
+
+    def metrics(self):
+        with self._lock:
+            time_at_level = list(self._time_at_level)
+            time_at_level[self.level] += time.monotonic() - self._level_since
+            samples = list(self._samples)
+            return {
+                'level': self.level,
+                'level_name': self.current.name,
+                'slo_ms': self.slo_ms,
+                'transitions': self.transitions,
+                'checks': self.total_samples,
+                'over_slo': self.over_slo,
+                'recent_p95_ms': float(np.percentile(samples, 95)) if samples else None,
+                'seconds_at_level': {LEVELS[i].name: round(t, 1) for i, t in enumerate(time_at_level)},
+            }
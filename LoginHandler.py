@@ -1,35 +1,77 @@
-import util
 import datetime
-import threading
+import time
+
+import numpy as np
+
+import util
+from FrameQuality import POOR_FRAME_MESSAGE
 
 class LoginHandler:
-    def __init__(self, app, recognition_handler, log_path):
+    def __init__(self, app, recognition_handler):
         self.app = app
         self.recognition = recognition_handler
-        self.log_path = log_path
+
+        # Time from the Login click to the welcome message, per path ('speculative' / 'recognized')
+        self.time_to_welcome_ms = {'speculative': [], 'recognized': []}
+        self._clicked_at = None
 
     def login(self):
         if self.app.current_user:
             util.msg_box("Already Logged In", f"User '{self.app.current_user}' is already logged in.")
             return
-        frame = self.app.webcam.get_latest_frame()
 
-        status, name_or_id = self.recognition.recognize_face(frame)
+        self._clicked_at = time.perf_counter()
+
+        # Fast path: a fresh positive verdict from the speculative recognizer
+        speculative = getattr(self.app, 'speculative_recognizer', None)
+        if speculative is not None and speculative.running:
+            verdict = speculative.fresh_verdict(self.app.orchestrator.latest_frame())
+            if verdict is not None and verdict.result[0] not in ('no_persons_found', 'multiple_faces_detected',
+                                                                   'unknown_person'):
+                self._on_login_result(verdict.result, path='speculative')
+                return
+
+        # Recognition runs on the orchestrator; the result comes back on the Tk thread
+        status = self.app.orchestrator.submit('login', self._recognize, self._on_login_result)
+        if status == self.app.orchestrator.BUSY:
+            util.msg_box("Busy", "The system is busy. Please try again in a moment.")
+
+    def _recognize(self, frame):
+        """Worker side: best frame of a short burst, then recognition"""
+        frame, quality = self.app.frame_selector.pick(frame)
+        if frame is None:
+            return 'poor_frame', quality.reason if quality else None
+        return self.recognition.recognize_face(frame)
+
+    def _on_login_result(self, result, path='recognized'):
+        if self.app.current_user:
+            return
+        status, name_or_id = result
         if status == 'no_persons_found':
             util.msg_box("Error", "No face detected. Please try again.")
         elif status == 'multiple_faces_detected':
             util.msg_box("Error", "Multiple faces detected. Ensure only one person is in front of the camera.")
         elif status == 'unknown_person':
             util.msg_box("Error", "Face not recognized. Please register first.")
+        elif status == 'poor_frame':
+            util.msg_box("Error", POOR_FRAME_MESSAGE)
         else:
             name = status
             emp_id = name_or_id
+            self._record_time_to_welcome(path)
             util.msg_box('Welcome back!', f'Welcome, {name} (ID: {emp_id}).')
-            with open(self.log_path, 'a') as f:
-                f.write(f'{name},{emp_id},{datetime.datetime.now()},in\n')
+            self.app.event_journal.log_attendance(name, emp_id, 'in')
+            self.app.record_attendance(emp_id, 'present', time_in=datetime.datetime.now())
             self.app.current_user = name
             self.app.logged_in_emp_ids.add(emp_id)
             self.app.timer_manager.start()
 
-    def login_threaded(self):
-        threading.Thread(target=self.login).start()
\ No newline at end of file
+    def _record_time_to_welcome(self, path):
+        if self._clicked_at is None:
+            return
+        elapsed_ms = (time.perf_counter() - self._clicked_at) * 1000
+        self._clicked_at = None
+        samples = self.time_to_welcome_ms[path]
+        samples.append(elapsed_ms)
+        print(f"Time to welcome: {elapsed_ms:.0f} ms ({path}); "
+              f"median {path} {np.median(samples):.0f} ms over {len(samples)} logins")
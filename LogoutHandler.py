@@ -1,41 +1,61 @@
-import util
 import datetime
-import threading
+
+import util
+from FrameQuality import POOR_FRAME_MESSAGE
+from RecognitionHandler import LOGIN_TOLERANCE, Verification
+from timing_counters import get_user_timer_data
 
 class LogoutHandler:
-    def __init__(self, app, recognition_handler, log_path):
+    def __init__(self, app, recognition_handler):
         self.app = app
         self.recognition = recognition_handler
-        self.log_path = log_path
 
     def logout(self):
         if not self.app.current_user:
             util.msg_box("Error", "No user is currently logged in.")
             return
-        frame = self.app.webcam.get_latest_frame()
 
-        status, name_or_id = self.recognition.recognize_face(frame)
-        if status in ['no_persons_found', 'multiple_faces_detected', 'unknown_person']:
+        # Verification runs on the orchestrator; the result comes back on the Tk thread.
+        # Only the logged-in user's encodings are compared (1:1), not the whole gallery.
+        user = self.app.current_user
+        status = self.app.orchestrator.submit(
+            'logout',
+            lambda frame: self._verify(frame, user),
+            self._on_logout_result
+        )
+        if status == self.app.orchestrator.BUSY:
+            util.msg_box("Busy", "The system is busy. Please try again in a moment.")
+
+    def _verify(self, frame, user):
+        """Worker side: best frame of a short burst, then 1:1 verification"""
+        frame, _ = self.app.frame_selector.pick(frame)
+        if frame is None:
+            return Verification('poor_frame', user, None, None, False)
+        return self.recognition.verify(frame, user, tolerance=LOGIN_TOLERANCE)
+
+    def _on_logout_result(self, verification):
+        if not self.app.current_user or verification.identity != self.app.current_user:
+            return
+        if verification.status in ['no_persons_found', 'multiple_faces_detected', 'poor_frame']:
             msg = {
                 'no_persons_found': "No face detected. Please try again.",
                 'multiple_faces_detected': "Multiple faces detected. Ensure only one person is in front of the camera.",
-                'unknown_person': "Face not recognized. Please try again."
+                'poor_frame': POOR_FRAME_MESSAGE
             }
-            util.msg_box("Error", msg.get(status, "Error on logout."))
+            util.msg_box("Error", msg.get(verification.status, "Error on logout."))
             return
-        if status != self.app.current_user:
+        if not verification.verified:
             util.msg_box("Error", f"You are not the logged-in user ({self.app.current_user}). Logout denied.")
             return
-        name = status
-        emp_id = name_or_id
+        name = verification.identity
+        emp_id = verification.emp_id
         util.msg_box("Goodbye!", f"Goodbye, {name} (ID: {emp_id}).")
-        with open(self.log_path, 'a') as f:
-            f.write(f'{name},{emp_id},{datetime.datetime.now()},out\n')
+        self.app.event_journal.log_attendance(name, emp_id, 'out')
+        timers = get_user_timer_data(name)
+        self.app.record_attendance(emp_id, 'logged_out', time_out=datetime.datetime.now(),
+                                   worked_time=timers['presentCounter'], absent_time=timers['absentTimeCounter'])
         if emp_id in self.app.logged_in_emp_ids:
             self.app.logged_in_emp_ids.remove(emp_id)
         self.app.timer_manager.stop()
         self.app.current_user = None
         self.app.reset_ui_after_logout()
-
-    def logout_threaded(self):
-        threading.Thread(target=self.logout).start()
\ No newline at end of file
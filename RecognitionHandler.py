@@ -1,22 +1,178 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
 import util
+from FaceStore import FilesystemFaceStore
+from Gallery import GalleryPublisher, GallerySnapshot
+from GalleryCompaction import memory_report
+from ShardedGallery import ShardedGallery
+
+# Same thresholds the original util.recognize used
+LOGIN_TOLERANCE = 0.41
+MULTI_TOLERANCE = 0.62
+
+# Result of a 1:1 check. status is 'verified', 'mismatch', 'unknown_identity'
+# or a detection status from util ('no_persons_found', 'multiple_faces_detected').
+Verification = namedtuple('Verification', 'status identity emp_id distance verified')
 
 
 class RecognitionHandler:
-    def __init__(self, db_dir, known_encodings=None, known_names=None, multi_encodings_dict=None):
+    """
+    Matches faces against the current gallery snapshot.
+
+    The gallery is an immutable GallerySnapshot swapped atomically on every
+    change; callers that need several lookups to agree should grab
+    self.gallery once and use that object.
+    """
+
+    def __init__(self, db_dir, known_encodings=None, known_names=None, multi_encodings_dict=None, store=None,
+                 shards=0):
         self.db_dir = db_dir
-        self.known_encodings = known_encodings or []
-        self.known_names = known_names or []
-        self.multi_encodings_dict = multi_encodings_dict or {}
+        self.store = store or FilesystemFaceStore(db_dir)
+        # Take the change-feed position before loading so nothing is missed
+        self._changes_token = self.store.changes_since(None)[1]
+        if known_encodings is None:
+            snapshot = self.store.load_snapshot()
+        else:
+            snapshot = GallerySnapshot.from_lists(known_encodings, known_names or [], multi_encodings_dict,
+                                                  self.store.list_users())
+        self._publisher = GalleryPublisher(snapshot)
+        # (location, frame shape, time) of the last detected face, used to score burst frames
+        self.last_face_location = None
+        # Large galleries: search average encodings in worker processes instead
+        self.sharded = ShardedGallery.from_snapshot(snapshot, shards) if shards > 1 else None
+
+    @property
+    def gallery(self):
+        return self._publisher.current
+
+    # Legacy views of the current snapshot
+    @property
+    def known_encodings(self):
+        return self.gallery.known_encodings
+
+    @property
+    def known_names(self):
+        return self.gallery.known_names
+
+    @property
+    def multi_encodings_dict(self):
+        return self.gallery.multi_encodings_dict
+
+    def get_emp_id(self, name):
+        return self.gallery.emp_id_of(name)
+
+    def add_identity(self, name, emp_id, avg_encoding, multi_encodings=()):
+        """Publish a snapshot with one identity added or replaced (O(1) amortized)"""
+        def update(snapshot):
+            # Under the publisher lock, so the shards and the snapshot see writers in the same order
+            if self.sharded is not None:
+                self.sharded.add_identity(name, emp_id, avg_encoding)
+            return snapshot.with_identity(name, emp_id, avg_encoding, multi_encodings)
+        return self._publisher.publish(update)
+
+    def remove_identity(self, name):
+        def update(snapshot):
+            if self.sharded is not None:
+                self.sharded.remove_identity(name)
+            return snapshot.without_identity(name)
+        return self._publisher.publish(update)
+
+    def compact_gallery(self, pose_dtype=None, max_prototypes=None):
+        """
+        Maintenance job: drop dead rows, reduce each identity's poses to at
+        most max_prototypes prototypes and hold pose encodings as pose_dtype
+        (float16 / int8). Later snapshots keep these settings.
+        """
+        before = memory_report(self.gallery)
+        snapshot = self._publisher.publish(lambda current: current.compacted(pose_dtype, max_prototypes))
+        after = memory_report(snapshot)
+        print(f"Gallery compacted: {before['pose_encodings']} -> {after['pose_encodings']} pose encodings, "
+              f"{before['pose_bytes'] / 1e6:.2f} -> {after['pose_bytes'] / 1e6:.2f} MB ({after['pose_dtype']})")
+        return after
 
     def reload_known_faces(self):
-        self.known_encodings, self.known_names, self.multi_encodings_dict = util.load_known_faces(self.db_dir)
-
-    def recognize_face(self, frame, use_multi_encodings=False):
-        # Calls util.recognize; returns (status, emp_id or name)
-        return util.recognize(
-            frame,
-            self.db_dir,
-            self.known_encodings,
-            self.known_names,
-            use_multi_encodings=use_multi_encodings
-        )
\ No newline at end of file
+        """Apply the store's changes since the last reload, one identity at a time"""
+        changes, token = self.store.changes_since(self._changes_token)
+        for op, name in changes:
+            if op == 'add':
+                record = self.store.get_user(name)
+                if record is not None and record.avg_encoding is not None:
+                    self.add_identity(record.name, record.emp_id, record.avg_encoding, record.multi_encodings)
+            elif op == 'delete':
+                self.remove_identity(name)
+        self._changes_token = token
+        if changes:
+            print(f"Gallery updated with {len(changes)} change(s), {len(self.gallery)} users")
+
+    def _note_face(self, location, frame_shape):
+        self.last_face_location = (location, frame_shape, time.time())
+
+    def recognize_face(self, frame, use_multi_encodings=False, detection_scale=1.0):
+        # Returns (name, emp_id) or (status, None)
+        status, encoding = util.encode_single_face(frame, on_face=self._note_face, detection_scale=detection_scale)
+        if status is not None:
+            return status, None
+
+        gallery = self.gallery
+        if use_multi_encodings:
+            # Pose encodings for better accuracy: shortlist by average, re-rank by poses
+            best = gallery.nearest_cascade(encoding)
+            tolerance = MULTI_TOLERANCE
+        else:
+            matches = (self.sharded or gallery).nearest(encoding)
+            best = matches[0] if matches else None
+            tolerance = LOGIN_TOLERANCE
+
+        if best is None or best[2] > tolerance:
+            return 'unknown_person', None
+        name, emp_id, _ = best
+        return name, emp_id
+
+    def verify(self, frame_or_observation, identity, tolerance=MULTI_TOLERANCE, detection_scale=1.0):
+        """
+        1:1 check: is this face the given identity? Compares only against that
+        identity's average and pose encodings, so the cost does not depend on
+        gallery size. Accepts a camera frame or an already computed encoding.
+        """
+        observation = np.asarray(frame_or_observation)
+        if observation.ndim == 1:
+            status, encoding = None, observation
+        else:
+            status, encoding = util.encode_single_face(frame_or_observation, on_face=self._note_face,
+                                                       detection_scale=detection_scale)
+        if status is not None:
+            return Verification(status, identity, None, None, False)
+
+        gallery = self.gallery
+        row = gallery.row_of(identity)
+        if row is None:
+            return Verification('unknown_identity', identity, None, None, False)
+
+        encoding = encoding.astype(np.float32)
+        distance = float(np.linalg.norm(gallery.avg_encodings[row] - encoding))
+        poses = gallery.pose_encodings(row)
+        if len(poses):
+            distance = min(distance, float(np.min(np.linalg.norm(poses - encoding, axis=1))))
+        verified = distance <= tolerance
+        return Verification('verified' if verified else 'mismatch', identity, gallery.emp_id(row), distance, verified)
+
+    def recognize_all_faces(self, frame, detection_scale=1.0):
+        # Every recognized person in the frame, for multi-user attendance
+        gallery = self.gallery
+        if len(gallery) == 0:
+            return []
+        names = set()
+        for encoding in util.encode_all_faces(frame, detection_scale):
+            distances = gallery.avg_distances(encoding)
+            best = int(np.argmin(distances))
+            if distances[best] < LOGIN_TOLERANCE:
+                names.add(gallery.name(best))
+        return sorted(names)
+
+    def close(self):
+        if self.sharded is not None:
+            self.sharded.close()
+            self.sharded = None
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from WorkScheduler import INTERACTIVE, JobDropped, WorkScheduler
+
+
+class RecognitionOrchestrator:
+    """
+    Runs all recognition work (login, logout, presence checks) from one asyncio
+    event loop on a background thread.
+
+    - The loop samples the webcam itself, so every job gets the freshest frame
+      at the moment it actually starts, not when the button was clicked.
+    - Blocking CV work (face_recognition, anti-spoofing) runs in a small
+      thread pool executor.
+    - Only one job per (kind, camera_id) can be pending at a time; repeated
+      clicks while a login is in flight are dropped.
+    - At most max_pending jobs are queued; beyond that submit() refuses work
+      (interactive login/logout jobs are always accepted).
+    - A WorkScheduler picks the next job: interactive > presence > maintenance,
+      cameras take turns within a class, and periodic jobs that waited past
+      their deadline are dropped (on_error gets a JobDropped).
+    - Results (and errors) are handed back to the Tk thread via after(0, ...).
+    """
+
+    QUEUED = 'queued'
+    DUPLICATE = 'duplicate'
+    BUSY = 'busy'
+
+    def __init__(self, app, camera_id=0, max_workers=2, max_pending=4, frame_interval_ms=50):
+        self.app = app
+        self.camera_id = camera_id
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.frame_interval = frame_interval_ms / 1000.0
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cv-worker")
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.running = False
+
+        self._lock = threading.Lock()
+        self._pending = set()  # (kind, camera_id) keys queued or running
+        self.scheduler = WorkScheduler(on_drop=self._on_drop)
+        self._ready = asyncio.Semaphore(0)  # released once per scheduled job
+        self._tasks = []
+
+        self._latest_frame = None
+        self._frame_seq = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run_loop, name="recognition-loop", daemon=True)
+        self.thread.start()
+        print(f"RecognitionOrchestrator started ({self.max_workers} workers, max {self.max_pending} pending)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self.executor.shutdown(wait=False)
+        print("RecognitionOrchestrator stopped")
+        print("Recognition queue metrics:\n" + self.scheduler.format_metrics())
+
+    def submit(self, kind, work, on_result, on_error=None, camera_id=None, priority=None, deadline=None):
+        """
+        Queue work(frame) for execution. Safe to call from any thread.
+
+        Args:
+            kind: job kind, e.g. 'login', 'logout', 'presence'
+            work: blocking callable taking the latest frame (may be None)
+            on_result: called on the Tk thread with work's return value
+            on_error: optional, called on the Tk thread with the exception
+            camera_id: defaults to the orchestrator's camera
+            priority: scheduling class, defaults to the one for this kind
+            deadline: seconds the job may wait before it is dropped,
+                defaults to the class deadline
+
+        Returns:
+            QUEUED, DUPLICATE (same kind/camera already pending) or BUSY (queue full)
+        """
+        if not self.running:
+            return self.BUSY
+        key = (kind, self.camera_id if camera_id is None else camera_id)
+        if priority is None:
+            priority = WorkScheduler.class_of(kind)
+        with self._lock:
+            if key in self._pending:
+                return self.DUPLICATE
+            if len(self._pending) >= self.max_pending and priority != INTERACTIVE:
+                return self.BUSY
+            self._pending.add(key)
+        self.scheduler.put(key, (work, on_result, on_error), priority, key[1], deadline)
+        self.loop.call_soon_threadsafe(self._ready.release)
+        return self.QUEUED
+
+    def latest_frame(self):
+        return self._latest_frame
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def metrics(self):
+        """Per priority class: submitted/started/dropped counts and queueing delay"""
+        return self.scheduler.metrics()
+
+    # ------------------------------------------------------------------
+    # Event loop side
+    # ------------------------------------------------------------------
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._tasks = [self.loop.create_task(self._frame_pump())]
+        self._tasks += [self.loop.create_task(self._worker()) for _ in range(self.max_workers)]
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.loop.stop()
+
+    async def _frame_pump(self):
+        while self.running:
+            frame = self.app.webcam.get_latest_frame()
+            if frame is not None and frame is not self._latest_frame:
+                self._latest_frame = frame
+                self._frame_seq += 1
+            await asyncio.sleep(self.frame_interval)
+
+    async def _worker(self):
+        while True:
+            await self._ready.acquire()
+            job = self.scheduler.pop()
+            if job is None:
+                # Only stale jobs were left; they have been dropped
+                continue
+            key = job.key
+            work, on_result, on_error = job.payload
+            frame = self._latest_frame
+            if frame is None:
+                frame = self.app.webcam.get_latest_frame()
+            try:
+                result = await self.loop.run_in_executor(self.executor, work, frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in {key[0]} job: {e}")
+                traceback.print_exc()
+                if on_error is not None:
+                    self._deliver(on_error, e)
+            else:
+                self._deliver(on_result, result)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    def _on_drop(self, job):
+        """A job missed its deadline in the queue; free its slot and tell the submitter"""
+        with self._lock:
+            self._pending.discard(job.key)
+        print(f"Dropped stale {job.key[0]} job for camera {job.camera_id}")
+        on_error = job.payload[2]
+        if on_error is not None:
+            self._deliver(on_error, JobDropped(f"{job.key[0]} job missed its deadline"))
+
+    def _deliver(self, callback, value):
+        if not self.running:
+            return
+        try:
+            self.app.main_window.after(0, lambda: callback(value))
+        except RuntimeError as e:
+            # Main window already destroyed
+            print(f"Dropping result, UI is gone: {e}")
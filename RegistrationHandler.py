@@ -1,15 +1,12 @@
-import pickle
-import threading
-import time
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 
 import face_recognition
 import numpy as np
 from PIL import Image, ImageTk
 import cv2
-import os
-import json
 import util
+from FaceChips import ChipWriter, make_chip
 
 
 class RegistrationHandler:
@@ -28,7 +25,7 @@ class RegistrationHandler:
 
         self.current_pose_index = 0
         self.capture_interval = 1.5  # Time between captures
-        self.captured_encodings = []
+        self.captured_frames = {}  # pose -> (rgb frame, face location)
 
         # UI elements for better control
         self.pose_indicator = None
@@ -38,85 +35,47 @@ class RegistrationHandler:
         self.registration_started = False
         self.current_name = None
         self.current_emp_id = None
-        self.current_user_dir = None
         self.btn_capture = None
         self.btn_accept = None  # Store reference to start button
+        self.duplicate_candidates = []
+
+        # Detection, encoding and saving run here, never on the Tk thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="registration")
+        self.chip_writer = ChipWriter(self.recognition.store)
+        self.busy = False
+        self.running = False
 
     def check_face_already_registered(self, test_frame, tolerance=0.32):
         """
         Check if the face in the test frame is already registered in the system
-        Returns: (is_duplicate, existing_user_name, existing_emp_id) or (False, None, None)
+        Returns: (is_duplicate, existing_user_name, existing_emp_id, error_msg)
+        The closest identities found are kept in self.duplicate_candidates.
         """
+        self.duplicate_candidates = []
         try:
-            # Extract face encoding from test frame
-            rgb_frame = cv2.cvtColor(test_frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
-
-            if len(face_locations) == 0:
+            status, test_encoding = util.encode_single_face(test_frame)
+            if status == 'no_persons_found':
                 return False, None, None, "No face detected"
-            elif len(face_locations) > 1:
+            elif status == 'multiple_faces_detected':
                 return False, None, None, "Multiple faces detected"
 
-            test_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            if not test_encodings:
-                return False, None, None, "Could not extract face encoding"
-
-            test_encoding = test_encodings[0]
-
-            # Load users data to get name-empid mapping
-            users_file = os.path.join(self.app.db_dir, 'users.json')
-            users_data = {}
-            if os.path.exists(users_file):
-                with open(users_file, 'r') as f:
-                    try:
-                        users_data = json.load(f)
-                    except json.JSONDecodeError:
-                        users_data = {}
-
-            # Check against all registered users
-            for user_folder in os.listdir(self.app.db_dir):
-                user_path = os.path.join(self.app.db_dir, user_folder)
-                if not os.path.isdir(user_path) or user_folder.endswith('.json'):
-                    continue
-
-                # Try to load average encoding first
-                avg_encoding_path = os.path.join(user_path, 'avg_encoding.pkl')
-                if os.path.exists(avg_encoding_path):
-                    try:
-                        with open(avg_encoding_path, 'rb') as f:
-                            existing_encoding = pickle.load(f)
-
-                        # Compare faces
-                        face_distance = face_recognition.face_distance([existing_encoding], test_encoding)[0]
-
-                        if face_distance < tolerance:
-                            emp_id = users_data.get(user_folder, "Unknown")
-                            return True, user_folder, emp_id, None
-
-                    except Exception as e:
-                        print(f"Error loading encoding for {user_folder}: {e}")
-
-                # Also check against multi-encodings for more accuracy
-                multi_encoding_path = os.path.join(user_path, 'multi_encodings.pkl')
-                if os.path.exists(multi_encoding_path):
-                    try:
-                        with open(multi_encoding_path, 'rb') as f:
-                            multi_encodings = pickle.load(f)
-
-                        # Check against all multi-encodings
-                        matches = face_recognition.compare_faces(multi_encodings, test_encoding, tolerance=tolerance)
-                        if any(matches):
-                            emp_id = users_data.get(user_folder, "Unknown")
-                            return True, user_folder, emp_id, None
-
-                    except Exception as e:
-                        print(f"Error loading multi-encodings for {user_folder}: {e}")
+            # One vectorized search over average and pose encodings of the whole gallery
+            self.duplicate_candidates = self.find_similar_faces(test_encoding)
+            if self.duplicate_candidates:
+                user_name, emp_id, distance = self.duplicate_candidates[0]
+                print(f"Closest registered face: {user_name} ({distance:.3f})")
+                if distance < tolerance:
+                    return True, user_name, emp_id, None
 
             return False, None, None, None
 
         except Exception as e:
             return False, None, None, f"Error during face comparison: {str(e)}"
 
+    def find_similar_faces(self, encoding, k=3):
+        """Nearest registered identities as [(name, emp_id, distance)], closest first"""
+        return self.recognition.gallery.nearest_identities(encoding, k)
+
     def open_window(self):
         win = tk.Toplevel(self.app.main_window)
         x = self.app.x_pos + 40
@@ -246,6 +205,7 @@ class RegistrationHandler:
         self.entry_id = entry_id
         self.capture_label = capture_label
         self.running = True
+        self.busy = False
         self.registration_started = False
 
         # Start webcam feed
@@ -268,7 +228,26 @@ class RegistrationHandler:
         self.running = False
         win.destroy()
 
+    def _run_in_background(self, work, on_done):
+        """
+        Run work() on the registration worker and hand its Future to
+        on_done on the Tk thread. Nothing slow (detection, encoding, disk)
+        ever runs on the UI thread, so the preview keeps updating.
+        """
+        self.busy = True
+        future = self.executor.submit(work)
+
+        def deliver(done):
+            self.busy = False
+            if self.running:  # window may have been closed meanwhile
+                on_done(done)
+
+        future.add_done_callback(lambda done: self.app.main_window.after(0, lambda: deliver(done)))
+        return future
+
     def accept(self, win, entry_name, entry_id):
+        if self.busy:
+            return
         name = entry_name.get().strip()
         emp_id = entry_id.get().strip()
 
@@ -276,15 +255,7 @@ class RegistrationHandler:
             util.msg_box("Error", "Name and Emp ID cannot be empty!")
             return
 
-        # Load or init users file
-        users_file = os.path.join(self.app.db_dir, 'users.json')
-        users_data = {}
-        if os.path.exists(users_file) and os.path.getsize(users_file) > 0:
-            with open(users_file, 'r') as f:
-                try:
-                    users_data = json.load(f)
-                except json.JSONDecodeError:
-                    users_data = {}
+        users_data = self.recognition.store.list_users()
 
         if name in users_data:
             util.msg_box("Error", f"Username '{name}' is already taken!")
@@ -293,23 +264,24 @@ class RegistrationHandler:
             util.msg_box("Error", f"Emp ID '{emp_id}' is already registered!")
             return
 
-        # NEW: Check if face is already registered
-        self.pose_indicator.config(
-            text="🔍 Checking for face duplicates...",
-            bg='#f39c12', fg='white'
-        )
-        self.win.update()  # Force UI update
-
         current_frame = self.app.webcam.get_latest_frame()
         if current_frame is None:
             util.msg_box("Error", "Unable to capture frame for verification. Please try again.")
-            self.pose_indicator.config(
-                text="🎯 Ready to Start",
-                bg='#3498db', fg='white'
-            )
             return
 
-        is_duplicate, existing_name, existing_emp_id, error_msg = self.check_face_already_registered(current_frame)
+        # NEW: Check if face is already registered (in the background)
+        self.pose_indicator.config(
+            text="🔍 Checking for face duplicates...",
+            bg='#f39c12', fg='white'
+        )
+        self.btn_accept.config(state='disabled')
+        frame = current_frame.copy()
+        self._run_in_background(lambda: self.check_face_already_registered(frame),
+                                lambda future: self._on_duplicate_check(future, name, emp_id, entry_name, entry_id))
+
+    def _on_duplicate_check(self, future, name, emp_id, entry_name, entry_id):
+        self.btn_accept.config(state='normal')
+        is_duplicate, existing_name, existing_emp_id, error_msg = future.result()
 
         if error_msg:
             util.msg_box("Error", f"Face verification failed: {error_msg}")
@@ -340,20 +312,13 @@ class RegistrationHandler:
             text="✅ Face verification passed",
             bg='#27ae60', fg='white'
         )
-        self.win.update()
-        time.sleep(1)  # Brief pause to show success
-
-        # Create user directory
-        user_dir = os.path.join(self.app.db_dir, name)
-        os.makedirs(user_dir, exist_ok=True)
 
-        # Reset capture state
+        # Reset capture state - nothing is written until all poses are captured
         self.current_pose_index = 0
-        self.captured_encodings = []
+        self.captured_frames = {}
         self.registration_started = True
         self.current_name = name
         self.current_emp_id = emp_id
-        self.current_user_dir = user_dir
 
         # Hide start button and show capture button using stored reference
         self.btn_accept.place(x=-200, y=490)  # Hide start button
@@ -363,12 +328,12 @@ class RegistrationHandler:
         entry_name.config(state='disabled')
         entry_id.config(state='disabled')
 
-        # Show first pose instruction
-        self.update_pose_indicator(0, "active")
+        # Show first pose instruction after a brief pause to show success
+        self.win.after(1000, lambda: self.update_pose_indicator(0, "active"))
 
     def capture_current_pose(self):
-        """NEW METHOD: Capture photo for current pose when button is clicked"""
-        if not self.registration_started:
+        """Snapshot the frame for the current pose; the face check runs in the background"""
+        if not self.registration_started or self.busy:
             return
 
         if self.current_pose_index >= len(self.poses):
@@ -381,88 +346,90 @@ class RegistrationHandler:
             util.msg_box("Error", "Unable to capture frame. Please try again.")
             return
 
-        # Check for face
-        face_locations = face_recognition.face_locations(frame)
-
-        if len(face_locations) == 0:
-            util.msg_box("Error", "No face detected. Please position yourself in front of camera and try again.")
-            return
-        elif len(face_locations) > 1:
-            util.msg_box("Error", "Multiple faces detected. Ensure only one person is visible and try again.")
-            return
-
         # Show capturing feedback
         current_pose = self.poses[self.current_pose_index]
         self.pose_indicator.config(
             text=f"📸 Capturing {current_pose['name']} pose...",
             bg='#3498db', fg='white'
         )
-        self.win.update()  # Force UI update
+        self.btn_capture.config(state='disabled')
+        frame = frame.copy()
+        self._run_in_background(lambda: _detect_single_face(frame), self._on_pose_detected)
 
-        # Capture and save
+    def _on_pose_detected(self, future):
+        self.btn_capture.config(state='normal')
         try:
-            # Save the image
-            pose_name = current_pose['name'].lower()
-            img_path = os.path.join(self.current_user_dir, f'{pose_name}.jpg')
-            cv2.imwrite(img_path, frame)
-
-            # Extract encoding
-            face_encs = face_recognition.face_encodings(frame, face_locations)
-            if face_encs:
-                self.captured_encodings.append(face_encs[0])
-                # Save individual encoding
-                with open(os.path.join(self.current_user_dir, f'{pose_name}_encoding.pkl'), 'wb') as f:
-                    pickle.dump(face_encs[0], f)
-
-            # Show success feedback
-            self.update_pose_indicator(self.current_pose_index, "captured")
-
-            # Move to next pose
-            self.current_pose_index += 1
-
-            if self.current_pose_index < len(self.poses):
-                # Show next pose after brief delay
-                self.win.after(1000, lambda: self.update_pose_indicator(self.current_pose_index, "active"))
-            else:
-                # All poses captured, save data
-                self.btn_capture.config(state='disabled', text='✅ All Photos Captured')
-                self.win.after(1000, self._save_user_data_manual)
-
+            rgb_frame, face_locations = future.result()
         except Exception as e:
             util.msg_box("Error", f"Failed to capture photo: {str(e)}")
-            # Reset the pose indicator
             self.update_pose_indicator(self.current_pose_index, "active")
+            return
+
+        if len(face_locations) == 0:
+            util.msg_box("Error", "No face detected. Please position yourself in front of camera and try again.")
+            self.update_pose_indicator(self.current_pose_index, "active")
+            return
+        elif len(face_locations) > 1:
+            util.msg_box("Error", "Multiple faces detected. Ensure only one person is visible and try again.")
+            self.update_pose_indicator(self.current_pose_index, "active")
+            return
+
+        # Kept in memory; encoding and saving happen once all poses are in
+        pose_name = self.poses[self.current_pose_index]['name'].lower()
+        self.captured_frames[pose_name] = (rgb_frame, face_locations[0])
+
+        # Show success feedback
+        self.update_pose_indicator(self.current_pose_index, "captured")
+
+        # Move to next pose
+        self.current_pose_index += 1
+
+        if self.current_pose_index < len(self.poses):
+            # Show next pose after brief delay
+            self.win.after(1000, lambda: self.update_pose_indicator(self.current_pose_index, "active"))
+        else:
+            # All poses captured, save data
+            self.btn_capture.config(state='disabled', text='✅ All Photos Captured')
+            self._save_user_data_manual()
 
     def _save_user_data_manual(self):
-        """NEW METHOD: Save user data after manual capture"""
+        """Encode all poses in one batch and save the user in a single store write (in the background)"""
         # Show saving progress
         self.update_pose_indicator(0, "saving")
+        name, emp_id, captured = self.current_name, self.current_emp_id, dict(self.captured_frames)
+        self._run_in_background(lambda: self._encode_and_store(name, emp_id, captured), self._on_saved)
 
-        # Save user to users.json
-        users_file = os.path.join(self.app.db_dir, 'users.json')
-        try:
-            with open(users_file, 'r') as f:
-                users_data = json.load(f)
-        except:
-            users_data = {}
-
-        users_data[self.current_name] = self.current_emp_id
-        with open(users_file, 'w') as f:
-            json.dump(users_data, f, indent=4)
-
-        # Calculate and save average encoding
-        if self.captured_encodings:
-            avg_encoding = np.mean(self.captured_encodings, axis=0)
-            with open(os.path.join(self.current_user_dir, 'avg_encoding.pkl'), 'wb') as f:
-                pickle.dump(avg_encoding, f)
-
-        # Save multi encodings
-        with open(os.path.join(self.current_user_dir, 'multi_encodings.pkl'), 'wb') as f:
-            pickle.dump(self.captured_encodings, f)
-
-        # Reload in recognition handler
+    def _encode_and_store(self, name, emp_id, captured):
+        poses = list(captured)
+        encodings = util.encode_faces_batch([captured[pose][0] for pose in poses],
+                                            [captured[pose][1] for pose in poses])
+        if not encodings:
+            return 0
+
+        # Save user and encodings to the face store in one write
+        self.recognition.store.add_user(name, emp_id, np.mean(encodings, axis=0), encodings)
+
+        # Publish the new identity to the gallery
         self.recognition.reload_known_faces()
 
+        # Aligned face chips instead of full frames, written asynchronously
+        chips = {pose: make_chip(*captured[pose]) for pose in poses}
+        self.chip_writer.submit(name, chips)
+        return len(encodings)
+
+    def _on_saved(self, future):
+        try:
+            encoded = future.result()
+        except Exception as e:
+            util.msg_box("Error", f"Failed to save registration: {str(e)}")
+            self.close_window(self.win)
+            return
+
+        if not encoded:
+            util.msg_box("Error", "No face encodings were captured. Please register again.")
+            self.close_window(self.win)
+            return
+
         # Show completion
         self.update_pose_indicator(0, "complete")
 
@@ -471,7 +438,7 @@ class RegistrationHandler:
             f"🎉 Registration Successful!\n\n"
             f"User: {self.current_name}\n"
             f"Employee ID: {self.current_emp_id}\n"
-            f"Poses Captured: 5/5\n\n"
+            f"Poses Captured: {encoded}/5\n\n"
             f"You can now use the system for attendance tracking."
         )
 
@@ -531,4 +498,9 @@ class RegistrationHandler:
 
             # Mark all indicators as complete
             for indicator in self.pose_indicators:
-                indicator.config(bg='#27ae60', fg='white')
\ No newline at end of file
+                indicator.config(bg='#27ae60', fg='white')
+
+def _detect_single_face(frame):
+    """Worker side of a pose capture: (rgb frame, face locations)"""
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return rgb_frame, face_recognition.face_locations(rgb_frame)
@@ -0,0 +1,268 @@
+import heapq
+import multiprocessing
+import threading
+
+import numpy as np
+
+ENCODING_DIM = 128
+
+
+class _Shard:
+    """
+    One worker's slice of the gallery. Rows are kept dense: a removed row is
+    overwritten by the last one, so searches never have to mask dead rows.
+    """
+
+    def __init__(self, dim=ENCODING_DIM):
+        self.dim = dim
+        self.avg = np.zeros((0, dim), dtype=np.float32)
+        self.sq_norms = np.zeros(0, dtype=np.float32)
+        self.names = []
+        self.emp_ids = []
+        self.rows = {}
+        self.count = 0
+
+    def load(self, names, emp_ids, avg):
+        avg = np.asarray(avg, dtype=np.float32).reshape(-1, self.dim)
+        self.count = 0
+        self.avg = np.zeros((max(64, len(avg) * 2), self.dim), dtype=np.float32)
+        self.sq_norms = np.zeros(len(self.avg), dtype=np.float32)
+        self.names, self.emp_ids, self.rows = [], [], {}
+        self._append(names, emp_ids, avg)
+
+    def _append(self, names, emp_ids, avg):
+        n = len(avg)
+        if self.count + n > len(self.avg):
+            capacity = max(64, (self.count + n) * 2)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:self.count] = self.avg[:self.count]
+            norms = np.zeros(capacity, dtype=np.float32)
+            norms[:self.count] = self.sq_norms[:self.count]
+            self.avg, self.sq_norms = grown, norms
+        self.avg[self.count:self.count + n] = avg
+        self.sq_norms[self.count:self.count + n] = np.einsum('ij,ij->i', avg, avg)
+        for offset, name in enumerate(names):
+            self.rows[name] = self.count + offset
+        self.names.extend(names)
+        self.emp_ids.extend(emp_ids)
+        self.count += n
+
+    def add(self, name, emp_id, encoding):
+        self.remove(name)
+        self._append([name], [emp_id], np.asarray(encoding, dtype=np.float32).reshape(1, self.dim))
+
+    def remove(self, name):
+        """Remove one identity; returns (emp_id, encoding) or None"""
+        row = self.rows.pop(name, None)
+        if row is None:
+            return None
+        removed = (self.emp_ids[row], self.avg[row].copy())
+        last = self.count - 1
+        if row != last:
+            self.avg[row] = self.avg[last]
+            self.sq_norms[row] = self.sq_norms[last]
+            self.names[row] = self.names[last]
+            self.emp_ids[row] = self.emp_ids[last]
+            self.rows[self.names[row]] = row
+        self.names.pop()
+        self.emp_ids.pop()
+        self.count = last
+        return removed
+
+    def take(self, count):
+        """Remove and return up to count identities (used for rebalancing)"""
+        moved = []
+        for name in list(self.names[-count:]) if count else []:
+            emp_id, encoding = self.remove(name)
+            moved.append((name, emp_id, encoding))
+        return moved
+
+    def query(self, queries, k):
+        """Per query, the k closest rows as [(distance, name, emp_id)] sorted by distance"""
+        if self.count == 0:
+            return [[] for _ in range(len(queries))]
+        avg = self.avg[:self.count]
+        # |a - q|^2 = |a|^2 - 2 a.q + |q|^2 as one matrix product for the whole batch
+        sq = self.sq_norms[:self.count][None, :] - 2.0 * (queries @ avg.T)
+        sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+        k = min(k, self.count)
+        if k < self.count:
+            top = np.argpartition(sq, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(self.count), (len(queries), self.count))
+        results = []
+        for i, rows in enumerate(top):
+            distances = np.sqrt(np.maximum(sq[i, rows], 0.0))
+            order = np.argsort(distances)
+            results.append([(float(distances[j]), self.names[rows[j]], self.emp_ids[rows[j]]) for j in order])
+        return results
+
+
+def _shard_worker(conn, dim):
+    """Worker process loop: owns one _Shard and answers commands from the parent"""
+    shard = _Shard(dim)
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        try:
+            if command == 'stop':
+                conn.send(('ok', None))
+                break
+            elif command == 'load':
+                shard.load(*args)
+                reply = shard.count
+            elif command == 'add':
+                shard.add(*args)
+                reply = shard.count
+            elif command == 'remove':
+                shard.remove(*args)
+                reply = shard.count
+            elif command == 'take':
+                reply = shard.take(*args)
+            elif command == 'add_many':
+                for name, emp_id, encoding in args[0]:
+                    shard.add(name, emp_id, encoding)
+                reply = shard.count
+            elif command == 'query':
+                reply = shard.query(*args)
+            else:
+                raise ValueError(f"Unknown shard command {command!r}")
+            conn.send(('ok', reply))
+        except Exception as e:
+            conn.send(('error', repr(e)))
+    conn.close()
+
+
+class ShardedGallery:
+    """
+    Gallery search partitioned across local worker processes.
+
+    Identities are spread over num_shards processes, each holding its slice
+    of the average encodings. A query is sent to every shard at once, each
+    shard returns its own top-k and the parent merges them, so search time
+    scales with gallery_size / num_shards instead of gallery_size and is not
+    limited by the GIL.
+
+    New identities go to the smallest shard. If shards drift apart by more
+    than rebalance_slack (e.g. after many deletions from one shard),
+    identities are moved from the largest to the smallest shard.
+
+    Only average encodings are sharded; pose re-ranking still happens on the
+    in-process GallerySnapshot for the few candidates that come back.
+    """
+
+    def __init__(self, num_shards=2, dim=ENCODING_DIM, rebalance_slack=0.1):
+        self.num_shards = num_shards
+        self.dim = dim
+        self.rebalance_slack = rebalance_slack
+        self.owner = {}  # name -> shard index
+        self.sizes = [0] * num_shards
+        self._lock = threading.Lock()  # pipes are not safe for concurrent use
+
+        context = multiprocessing.get_context('spawn')
+        self._conns = []
+        self._processes = []
+        for i in range(num_shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_conn, dim),
+                                      name=f"gallery-shard-{i}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, num_shards=2, **kwargs):
+        gallery = cls(num_shards, dim=snapshot.dim, **kwargs)
+        rows = snapshot.live_rows()
+        gallery.load([snapshot.name(r) for r in rows], [snapshot.emp_id(r) for r in rows],
+                     snapshot.avg_encodings[rows])
+        return gallery
+
+    def _call(self, shard, command, *args):
+        self._conns[shard].send((command, args))
+        return self._result(shard)
+
+    def _result(self, shard):
+        status, reply = self._conns[shard].recv()
+        if status != 'ok':
+            raise RuntimeError(f"Gallery shard {shard} failed: {reply}")
+        return reply
+
+    def load(self, names, emp_ids, avg_encodings):
+        """Replace the whole gallery, striping identities round-robin over the shards"""
+        avg_encodings = np.asarray(avg_encodings, dtype=np.float32)
+        with self._lock:
+            for shard in range(self.num_shards):
+                rows = slice(shard, None, self.num_shards)
+                self._conns[shard].send(('load', (list(names[rows]), list(emp_ids[rows]), avg_encodings[rows])))
+            for shard in range(self.num_shards):
+                self.sizes[shard] = self._result(shard)
+            self.owner = {name: i % self.num_shards for i, name in enumerate(names)}
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def add_identity(self, name, emp_id, avg_encoding):
+        with self._lock:
+            shard = self.owner.get(name)
+            if shard is None:
+                shard = int(np.argmin(self.sizes))
+            self.sizes[shard] = self._call(shard, 'add', name, emp_id, np.asarray(avg_encoding, dtype=np.float32))
+            self.owner[name] = shard
+            self._rebalance()
+
+    def remove_identity(self, name):
+        with self._lock:
+            shard = self.owner.pop(name, None)
+            if shard is None:
+                return
+            self.sizes[shard] = self._call(shard, 'remove', name)
+            self._rebalance()
+
+    def _rebalance(self):
+        """Move identities from the largest to the smallest shard while they are too far apart"""
+        while True:
+            largest, smallest = int(np.argmax(self.sizes)), int(np.argmin(self.sizes))
+            gap = self.sizes[largest] - self.sizes[smallest]
+            if gap <= max(1, self.rebalance_slack * len(self) / self.num_shards):
+                return
+            moved = self._call(largest, 'take', gap // 2)
+            self.sizes[largest] -= len(moved)
+            self.sizes[smallest] = self._call(smallest, 'add_many', moved)
+            for name, _, _ in moved:
+                self.owner[name] = smallest
+
+    def nearest(self, encoding, k=1):
+        """[(name, emp_id, distance)] like GallerySnapshot.nearest"""
+        return self.nearest_batch(np.asarray(encoding, dtype=np.float32).reshape(1, self.dim), k)[0]
+
+    def nearest_batch(self, encodings, k=1):
+        """Fan a batch of queries out to every shard and merge the per-shard top-k"""
+        queries = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            for shard in range(self.num_shards):
+                self._conns[shard].send(('query', (queries, k)))
+            per_shard = [self._result(shard) for shard in range(self.num_shards)]
+        merged = []
+        for i in range(len(queries)):
+            best = heapq.nsmallest(k, heapq.merge(*(results[i] for results in per_shard)))
+            merged.append([(name, emp_id, distance) for distance, name, emp_id in best])
+        return merged
+
+    def close(self):
+        with self._lock:
+            for shard, conn in enumerate(self._conns):
+                try:
+                    conn.send(('stop', ()))
+                    conn.recv()
+                except (OSError, EOFError):
+                    pass
+                conn.close()
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self._conns, self._processes = [], []
@@ -0,0 +1,91 @@
+import time
+from collections import namedtuple
+
+from AdaptiveScheduler import frame_signature, signature_difference
+
+# One background recognition result: recognize_face's (status, emp_id), when
+# the frame was taken (time.monotonic) and the frame's signature
+Verdict = namedtuple('Verdict', 'result observed_at signature')
+
+
+class SpeculativeRecognizer:
+    """
+    Keeps a rolling recognition result for whoever is in front of the camera
+    while nobody is logged in, so pressing Login only has to confirm the
+    latest verdict instead of running detection and encoding on demand.
+
+    A verdict is used only if it is younger than max_age_ms and the scene
+    has not visibly changed since its frame (compared with the tiny frame
+    signature TimerManager uses). Otherwise Login falls back to a normal
+    recognition. Scheduling works like MultiUserMonitor: the work runs on the
+    orchestrator and the next run is scheduled from the Tk thread.
+    """
+
+    def __init__(self, app, recognition_handler, interval_ms=750, max_age_ms=1500, scene_change_threshold=12.0):
+        self.app = app
+        self.recognition = recognition_handler
+        self.interval_ms = interval_ms
+        self.max_age_ms = max_age_ms
+        self.scene_change_threshold = scene_change_threshold
+        self.latest = None
+        self.job_id = None
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        print(f"SpeculativeRecognizer started (every {self.interval_ms} ms, verdicts valid {self.max_age_ms} ms)")
+        self._perform_update()
+
+    def stop(self):
+        self.running = False
+        self.latest = None
+        if self.job_id:
+            self.app.main_window.after_cancel(self.job_id)
+            self.job_id = None
+
+    def _schedule_next(self):
+        if self.running:
+            self.job_id = self.app.main_window.after(self.interval_ms, self._perform_update)
+
+    def _perform_update(self):
+        self.job_id = None
+        if not self.running:
+            return
+        if self.app.current_user:
+            # Someone is logged in - TimerManager is doing the checks now
+            self.latest = None
+            self._schedule_next()
+            return
+        # A verdict older than max_age_ms is never used, so neither is a job that waited that long
+        status = self.app.orchestrator.submit('speculative', self._recognize, self._apply,
+                                              on_error=lambda e: self._schedule_next(),
+                                              deadline=self.max_age_ms / 1000.0)
+        if status != self.app.orchestrator.QUEUED:
+            self._schedule_next()
+
+    def _recognize(self, frame):
+        observed_at = time.monotonic()
+        frame, _ = self.app.frame_selector.pick(frame)
+        if frame is None:
+            return None
+        return Verdict(self.recognition.recognize_face(frame), observed_at, frame_signature(frame))
+
+    def _apply(self, verdict):
+        if verdict is not None and self.running:
+            self.latest = verdict
+        self._schedule_next()
+
+    def fresh_verdict(self, frame=None):
+        """Latest verdict if it is recent enough and still matches what the camera sees, else None"""
+        verdict = self.latest
+        if verdict is None:
+            return None
+        if (time.monotonic() - verdict.observed_at) * 1000 > self.max_age_ms:
+            return None
+        if frame is not None:
+            difference = signature_difference(verdict.signature, frame_signature(frame))
+            if difference is None or difference > self.scene_change_threshold:
+                return None
+        return verdict
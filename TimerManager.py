@@ -1,10 +1,14 @@
 import util
-from timing_counters import update_attendance, get_user_timer_data
-import json
-import threading
+from AdaptiveScheduler import AdaptiveInterval, box_iou, frame_signature
+from timing_counters import update_attendance, get_user_timer_data, ABSENCE_GRACE_SECONDS
+from RecognitionHandler import Verification
+from WorkScheduler import JobDropped
 import time
 import tkinter as tk
 
+# Face boxes of consecutive checks overlapping at least this much belong to one track
+TRACK_IOU = 0.5
+
 
 class TimerManager:
     def __init__(self, app, recognition_handler, users_file_path):
@@ -14,18 +18,30 @@ class TimerManager:
         self.job_id = None
         self.alert_threshold = 0
         self.interval_ms = 5000
+        self.scheduler = AdaptiveInterval(base_ms=self.interval_ms)
         self.spoofing_alert_counter = 0
         self.consecutive_spoofing_count = 0
+        self.last_spoofing_alert_time = 0
         self.debug_mode = True  # Enable debug logging
+        self.generation = 0  # Bumped on start/stop so stale results don't reschedule
+        self.last_live = None  # (user, time, confidence, track id) of the last passed liveness check
+        self.track = None  # (user, face box, track id) of the previous check, None if no face was seen
+        self.track_id = 0
 
     def start(self):
         self.alert_threshold = 0
         self.spoofing_alert_counter = 0
         self.consecutive_spoofing_count = 0
+        self.generation += 1
+        self.last_live = None
+        self.track = None
+        self.scheduler.reset()
+        self.interval_ms = self.scheduler.interval_ms
         print("TimerManager started - monitoring for spoofing attempts")
         self._schedule_update()
 
     def stop(self):
+        self.generation += 1
         if self.job_id:
             self.app.main_window.after_cancel(self.job_id)
             self.job_id = None
@@ -34,158 +50,256 @@ class TimerManager:
     def _schedule_update(self):
         self._perform_update()
 
+    def _schedule_next(self):
+        if self.app.current_user:
+            self.job_id = self.app.main_window.after(self.interval_ms, self._perform_update)
+
     def _perform_update(self):
+        self.job_id = None
         if not self.app.current_user:
             return
 
-        def recognition_task():
-            try:
-                frame = self.app.webcam.get_latest_frame()
-                if frame is None:
-                    print("Warning: No frame available from webcam")
-                    self.job_id = self.app.main_window.after(self.interval_ms, self._perform_update)
-                    return
-
-                # First check for face recognition
-                status, emp_id_detected = self.recognition.recognize_face(frame, use_multi_encodings=True)
-                face_recognized = (status == self.app.current_user)
-
+        expected_user = self.app.current_user
+        generation = self.generation
+        submitted_at = time.monotonic()
+        status = self.app.orchestrator.submit(
+            'presence',
+            lambda frame: self._check_presence(frame, expected_user),
+            lambda result: self._apply_presence_result(result, generation, submitted_at),
+            on_error=lambda e: self._on_presence_error(e, generation, submitted_at)
+        )
+        if status != self.app.orchestrator.QUEUED:
+            # Previous check still running or orchestrator saturated - try again next tick
+            if self.debug_mode:
+                print(f"Presence check not queued ({status})")
+            self._schedule_next()
+
+    def _check_presence(self, frame, expected_user):
+        """
+        Runs on an orchestrator worker. Does only the blocking CV work and
+        returns a result dict; all state and UI updates happen in
+        _apply_presence_result on the Tk thread.
+        """
+        if frame is None:
+            print("Warning: No frame available from webcam")
+            return None
+        observed_at = time.time()
+        signature = frame_signature(frame)
+
+        # Best frame of a short burst; if every frame is hopeless (dark, blurred) the
+        # user counts as not seen and no detector runs at all
+        governor = self.app.load_governor
+        frame, quality = self.app.frame_selector.pick(frame)
+        if frame is None:
+            verification = Verification('poor_frame', expected_user, None, None, False)
+        else:
+            # First check the face against the logged-in user only (1:1, not a gallery search)
+            verification = self.recognition.verify(frame, expected_user, detection_scale=governor.detection_scale)
+        face_recognized = verification.verified
+        face_box = self._face_box(observed_at) if face_recognized else None
+        track = self.track
+        continuous = (face_box is not None and track is not None and track[0] == expected_user
+                      and box_iou(track[1], face_box) >= TRACK_IOU)
+
+        if self.debug_mode:
+            print(f"Face verification: {verification.status}, Expected: {expected_user}, "
+                  f"Distance: {verification.distance}")
+
+        is_present = False
+        spoof_result = None
+
+        # If face is recognized, check for anti-spoofing
+        if face_recognized:
+            if self.debug_mode:
+                print("Face recognized - checking for spoofing...")
+
+            last_live = self.last_live
+            if (governor.skip_recent_liveness and continuous and last_live is not None
+                    and last_live[0] == expected_user and last_live[3] == track[2]
+                    and observed_at - last_live[1] <= governor.liveness_reuse_s):
+                # Overloaded: the same face, tracked without a break since it passed liveness
+                # moments ago - reuse that verdict
+                spoof_result = {'is_authentic': True, 'confidence': last_live[2], 'status': 'authentic_reused',
+                                'error': None}
+            else:
+                spoof_result = self.app.anti_spoof_handler.check_frame_authenticity(
+                    frame, max_models=governor.anti_spoof_models)
+
+            if self.debug_mode:
+                print(f"Anti-spoof result: {spoof_result}")
+
+            if spoof_result['is_authentic']:
+                is_present = True
                 if self.debug_mode:
-                    print(
-                        f"Face recognition status: {status}, Expected: {self.app.current_user}, Match: {face_recognized}")
-
-                # Initialize presence status
-                is_present = False
-                spoof_detected = False
-
-                # If face is recognized, check for anti-spoofing
-                if face_recognized:
-                    if self.debug_mode:
-                        print("Face recognized - checking for spoofing...")
-
-                    # Check if face is authentic (not spoofed)
-                    spoof_result = self.app.anti_spoof_handler.check_frame_authenticity(frame)
-
-                    if self.debug_mode:
-                        print(f"Anti-spoof result: {spoof_result}")
-
-                    if spoof_result['is_authentic']:
-                        is_present = True
-                        self.consecutive_spoofing_count = 0  # Reset spoofing counter
-                        if self.debug_mode:
-                            print("✓ Face is authentic - marking as present")
-                    else:
-                        # Face recognized but spoofed - mark as absent
-                        spoof_detected = True
-                        self.consecutive_spoofing_count += 1
-                        print(f"🚨 SPOOFING DETECTED for {self.app.current_user}: {spoof_result['status']} "
-                              f"(confidence: {spoof_result['confidence']:.2f}) - Count: {self.consecutive_spoofing_count}")
-
-                        # Log spoofing attempt
-                        self._log_spoofing_attempt(spoof_result)
-
-                else:
-                    # Face not recognized at all
-                    if self.debug_mode:
-                        print("Face not recognized - marking as absent")
-
-                # Update attendance based on presence status
-                update_attendance(self.app.current_user, is_present)
-                timers = get_user_timer_data(self.app.current_user)
-                present = timers['presentCounter']
-                absent = timers['absentCounter']
-                missed = timers['absentTimeCounter']
-
-                # Read emp_id
-                try:
-                    with open(self.users_file_path, 'r') as f:
-                        users_data = json.load(f)
-                        emp_id = users_data.get(self.app.current_user, "N/A")
-                except:
-                    emp_id = "N/A"
-
-                # Update UI
-                def update_ui():
-                    self.app.label_present_time.config(text=f"Present: {present}s")
-                    self.app.label_absent_time.config(text=f"Absent: {absent}s")
-                    self.app.label_total_missed.config(text=f"Total Missed: {missed}s")
-
-                    # Update name and emp_id labels
-                    if not hasattr(self.app, 'label_name'):
-                        self.app.label_name = tk.Label(self.app.main_window, text=f"Name: {self.app.current_user}",
-                                                       font=("Helvetica", 12))
-                        self.app.label_name.place(x=750, y=120)
-                    else:
-                        self.app.label_name.config(text=f"Name: {self.app.current_user}")
-
-                    if not hasattr(self.app, 'label_emp_id'):
-                        self.app.label_emp_id = tk.Label(self.app.main_window, text=f"Emp ID: {emp_id}",
-                                                         font=("Helvetica", 12))
-                        self.app.label_emp_id.place(x=750, y=150)
-                    else:
-                        self.app.label_emp_id.config(text=f"Emp ID: {emp_id}")
-
-                    # Add security status label
-                    if not hasattr(self.app, 'label_security_status'):
-                        self.app.label_security_status = tk.Label(self.app.main_window, text="Security: OK",
-                                                                  font=("Helvetica", 10), fg="green")
-                        self.app.label_security_status.place(x=750, y=180)
-
-                    # Update security status
-                    if spoof_detected:
-                        self.app.label_security_status.config(text="Security: SPOOFING DETECTED", fg="red")
-                    elif face_recognized and is_present:
-                        self.app.label_security_status.config(text="Security: AUTHENTICATED", fg="green")
-                    elif face_recognized and not is_present:
-                        self.app.label_security_status.config(text="Security: FACE NOT DETECTED", fg="orange")
-                    else:
-                        self.app.label_security_status.config(text="Security: NOT PRESENT", fg="gray")
-
-                    # Absence alert
-                    if missed > 0 and missed > self.alert_threshold and missed % 30 == 0:
-                        util.msg_box("Warning!", f"{self.app.current_user} has been absent for {missed} seconds!")
-                        self.alert_threshold = missed
-
-                    # Spoofing detection alerts
-                    if spoof_detected:
-                        self.spoofing_alert_counter += 1
-
-                        # Immediate alert for first spoofing detection
-                        if self.spoofing_alert_counter == 1:
-                            util.msg_box("🚨 SECURITY ALERT!",
-                                         f"Spoofing attempt detected for {self.app.current_user}!\n"
-                                         f"Please use live camera, not photos/videos.")
-
-                        # Periodic alerts for continued spoofing
-                        elif self.spoofing_alert_counter % 6 == 0:  # Every 30 seconds
-                            util.msg_box("🚨 CONTINUED SPOOFING!",
-                                         f"Multiple spoofing attempts detected for {self.app.current_user}!\n"
-                                         f"Count: {self.consecutive_spoofing_count}\n"
-                                         f"Please use live camera only.")
-
-                self.app.main_window.after(0, update_ui)
-
-            except Exception as e:
-                print(f"Error in recognition task: {e}")
-                import traceback
-                traceback.print_exc()
-
-            # Schedule next update
-            self.job_id = self.app.main_window.after(self.interval_ms, self._perform_update)
+                    print("✓ Face is authentic - marking as present")
+            else:
+                # Face recognized but spoofed - mark as absent
+                self._log_spoofing_attempt(spoof_result, expected_user)
 
-        threading.Thread(target=recognition_task, daemon=True).start()
+        elif self.debug_mode:
+            print("Face not recognized - marking as absent")
 
-    def _log_spoofing_attempt(self, spoof_result):
-        """Log spoofing attempts to a file"""
-        try:
-            log_entry = f"{time.strftime('%Y-%m-%d %H:%M:%S')},{self.app.current_user}," \
-                        f"SPOOFING_ATTEMPT,{spoof_result['status']},{spoof_result['confidence']:.4f}\n"
-
-            with open("spoofing_log.txt", "a") as f:
-                f.write(log_entry)
+        emp_id = self.recognition.get_emp_id(expected_user)
 
+        return {
+            'user': expected_user,
+            'observed_at': observed_at,
+            'emp_id': emp_id,
+            'face_recognized': face_recognized,
+            'is_present': is_present,
+            'spoof_detected': face_recognized and not is_present,
+            'spoof_result': spoof_result,
+            'signature': signature,
+            'face_box': face_box,
+            'continuous': continuous,
+        }
+
+    def _face_box(self, observed_at):
+        """Box of the face verify() just detected (None if the last detection is older than this check)"""
+        last = self.recognition.last_face_location
+        if last is None or last[2] < observed_at:
+            return None
+        return last[0]
+
+    def _update_track(self, result):
+        """Track continuity between checks; liveness is only ever reused within one track"""
+        if result is None or result['face_box'] is None:
+            self.track = None
+            return
+        if not result['continuous']:
+            self.track_id += 1
+        self.track = (result['user'], result['face_box'], self.track_id)
+
+    def _on_presence_error(self, error, generation, submitted_at):
+        if isinstance(error, JobDropped):
+            # Check waited too long behind other work - no observation, not an absence,
+            # but monitoring (and the governor's samples) must go on
+            self.app.load_governor.record((time.monotonic() - submitted_at) * 1000)
+            if generation == self.generation:
+                self.track = None  # unseen in between, so the next face starts a new track
+                self._schedule_next()
+            return
+        self._apply_presence_result(None, generation, submitted_at)
+
+    def _apply_presence_result(self, result, generation, submitted_at=None):
+        """Runs on the Tk thread with the result of _check_presence"""
+        if submitted_at is not None:
+            self.app.load_governor.record((time.monotonic() - submitted_at) * 1000)
+        if generation != self.generation:
+            # Timer was stopped (or restarted) while this check was in flight
+            return
+        try:
+            if result is None:
+                self.track = None
+                self.interval_ms = self.scheduler.update(False, False)
+            elif result['user'] == self.app.current_user:
+                self._update_track(result)
+                spoof_result = result['spoof_result']
+                if spoof_result and spoof_result['status'] == 'authentic':
+                    self.last_live = (result['user'], result['observed_at'], spoof_result['confidence'],
+                                      self.track_id)
+                elif spoof_result and not spoof_result['is_authentic']:
+                    # A failed liveness check is never covered by an earlier pass
+                    self.last_live = None
+                self._update_presence_ui(result)
+                liveness = result['spoof_result']['confidence'] if result['spoof_result'] else 0.0
+                self.interval_ms = self.scheduler.update(result['face_recognized'], result['is_present'],
+                                                         liveness, result['signature'])
+                if self.debug_mode:
+                    print(f"Next presence check in {self.interval_ms} ms")
         except Exception as e:
-            print(f"Error logging spoofing attempt: {e}")
+            print(f"Error applying presence result: {e}")
+            import traceback
+            traceback.print_exc()
+
+        # Schedule next update
+        self._schedule_next()
+
+    def _update_presence_ui(self, result):
+        face_recognized = result['face_recognized']
+        is_present = result['is_present']
+        spoof_detected = result['spoof_detected']
+        emp_id = result['emp_id']
+
+        if spoof_detected:
+            spoof_result = result['spoof_result']
+            self.consecutive_spoofing_count += 1
+            print(f"🚨 SPOOFING DETECTED for {self.app.current_user}: {spoof_result['status']} "
+                  f"(confidence: {spoof_result['confidence']:.2f}) - Count: {self.consecutive_spoofing_count}")
+        elif is_present:
+            self.consecutive_spoofing_count = 0  # Reset spoofing counter
+
+        # Update attendance based on presence status
+        update_attendance(self.app.current_user, is_present, timestamp=result['observed_at'])
+        timers = get_user_timer_data(self.app.current_user)
+        present = timers['presentCounter']
+        absent = timers['absentCounter']
+        missed = timers['absentTimeCounter']
+        self.app.record_attendance(emp_id, 'present' if is_present else 'absent',
+                                   worked_time=present, absent_time=missed)
+
+        self.app.label_present_time.config(text=f"Present: {present}s")
+        self.app.label_absent_time.config(text=f"Absent: {absent}s")
+        self.app.label_total_missed.config(text=f"Total Missed: {missed}s")
+
+        # Update name and emp_id labels
+        if not hasattr(self.app, 'label_name'):
+            self.app.label_name = tk.Label(self.app.main_window, text=f"Name: {self.app.current_user}",
+                                           font=("Helvetica", 12))
+            self.app.label_name.place(x=750, y=120)
+        else:
+            self.app.label_name.config(text=f"Name: {self.app.current_user}")
+
+        if not hasattr(self.app, 'label_emp_id'):
+            self.app.label_emp_id = tk.Label(self.app.main_window, text=f"Emp ID: {emp_id}",
+                                             font=("Helvetica", 12))
+            self.app.label_emp_id.place(x=750, y=150)
+        else:
+            self.app.label_emp_id.config(text=f"Emp ID: {emp_id}")
+
+        # Add security status label
+        if not hasattr(self.app, 'label_security_status'):
+            self.app.label_security_status = tk.Label(self.app.main_window, text="Security: OK",
+                                                      font=("Helvetica", 10), fg="green")
+            self.app.label_security_status.place(x=750, y=180)
+
+        # Update security status
+        if spoof_detected:
+            self.app.label_security_status.config(text="Security: SPOOFING DETECTED", fg="red")
+        elif face_recognized and is_present:
+            self.app.label_security_status.config(text="Security: AUTHENTICATED", fg="green")
+        elif face_recognized and not is_present:
+            self.app.label_security_status.config(text="Security: FACE NOT DETECTED", fg="orange")
+        else:
+            self.app.label_security_status.config(text="Security: NOT PRESENT", fg="gray")
+
+        # Absence alert, once per completed grace period of missed time
+        if missed // ABSENCE_GRACE_SECONDS > self.alert_threshold // ABSENCE_GRACE_SECONDS:
+            util.msg_box("Warning!", f"{self.app.current_user} has been absent for {missed} seconds!")
+            self.alert_threshold = missed
+
+        # Spoofing detection alerts
+        if spoof_detected:
+            self.spoofing_alert_counter += 1
+
+            # Immediate alert for first spoofing detection
+            if self.spoofing_alert_counter == 1:
+                self.last_spoofing_alert_time = result['observed_at']
+                util.msg_box("🚨 SECURITY ALERT!",
+                             f"Spoofing attempt detected for {self.app.current_user}!\n"
+                             f"Please use live camera, not photos/videos.")
+
+            # Periodic alerts for continued spoofing (check interval is adaptive, so go by the clock)
+            elif result['observed_at'] - self.last_spoofing_alert_time >= 30:
+                self.last_spoofing_alert_time = result['observed_at']
+                util.msg_box("🚨 CONTINUED SPOOFING!",
+                             f"Multiple spoofing attempts detected for {self.app.current_user}!\n"
+                             f"Count: {self.consecutive_spoofing_count}\n"
+                             f"Please use live camera only.")
+
+    def _log_spoofing_attempt(self, spoof_result, user):
+        """Record a spoofing attempt in the event journal (spoofing_log.txt)"""
+        self.app.event_journal.log_spoofing(user, spoof_result['status'], spoof_result['confidence'])
 
     def enable_debug(self, enable=True):
         """Enable or disable debug mode"""
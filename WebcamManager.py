@@ -1,9 +1,13 @@
+import threading
+import time
+from collections import deque
+
 import cv2
 from PIL import Image, ImageTk
 
 
 class WebcamManager:
-    def __init__(self, camera_index=0, update_interval=20):
+    def __init__(self, camera_index=0, update_interval=20, buffer_size=8):
         self.camera_index = camera_index
         self.update_interval = update_interval
         self.cap = None
@@ -11,6 +15,10 @@ class WebcamManager:
         self.running = False
         self.label = None
 
+        # Ring buffer of recent (timestamp, frame) for burst capture
+        self.buffer = deque(maxlen=buffer_size)
+        self.buffer_lock = threading.Lock()
+
     def start(self, label):
         self.label = label
         self.cap = cv2.VideoCapture(self.camera_index)
@@ -29,6 +37,8 @@ class WebcamManager:
         ret, frame = self.cap.read()
         if ret:
             self.frame = frame
+            with self.buffer_lock:
+                self.buffer.append((time.time(), frame))
             # Convert and display
             img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             pil_img = Image.fromarray(img_rgb)
@@ -40,4 +50,13 @@ class WebcamManager:
         self.label.after(self.update_interval, self._update_frame)
 
     def get_latest_frame(self):
-        return self.frame
\ No newline at end of file
+        return self.frame
+
+    def get_recent_frames(self, count, max_age_ms=None):
+        """Up to count most recent frames, newest first (optionally only those younger than max_age_ms)"""
+        with self.buffer_lock:
+            recent = list(self.buffer)[-count:]
+        if max_age_ms is not None:
+            cutoff = time.time() - max_age_ms / 1000.0
+            recent = [(taken_at, frame) for taken_at, frame in recent if taken_at >= cutoff]
+        return [frame for _, frame in reversed(recent)]
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+
+# Priority classes, highest first
+INTERACTIVE = 'interactive'  # login / logout: someone is waiting at the kiosk
+PRESENCE = 'presence'        # periodic presence checks (single user, CCTV, speculative login)
+MAINTENANCE = 'maintenance'  # gallery compaction and other housekeeping
+CLASSES = (INTERACTIVE, PRESENCE, MAINTENANCE)
+
+# Which class each orchestrator job kind belongs to (unknown kinds count as presence)
+KIND_CLASSES = {
+    'login': INTERACTIVE,
+    'logout': INTERACTIVE,
+    'presence': PRESENCE,
+    'multi_presence': PRESENCE,
+    'speculative': PRESENCE,
+    'maintenance': MAINTENANCE,
+}
+
+# How long a job of each class may wait before it is stale (None = never).
+# A presence check older than this is useless: the next tick will ask again.
+DEFAULT_DEADLINES = {INTERACTIVE: None, PRESENCE: 5.0, MAINTENANCE: None}
+
+Job = namedtuple('Job', 'key priority camera_id payload submitted_at deadline')
+
+
+class JobDropped(Exception):
+    """Passed to a job's on_error when the scheduler drops it for missing its deadline"""
+
+
+class WorkScheduler:
+    """
+    Decides which queued recognition job runs next.
+
+    - Strict priority between classes: interactive > presence > maintenance.
+    - Within a class, cameras take turns (round robin), so one busy camera
+      cannot starve the others; each camera's jobs run in FIFO order.
+    - Jobs whose deadline has passed are dropped when they reach the front
+      and handed to on_drop (the orchestrator reports them as JobDropped).
+    - Queueing delay (submit -> start) is recorded per class.
+
+    Thread-safe; does no waiting itself. The orchestrator signals its
+    workers once per put() and calls pop() when a worker is free.
+    """
+
+    def __init__(self, deadlines=None, on_drop=None, history=1000):
+        self.deadlines = dict(DEFAULT_DEADLINES)
+        self.deadlines.update(deadlines or {})
+        self.on_drop = on_drop
+        self._lock = threading.Lock()
+        # class -> OrderedDict(camera_id -> deque of jobs); dict order is the round-robin order
+        self._queues = {priority: OrderedDict() for priority in CLASSES}
+        self._delays = {priority: deque(maxlen=history) for priority in CLASSES}
+        self._counts = {priority: {'submitted': 0, 'started': 0, 'dropped': 0} for priority in CLASSES}
+
+    @staticmethod
+    def class_of(kind):
+        return KIND_CLASSES.get(kind, PRESENCE)
+
+    def put(self, key, payload, priority, camera_id=0, deadline=None):
+        """Queue a job. deadline: seconds it may wait (defaults to the class deadline)."""
+        now = time.monotonic()
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        job = Job(key, priority, camera_id, payload, now, None if deadline is None else now + deadline)
+        with self._lock:
+            self._queues[priority].setdefault(camera_id, deque()).append(job)
+            self._counts[priority]['submitted'] += 1
+        return job
+
+    def pop(self):
+        """Next job to run, or None if nothing (still valid) is queued"""
+        dropped = []
+        job = None
+        now = time.monotonic()
+        with self._lock:
+            for priority in CLASSES:
+                cameras = self._queues[priority]
+                while cameras and job is None:
+                    camera_id, jobs = next(iter(cameras.items()))
+                    candidate = jobs.popleft()
+                    # Rotate: this camera goes to the back of the line (or leaves it when empty)
+                    del cameras[camera_id]
+                    if jobs:
+                        cameras[camera_id] = jobs
+                    if candidate.deadline is not None and now > candidate.deadline:
+                        self._counts[priority]['dropped'] += 1
+                        dropped.append(candidate)
+                        continue
+                    job = candidate
+                if job is not None:
+                    self._counts[priority]['started'] += 1
+                    self._delays[priority].append(now - job.submitted_at)
+                    break
+        if self.on_drop is not None:
+            for stale in dropped:
+                self.on_drop(stale)
+        return job
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(jobs) for cameras in self._queues.values() for jobs in cameras.values())
+
+    def metrics(self):
+        """Per class: job counts and queueing delay percentiles in ms"""
+        with self._lock:
+            result = {}
+            for priority in CLASSES:
+                delays = np.asarray(self._delays[priority]) * 1000
+                stats = dict(self._counts[priority])
+                stats['queued'] = sum(len(jobs) for jobs in self._queues[priority].values())
+                if len(delays):
+                    stats.update(delay_p50_ms=float(np.percentile(delays, 50)),
+                                 delay_p95_ms=float(np.percentile(delays, 95)),
+                                 delay_max_ms=float(delays.max()))
+                result[priority] = stats
+            return result
+
+    def format_metrics(self):
+        lines = []
+        for priority, stats in self.metrics().items():
+            line = (f"{priority:>11}: {stats['submitted']} submitted, {stats['started']} started, "
+                    f"{stats['dropped']} dropped, {stats['queued']} queued")
+            if 'delay_p50_ms' in stats:
+                line += (f", queue delay p50 {stats['delay_p50_ms']:.0f} ms / p95 {stats['delay_p95_ms']:.0f} ms"
+                         f" / max {stats['delay_max_ms']:.0f} ms")
+            lines.append(line)
+        return '\n'.join(lines)
@@ -0,0 +1,193 @@
+import argparse
+import time
+
+import numpy as np
+
+from FaceStore import GalleryData
+from Gallery import GallerySnapshot
+from GalleryCompaction import print_report
+from ShardedGallery import ShardedGallery
+
+ENCODING_DIM = 128
+
+
+def synthetic_gallery(size, dim=ENCODING_DIM, seed=0, chunk=100000):
+    """
+    Random face-like encodings: dlib encodings have norm ~1 and distinct
+    people sit ~0.8-1.0 apart, which unit vectors in 128-d reproduce well.
+    """
+    rng = np.random.default_rng(seed)
+    avg = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, chunk):
+        block = rng.standard_normal((min(chunk, size - start), dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        avg[start:start + len(block)] = block
+    names = [f"user{i}" for i in range(size)]
+    emp_ids = [str(100000 + i) for i in range(size)]
+    return names, emp_ids, avg
+
+
+def synthetic_queries(avg, count, noise=0.02, seed=1):
+    """Queries near known rows (same person, new photo); returns (queries, true_rows)"""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(avg), count)
+    queries = avg[rows] + rng.normal(0, noise, (count, avg.shape[1])).astype(np.float32)
+    return queries.astype(np.float32), rows
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return f"p50 {np.percentile(samples, 50):7.2f} ms  p95 {np.percentile(samples, 95):7.2f} ms"
+
+
+def bench_sharded(args):
+    print(f"{'gallery':>10} {'shards':>6}  latency per login query")
+    for size in args.sizes:
+        names, emp_ids, avg = synthetic_gallery(size)
+        queries, rows = synthetic_queries(avg, args.queries)
+
+        # In-process baseline (what RecognitionHandler does without sharding)
+        snapshot = GallerySnapshot.from_gallery_data(_as_gallery_data(names, emp_ids, avg))
+        timings, hits = [], 0
+        for query, row in zip(queries, rows):
+            started = time.perf_counter()
+            best = snapshot.nearest(query)
+            timings.append((time.perf_counter() - started) * 1000)
+            hits += best[0][0] == names[row]
+        print(f"{size:>10} {'-':>6}  {percentiles(timings)}  recall {hits / len(rows):.3f}")
+
+        for shards in args.shards:
+            gallery = ShardedGallery(shards)
+            try:
+                started = time.perf_counter()
+                gallery.load(names, emp_ids, avg)
+                load_s = time.perf_counter() - started
+                timings, hits = [], 0
+                for query, row in zip(queries, rows):
+                    started = time.perf_counter()
+                    best = gallery.nearest(query, k=args.k)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    hits += best[0][0] == names[row]
+                print(f"{size:>10} {shards:>6}  {percentiles(timings)}  recall {hits / len(rows):.3f}"
+                      f"  (load {load_s:.1f}s)")
+
+                # Enrolment while sharded: adds go to the smallest shard, deletes trigger rebalancing
+                started = time.perf_counter()
+                for i in range(args.churn):
+                    gallery.add_identity(f"new{i}", "N/A", avg[i])
+                    gallery.remove_identity(names[i * shards % size])
+                churn_ms = (time.perf_counter() - started) * 1000 / max(1, args.churn)
+                print(f"{'':>10} {'':>6}  add+remove {churn_ms:.2f} ms, shard sizes {gallery.sizes}")
+            finally:
+                gallery.close()
+
+
+def synthetic_pose_gallery(size, poses=5, spread=0.3, dim=ENCODING_DIM, seed=0):
+    """Identities with `poses` pose encodings scattered ~spread around a unit-norm center"""
+    rng = np.random.default_rng(seed)
+    names, emp_ids, centers = synthetic_gallery(size, dim, seed)
+    multi = np.repeat(centers, poses, axis=0)
+    multi += rng.standard_normal(multi.shape, dtype=np.float32) * (spread / np.sqrt(dim))
+    avg = multi.reshape(size, poses, dim).mean(axis=1)
+    owner = np.repeat(np.arange(size, dtype=np.int32), poses)
+    return GalleryData(names, emp_ids, avg, multi, owner), centers
+
+
+def bench_cascade(args):
+    print(f"{'gallery':>10} {'method':>14}  latency per query            truth  agrees w/ full  rows read")
+    rng = np.random.default_rng(2)
+    for size in args.sizes:
+        data, centers = synthetic_pose_gallery(size, args.poses, args.spread)
+        snapshot = GallerySnapshot.from_gallery_data(data)
+        truth = rng.integers(0, size, args.queries)
+        queries = centers[truth] + rng.standard_normal((args.queries, ENCODING_DIM), dtype=np.float32) * (
+            args.spread / np.sqrt(ENCODING_DIM))
+
+        full_timings, full_results = [], []
+        for query in queries:
+            started = time.perf_counter()
+            full_results.append(snapshot.nearest_multi(query))
+            full_timings.append((time.perf_counter() - started) * 1000)
+        full_correct = sum(r[0] == data.names[t] for r, t in zip(full_results, truth))
+        print(f"{size:>10} {'full multi':>14}  {percentiles(full_timings)}  "
+              f"{full_correct / len(truth):5.3f}  {1:14.3f}  {size * args.poses:>9}")
+
+        for shortlist in args.shortlist:
+            timings, correct, agree = [], 0, 0
+            for query, full, t in zip(queries, full_results, truth):
+                started = time.perf_counter()
+                result = snapshot.nearest_cascade(query, shortlist)
+                timings.append((time.perf_counter() - started) * 1000)
+                correct += result[0] == data.names[t]
+                agree += result[0] == full[0]
+            print(f"{size:>10} {'cascade k=' + str(shortlist):>14}  {percentiles(timings)}  "
+                  f"{correct / len(truth):5.3f}  {agree / len(queries):14.3f}  {size + shortlist * args.poses:>9}")
+
+
+def bench_compact(args):
+    rng = np.random.default_rng(3)
+    data, centers = synthetic_pose_gallery(args.size, args.poses, args.spread)
+    reference = GallerySnapshot.from_gallery_data(data)
+    queries = centers[rng.integers(0, args.size, args.queries)] + rng.standard_normal(
+        (args.queries, ENCODING_DIM), dtype=np.float32) * (args.spread / np.sqrt(ENCODING_DIM))
+
+    for dtype in args.dtypes.split(','):
+        for max_prototypes in args.prototypes:
+            started = time.perf_counter()
+            compact = reference.compacted(dtype, max_prototypes or None)
+            print(f"\n== {dtype}, max prototypes {max_prototypes or 'all'} "
+                  f"(compaction {time.perf_counter() - started:.2f}s)")
+            print_report(reference, compact, queries)
+            timings = []
+            for query in queries[:100]:
+                started = time.perf_counter()
+                compact.nearest_multi(query)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"Full pose search: {percentiles(timings)}")
+
+
+def _as_gallery_data(names, emp_ids, avg):
+    return GalleryData(names, emp_ids, avg, np.zeros((0, avg.shape[1]), dtype=np.float32),
+                       np.zeros(0, dtype=np.int32))
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gallery search benchmarks on synthetic encodings")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sharded = subparsers.add_parser('sharded', help="latency vs shard count")
+    sharded.add_argument("--sizes", type=_int_list, default=[10000, 100000, 1000000],
+                         help="comma separated gallery sizes")
+    sharded.add_argument("--shards", type=_int_list, default=[1, 2, 4, 8], help="comma separated shard counts")
+    sharded.add_argument("--queries", type=int, default=200)
+    sharded.add_argument("--k", type=int, default=5, help="top-k returned per query")
+    sharded.add_argument("--churn", type=int, default=100, help="identities added/removed after loading")
+    sharded.set_defaults(func=bench_sharded)
+
+    cascade = subparsers.add_parser('cascade', help="average-encoding shortlist + pose re-rank vs full pose search")
+    cascade.add_argument("--sizes", type=_int_list, default=[10000, 100000, 200000],
+                         help="comma separated gallery sizes (identities)")
+    cascade.add_argument("--poses", type=int, default=5, help="pose encodings per identity")
+    cascade.add_argument("--spread", type=float, default=0.3, help="distance of poses from the identity center")
+    cascade.add_argument("--shortlist", type=_int_list, default=[5, 10, 20], help="comma separated k values")
+    cascade.add_argument("--queries", type=int, default=200)
+    cascade.set_defaults(func=bench_cascade)
+
+    compact = subparsers.add_parser('compact', help="memory/accuracy of pose prototypes and float16/int8 poses")
+    compact.add_argument("--size", type=int, default=100000, help="identities")
+    compact.add_argument("--poses", type=int, default=5, help="pose encodings per identity")
+    compact.add_argument("--spread", type=float, default=0.3, help="distance of poses from the identity center")
+    compact.add_argument("--dtypes", type=str, default="float32,float16,int8")
+    compact.add_argument("--prototypes", type=_int_list, default=[0, 3, 1], help="0 keeps every pose")
+    compact.add_argument("--queries", type=int, default=1000)
+    compact.set_defaults(func=bench_compact)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import face_recognition
+import numpy as np
+
+from FaceChips import CHIP_SIZE, chip_face_location, make_chip
+from FaceStore import FaceRecord, open_face_store
+from Gallery import GallerySnapshot, pairwise_distances
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Same threshold the registration wizard uses for "face already registered"
+DUPLICATE_TOLERANCE = 0.32
+
+
+def _pose_name(path):
+    return os.path.splitext(os.path.basename(path))[0].lower()
+
+
+def people_from_dir(photo_dir):
+    """
+    One sub-folder per employee named '<emp_id>_<name>', holding that person's
+    photos (front.jpg, left.jpg, ... or any names).
+    """
+    people = []
+    for entry in sorted(os.scandir(photo_dir), key=lambda e: e.name):
+        if not entry.is_dir() or '_' not in entry.name:
+            continue
+        emp_id, name = entry.name.split('_', 1)
+        photos = sorted(os.path.join(entry.path, f) for f in os.listdir(entry.path)
+                        if f.lower().endswith(IMAGE_EXTENSIONS))
+        people.append((name, emp_id, [(_pose_name(path), path) for path in photos]))
+    return people
+
+
+def people_from_csv(csv_path):
+    """CSV with columns name,emp_id,image - one row per photo, paths relative to the CSV"""
+    base = os.path.dirname(os.path.abspath(csv_path))
+    people = {}
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            key = (row['name'].strip(), row['emp_id'].strip())
+            path = os.path.join(base, row['image'].strip())
+            people.setdefault(key, []).append((_pose_name(path), path))
+    return [(name, emp_id, images) for (name, emp_id), images in people.items()]
+
+
+def encode_person(task):
+    """
+    Worker: detect and encode every photo of one person.
+    Photos are file paths (enroll) or stored image bytes (reencode).
+    Returns (name, emp_id, encodings, {pose: face chip bytes}, errors).
+    """
+    name, emp_id, photos, model, jitters = task
+    encodings, images, errors = [], {}, []
+    for pose, photo in photos:
+        if isinstance(photo, bytes):
+            data = photo
+        else:
+            with open(photo, 'rb') as f:
+                data = f.read()
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            errors.append(f"{pose}: unreadable")
+            continue
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb_frame, model=model)
+        if not locations and frame.shape[:2] == (CHIP_SIZE, CHIP_SIZE):
+            # Stored face chip: the face position is known
+            locations = [chip_face_location()]
+        if len(locations) != 1:
+            errors.append(f"{pose}: {len(locations)} faces")
+            continue
+        found = face_recognition.face_encodings(rgb_frame, locations, num_jitters=jitters)
+        if not found:
+            errors.append(f"{pose}: no encoding")
+            continue
+        encodings.append(found[0])
+        images[pose] = make_chip(rgb_frame, locations[0])
+    return name, emp_id, encodings, images, errors
+
+
+def encode_all(people, workers, model, jitters):
+    tasks = [(name, emp_id, photos, model, jitters) for name, emp_id, photos in people]
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(encode_person, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    print(f"Encoded {sum(len(r[2]) for r in results)} photos of {len(results)} people "
+          f"in {time.time() - started:.1f}s with {workers} workers")
+    for name, _, _, _, errors in results:
+        for error in errors:
+            print(f"  skipped {name}: {error}")
+    return results
+
+
+def find_duplicates(batch_encodings, snapshot, tolerance=DUPLICATE_TOLERANCE):
+    """
+    Duplicate check for the whole batch at once.
+    Returns {batch row: (existing name, emp_id, distance)} for matches against the
+    gallery, and [(row, other row, distance)] for people appearing twice in the batch.
+    """
+    gallery_hits = {}
+    if len(snapshot):
+        distances = snapshot.identity_distance_matrix(batch_encodings)
+        best = np.argmin(distances, axis=1)
+        for row, column in enumerate(best):
+            if distances[row, column] < tolerance:
+                gallery_hits[row] = (snapshot.name(column), snapshot.emp_id(column), float(distances[row, column]))
+
+    within = pairwise_distances(batch_encodings, batch_encodings)
+    rows, others = np.nonzero(np.triu(within < tolerance, k=1))
+    batch_hits = [(int(r), int(o), float(within[r, o])) for r, o in zip(rows, others)]
+    return gallery_hits, batch_hits
+
+
+def enroll(args):
+    people = people_from_csv(args.csv) if args.csv else people_from_dir(args.dir)
+    store = open_face_store(args.store, args.location)
+    existing = store.list_users()
+    existing_ids = set(existing.values())
+
+    todo = []
+    for name, emp_id, images in people:
+        if name in existing:
+            print(f"  skipped {name}: username already registered")
+        elif emp_id in existing_ids:
+            print(f"  skipped {name}: emp ID {emp_id} already registered")
+        elif not images:
+            print(f"  skipped {name}: no photos")
+        else:
+            todo.append((name, emp_id, images))
+    if not todo:
+        print("Nothing to enroll")
+        return
+
+    results = [r for r in encode_all(todo, args.workers, args.model, args.jitters) if r[2]]
+    if not results:
+        print("No faces could be encoded")
+        return
+    averages = np.array([np.mean(r[2], axis=0) for r in results], dtype=np.float32)
+
+    snapshot = GallerySnapshot.from_gallery_data(store.load_gallery())
+    gallery_hits, batch_hits = find_duplicates(averages, snapshot, args.tolerance)
+    rejected = set()
+    for row, (existing_name, existing_emp_id, distance) in gallery_hits.items():
+        print(f"  duplicate: {results[row][0]} looks like registered {existing_name} "
+              f"({existing_emp_id}), distance {distance:.3f}")
+        rejected.add(row)
+    for row, other, distance in batch_hits:
+        print(f"  duplicate in batch: {results[row][0]} and {results[other][0]}, distance {distance:.3f}")
+        rejected.add(other)
+    if args.allow_duplicates:
+        rejected = set()
+
+    records, images = [], {}
+    for row, (name, emp_id, encodings, pose_images, _) in enumerate(results):
+        if row in rejected:
+            continue
+        records.append(FaceRecord(name, emp_id, averages[row], encodings))
+        images[name] = pose_images
+
+    if args.dry_run:
+        print(f"Dry run: would enroll {len(records)} people ({len(rejected)} duplicates rejected)")
+        return
+    # One batch write: one users.json rewrite / one transaction for everybody
+    store.add_users(records, images)
+    print(f"Enrolled {len(records)} people ({len(rejected)} duplicates rejected)")
+
+
+def reencode(args):
+    """Recompute every user's encodings from the stored pose images / face chips"""
+    store = open_face_store(args.store, args.location)
+    users = store.list_users()
+    people = []
+    for name, emp_id in users.items():
+        images = store.get_images(name)
+        if images:
+            people.append((name, emp_id, sorted(images.items())))
+        else:
+            print(f"  skipped {name}: no pose images stored")
+
+    results = encode_all(people, args.workers, args.model, args.jitters)
+    records = []
+    for name, emp_id, encodings, _, _ in results:
+        if not encodings:
+            print(f"  kept old encodings for {name}: no face found in any pose image")
+            continue
+        records.append(FaceRecord(name, emp_id, np.mean(encodings, axis=0), encodings))
+
+    if args.dry_run:
+        print(f"Dry run: would re-encode {len(records)} of {len(users)} users")
+        return
+    # Encodings only: the stored images are left as they are
+    store.add_users(records)
+    print(f"Re-encoded {len(records)} of {len(users)} users")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk enrollment and re-encoding for the face database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def common(sub):
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="encoding processes")
+        sub.add_argument("--model", type=str, default="hog", help="face detector: hog / cnn")
+        sub.add_argument("--jitters", type=int, default=1, help="num_jitters for face_encodings")
+        sub.add_argument("--dry-run", action="store_true", help="encode and check, but write nothing")
+
+    enroll_parser = subparsers.add_parser('enroll', help="register many employees from photos")
+    source = enroll_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", type=str, help="folder with one '<emp_id>_<name>' sub-folder per employee")
+    source.add_argument("--csv", type=str, help="CSV with columns name,emp_id,image")
+    enroll_parser.add_argument("--store", type=str, default="filesystem", help="filesystem / sqlite / postgres")
+    enroll_parser.add_argument("--location", type=str, default="face_db", help="face_db folder or sqlite file")
+    enroll_parser.add_argument("--tolerance", type=float, default=DUPLICATE_TOLERANCE,
+                               help="distance below which two faces count as the same person")
+    enroll_parser.add_argument("--allow-duplicates", action="store_true")
+    common(enroll_parser)
+    enroll_parser.set_defaults(func=enroll)
+
+    reencode_parser = subparsers.add_parser('reencode', help="recompute encodings from stored pose images")
+    reencode_parser.add_argument("--store", type=str, default="filesystem", help="filesystem / sqlite / postgres")
+    reencode_parser.add_argument("--location", type=str, default="face_db", help="face_db folder or sqlite file")
+    common(reencode_parser)
+    reencode_parser.set_defaults(func=reencode)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
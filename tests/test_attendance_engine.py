@@ -0,0 +1,28 @@
+import pytest
+
+import timing_counters
+from AttendanceEngine import AttendanceEngine
+
+
+@pytest.mark.parametrize('step', [1, 5, 25, 50])
+def test_confirmed_absence_is_never_forgiven(step):
+    engine = AttendanceEngine()
+    for t in range(0, 201, step):
+        engine.tick([] if 100 < t <= 150 else ['alice'], now=1000.0 + t)
+    timers = engine.get_user_timer_data('alice')
+    assert (timers['presentCounter'], timers['absentTimeCounter']) == (150, 50)
+
+
+def test_matches_timing_counters():
+    engine = AttendanceEngine()
+    reference = {}
+    # A forgiven 15 s absence, a confirmed one spanning several ticks and one still open
+    observations = [(0, True), (5, False), (15, True), (20, False), (45, False), (70, False), (71, True),
+                    (100, True), (110, False), (160, False)]
+    for t, present in observations:
+        engine.tick(['bob'] if present else [], now=t)
+        timing_counters.apply_observation(reference, 'bob', present, t)
+    timers = engine.get_user_timer_data('bob')
+    assert timers['presentCounter'] == int(reference['bob']['presentCounter'])
+    assert timers['absentTimeCounter'] == int(reference['bob']['absentTimeCounter'])
+    assert timers['absentCounter'] == int(reference['bob']['absentCounter'])
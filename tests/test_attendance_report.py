@@ -0,0 +1,58 @@
+import datetime
+import gzip
+import json
+
+from AttendanceReport import AttendanceReport
+
+
+def _line(name, emp_id, timestamp, direction):
+    return json.dumps({'type': 'attendance', 'timestamp': timestamp, 'name': name,
+                       'emp_id': emp_id, 'direction': direction}) + '\n'
+
+
+def test_session_across_rotation_and_empty_day(tmp_path):
+    # alice logs in on the 1st, nothing happens on the 2nd, she logs out on the 3rd
+    with gzip.open(tmp_path / 'log.2026-03-01.txt.gz', 'wt') as f:
+        f.write(_line('alice', '7', '2026-03-01T22:00:00', 'in'))
+    (tmp_path / 'log.txt').write_text(_line('alice', '7', '2026-03-03T09:00:00', 'out'))
+
+    report = AttendanceReport(str(tmp_path / 'log.txt'))
+    hours = {day: report.worked_seconds(day, 'alice') / 3600 for day in ('2026-03-01', '2026-03-02', '2026-03-03')}
+    assert hours == {'2026-03-01': 2, '2026-03-02': 24, '2026-03-03': 9}
+
+
+def test_archives_are_read_in_date_order(tmp_path):
+    # String order would put the ".1" archive before the first one of the same day
+    with gzip.open(tmp_path / 'log.2026-03-01.txt.gz', 'wt') as f:
+        f.write(_line('bob', '8', '2026-03-01T08:00:00', 'in'))
+    with gzip.open(tmp_path / 'log.2026-03-01.1.txt.gz', 'wt') as f:
+        f.write(_line('bob', '8', '2026-03-01T12:00:00', 'out'))
+    (tmp_path / 'log.txt').write_text('')
+
+    report = AttendanceReport(str(tmp_path / 'log.txt'))
+    [session] = report.sessions('2026-03-01', 'bob')
+    assert (session.start, session.end) == (datetime.datetime(2026, 3, 1, 8), datetime.datetime(2026, 3, 1, 12))
+
+
+def test_finished_archives_are_not_reopened(tmp_path, monkeypatch):
+    with gzip.open(tmp_path / 'log.2026-03-01.txt.gz', 'wt') as f:
+        f.write(_line('alice', '7', '2026-03-01T22:00:00', 'in'))
+    (tmp_path / 'log.txt').write_text(_line('alice', '7', '2026-03-02T06:00:00', 'out'))
+    AttendanceReport(str(tmp_path / 'log.txt'))
+
+    opened = []
+    real_open = gzip.open
+    monkeypatch.setattr(gzip, 'open', lambda *args, **kwargs: opened.append(args[0]) or real_open(*args, **kwargs))
+    with open(tmp_path / 'log.txt', 'a') as f:
+        f.write(_line('alice', '7', '2026-03-02T07:00:00', 'in'))
+    report = AttendanceReport(str(tmp_path / 'log.txt'))
+    assert report.refresh() == 0
+    assert opened == []
+    assert report.worked_seconds('2026-03-02', 'alice', now=datetime.datetime(2026, 3, 2, 8)) == 7 * 3600
+
+    # A replaced archive is indexed again
+    with real_open(tmp_path / 'log.2026-03-01.txt.gz', 'wt') as f:
+        f.write(_line('alice', '7', '2026-03-01T21:00:00', 'in'))
+    report = AttendanceReport(str(tmp_path / 'log.txt'))
+    assert len(opened) == 1
+    assert report.worked_seconds('2026-03-01', 'alice') == 3 * 3600
@@ -0,0 +1,32 @@
+from DatabaseModel.AttendanceSync import AttendanceWriteBehind
+
+
+def test_unsent_fields_are_left_alone_and_none_clears(tmp_path):
+    calls = []
+    sync = AttendanceWriteBehind(str(tmp_path / 'spill.jsonl'), upsert_batch=lambda rows, fields: calls.append(
+        (fields, rows)))
+    sync.submit(1, 'present', time_in='09:00')
+    sync.submit(1, 'absent', worked_time=10)
+    sync.submit(2, 'logged_out', time_out=None)
+
+    assert sync.flush() == 2
+    day = calls[0][1][0][1]
+    assert sorted(calls) == [(('status', 'time_in', 'worked_time'), [(1, day, 'absent', '09:00', 10)]),
+                             (('status', 'time_out'), [(2, day, 'logged_out', None)])]
+
+
+def test_failed_flush_spills_and_retries(tmp_path):
+    def unreachable(rows, fields):
+        raise ConnectionError("database down")
+
+    sync = AttendanceWriteBehind(str(tmp_path / 'spill.jsonl'), upsert_batch=unreachable)
+    sync.submit(1, 'present', worked_time=5)
+    assert sync.flush() == 0
+
+    calls = []
+    sync.upsert_batch = lambda rows, fields: calls.append((fields, rows))
+    sync.submit(1, 'present', absent_time=None)
+    assert sync.flush() == 1
+    assert calls[0][0] == ('status', 'worked_time', 'absent_time')
+    assert calls[0][1][0][2:] == ('present', 5, None)
+    assert not (tmp_path / 'spill.jsonl').exists()
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from DatabaseModel.DBInstanceProvider import ConnectionPool, PoolExhausted, load_config, sqlite_connect_factory
+
+
+def _pool(tmp_path, **overrides):
+    config = load_config(path=str(tmp_path / 'missing.json'))
+    config.update(max_connections=2, health_check_after=0, checkout_timeout=0.2)
+    config.update(overrides)
+    return ConnectionPool(config, connect_factory=sqlite_connect_factory(str(tmp_path / 'test.db')))
+
+
+def test_commit_and_rollback(tmp_path):
+    pool = _pool(tmp_path)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise ValueError("boom")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+    pool.closeall()
+
+
+def test_exhausted_pool_waits_then_times_out(tmp_path):
+    pool = _pool(tmp_path, max_connections=1)
+    held = pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.2
+
+    # A connection returned while someone waits is handed over
+    threading.Timer(0.05, pool.putconn, (held,)).start()
+    conn = pool.getconn()
+    pool.putconn(conn)
+    pool.closeall()
+
+
+def test_dead_connection_is_replaced(tmp_path):
+    pool = _pool(tmp_path, max_connections=1)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.close()
+
+    replacement = pool.getconn()
+    assert replacement is not conn
+    replacement.execute("SELECT 1")
+    pool.putconn(replacement)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    pool.closeall()
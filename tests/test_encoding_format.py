@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from DatabaseModel.EncodingFormat import decode_encoding, encode_encoding, encoding_dim
+
+
+def test_round_trip():
+    encoding = np.random.default_rng(0).standard_normal(128).astype(np.float32)
+    data = encode_encoding(encoding)
+    assert len(data) == 518
+    np.testing.assert_array_equal(decode_encoding(data), encoding)
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_legacy_raw_bytea(dtype):
+    encoding = np.random.default_rng(1).standard_normal(128).astype(dtype)
+    data = encoding.tobytes()
+    assert encoding_dim(data) == 128
+    decoded = decode_encoding(memoryview(data))
+    assert decoded.shape == (128,)
+    np.testing.assert_allclose(decoded, encoding.astype(np.float32))
+
+    out = np.zeros(128, dtype=np.float32)
+    decode_encoding(data, out=out)
+    np.testing.assert_allclose(out, encoding.astype(np.float32))
+
+
+def test_legacy_raw_bytea_of_unexpected_size_is_refused():
+    data = np.zeros(100, dtype=np.float64).tobytes()
+    assert encoding_dim(data) is None
+    with pytest.raises(ValueError, match="800 bytes"):
+        decode_encoding(data)
+
+
+def test_legacy_float_list():
+    np.testing.assert_array_equal(decode_encoding([0.5] * 128), np.full(128, 0.5, dtype=np.float32))
@@ -0,0 +1,39 @@
+import datetime
+
+from EventJournal import EventJournal, read_events
+
+
+def _journal(tmp_path, **kwargs):
+    return EventJournal(str(tmp_path / 'log.txt'), str(tmp_path / 'spoofing_log.txt'), flush_interval=0.05, **kwargs)
+
+
+def test_rotates_on_the_event_day_not_the_write_day(tmp_path):
+    # Both events are written in the same batch, after midnight
+    journal = _journal(tmp_path)
+    journal.log_attendance('alice', '7', 'out', timestamp=datetime.datetime(2026, 3, 1, 23, 59, 59))
+    journal.log_attendance('bob', '8', 'in', timestamp=datetime.datetime(2026, 3, 2, 0, 0, 1))
+    journal.start()
+    journal.stop()
+
+    archived = list(read_events(str(tmp_path / 'log.2026-03-01.txt.gz')))
+    current = list(read_events(str(tmp_path / 'log.txt')))
+    assert [e.name for e in archived] == ['alice']
+    assert [e.name for e in current] == ['bob']
+
+
+def test_attendance_events_are_kept_when_the_queue_is_full(tmp_path):
+    journal = _journal(tmp_path, max_queue=1)
+    start = datetime.datetime(2026, 3, 2, 9)
+    for i, direction in enumerate(['in', 'out', 'in', 'out']):
+        journal.log_attendance('alice', '7', direction, timestamp=start + datetime.timedelta(minutes=i))
+    # Spoofing events are still dropped and counted
+    journal.log_spoofing('alice', 'photo', 0.9, timestamp=start)
+    assert journal.dropped_events == 1
+    assert len(journal.overflow) == 3
+
+    journal.start()
+    journal.stop()
+    events = list(read_events(str(tmp_path / 'log.txt')))
+    assert [e.direction for e in events] == ['in', 'out', 'in', 'out']
+    assert [e.timestamp for e in events] == sorted(e.timestamp for e in events)
+    assert not (tmp_path / 'log.2026-03-02.txt.gz').exists()
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from FaceStore import DuplicateEmpIdError, FaceRecord, FilesystemFaceStore, PostgresFaceStore, SQLiteFaceStore
+
+
+def _record(name, emp_id, seed=0):
+    encodings = list(np.random.default_rng(seed).standard_normal((2, 128)).astype(np.float32))
+    return FaceRecord(name, emp_id, np.mean(encodings, axis=0), encodings)
+
+
+def _postgres_store(monkeypatch):
+    # Needs a scratch PostgreSQL database, e.g. FR_TEST_DB_NAME=fr_test; the face_store_* tables are dropped
+    pytest.importorskip("psycopg2")
+    if not os.environ.get("FR_TEST_DB_NAME"):
+        pytest.skip("FR_TEST_DB_NAME not set")
+    from DatabaseModel import DBInstanceProvider
+    monkeypatch.setenv("FR_DB_NAME", os.environ["FR_TEST_DB_NAME"])
+    DBInstanceProvider.set_pool(DBInstanceProvider.ConnectionPool())
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS face_store_users, face_store_images, face_store_changes;")
+    return PostgresFaceStore()
+
+
+@pytest.fixture(params=['filesystem', 'sqlite', 'postgres'])
+def store(request, tmp_path, monkeypatch):
+    if request.param == 'filesystem':
+        yield FilesystemFaceStore(str(tmp_path / 'face_db'))
+    elif request.param == 'sqlite':
+        yield SQLiteFaceStore(str(tmp_path / 'faces.sqlite3'))
+    else:
+        yield _postgres_store(monkeypatch)
+        from DatabaseModel import DBInstanceProvider
+        DBInstanceProvider.set_pool(None)
+
+
+def test_rejects_emp_id_of_another_user(store):
+    store.add_users([_record('alice', '100')])
+    _, token = store.changes_since(None)
+
+    with pytest.raises(DuplicateEmpIdError):
+        store.add_users([_record('bob', '100', seed=1)])
+    with pytest.raises(DuplicateEmpIdError):
+        store.add_user('bob', '100', *_record('bob', '100', seed=1)[2:])
+    with pytest.raises(DuplicateEmpIdError):
+        store.add_users([_record('carol', '200'), _record('dave', '200')])
+
+    assert store.list_users() == {'alice': '100'}
+    assert store.changes_since(token) == ([], token)
+
+
+def test_re_registration_keeps_the_user(store):
+    store.add_users([_record('alice', '100')])
+    store.add_users([_record('alice', '101', seed=1)])
+    assert store.list_users() == {'alice': '101'}
+    np.testing.assert_allclose(store.get_user('alice').avg_encoding, _record('alice', '101', seed=1).avg_encoding)
+
+
+def test_filesystem_fingerprint_sees_same_mtime_rewrite(tmp_path):
+    store = FilesystemFaceStore(str(tmp_path))
+    store._write_users({'alice': '100'})
+    stat = os.stat(store.users_file)
+    before = store.fingerprint()
+
+    # Same size and mtime, different contents
+    store._write_users({'alice': '101'})
+    os.utime(store.users_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert store.fingerprint() != before
@@ -0,0 +1,72 @@
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from FrameQuality import BurstSelector, score_frame
+
+
+class FakeWebcam:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def get_recent_frames(self, count, max_age_ms):
+        return self.frames[-count:]
+
+
+def _scene():
+    # Textured mid-gray scene, sharp enough to pass the blur check
+    texture = np.random.default_rng(0).integers(60, 200, (60, 80), dtype=np.uint8)
+    gray = cv2.resize(texture, (320, 240), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def _blurred(frame, size):
+    return cv2.GaussianBlur(frame, (size, size), 0)
+
+
+def _dark(frame):
+    return (frame * 0.1).astype(np.uint8)
+
+
+def test_rejects_burst_of_dark_or_blurred_frames():
+    scene = _scene()
+    selector = BurstSelector(FakeWebcam([_dark(scene), _blurred(scene, 31), _dark(_blurred(scene, 5))]))
+
+    frame, score = selector.pick()
+    assert frame is None
+    assert score.score == 0 and score.reason in ('too_dark', 'blurred')
+    assert (selector.rejected, selector.selected) == (1, 0)
+
+    assert score_frame(_dark(scene)).reason == 'too_dark'
+    assert score_frame(_blurred(scene, 31)).reason == 'blurred'
+
+
+def test_picks_sharpest_frame():
+    scene = _scene()
+    frames = [_blurred(scene, 5), scene, _blurred(scene, 3), _dark(scene), _blurred(scene, 31)]
+    selector = BurstSelector(FakeWebcam(frames))
+
+    frame, score = selector.pick()
+    assert frame is scene
+    assert score.reason is None and score.score > 0
+    assert (selector.rejected, selector.selected) == (0, 1)
+
+
+def test_falls_back_to_the_given_frame():
+    scene = _scene()
+    frame, _ = BurstSelector(FakeWebcam([])).pick(fallback_frame=scene)
+    assert frame is scene
+    assert BurstSelector(FakeWebcam([])).pick() == (None, None)
+
+
+def test_small_recent_face_is_rejected():
+    scene = _scene()
+    recognition = SimpleNamespace(last_face_location=((100, 150, 110, 140), scene.shape, time.time()))
+    frame, score = BurstSelector(FakeWebcam([scene]), recognition).pick()
+    assert frame is None and score.reason == 'face_too_small'
+
+    # An old face box is ignored
+    recognition.last_face_location = ((100, 150, 110, 140), scene.shape, time.time() - 60)
+    assert BurstSelector(FakeWebcam([scene]), recognition).pick()[0] is scene
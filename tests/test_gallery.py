@@ -0,0 +1,75 @@
+import numpy as np
+
+from Gallery import GallerySnapshot
+
+
+def _encoding(seed):
+    return np.random.default_rng(seed).normal(size=128).astype(np.float32)
+
+
+def _gallery(*names):
+    snapshot = GallerySnapshot.empty()
+    for i, name in enumerate(names):
+        snapshot = snapshot.with_identity(name, str(100 + i), _encoding(i), [_encoding(i)])
+    return snapshot
+
+
+def test_older_snapshot_keeps_rows_after_replace():
+    old = _gallery('alice', 'bob')
+    new = old.with_identity('alice', '999', _encoding(7), [_encoding(7)])
+
+    assert old.emp_id_of('alice') == '100'
+    assert new.emp_id_of('alice') == '999'
+    assert old.row_of('alice') != new.row_of('alice')
+
+
+def test_older_snapshot_keeps_rows_after_delete_and_readd():
+    old = _gallery('alice', 'bob')
+    removed = old.without_identity('alice')
+    readded = removed.with_identity('alice', '555', _encoding(9))
+
+    assert removed.row_of('alice') is None
+    assert removed.emp_id_of('alice') == 'N/A'
+    assert old.emp_id_of('alice') == '100'
+    assert readded.emp_id_of('alice') == '555'
+    assert old.emp_id_of('bob') == '101'
+
+
+def test_unknown_name():
+    assert _gallery('alice').row_of('carol') is None
+
+
+def _compact_gallery(count=20):
+    snapshot = GallerySnapshot.empty()
+    for i in range(count):
+        poses = [_encoding(1000 + 5 * i + j) * 0.05 for j in range(3)]
+        snapshot = snapshot.with_identity(f'user{i}', str(i), np.mean(poses, axis=0), poses)
+    return snapshot.compacted(pose_dtype='int8')
+
+
+def test_identity_distance_matrix_matches_single_queries():
+    snapshot = _compact_gallery().without_identity('user3')
+    queries = np.stack([_encoding(50 + i) * 0.05 for i in range(4)])
+    matrix = snapshot.identity_distance_matrix(queries)
+    for query, row in zip(queries, matrix):
+        np.testing.assert_allclose(row, snapshot.identity_distances(query), rtol=1e-5)
+
+
+def test_multi_encodings_dict_skips_deleted_rows():
+    snapshot = _compact_gallery().without_identity('user3')
+    multi = snapshot.multi_encodings_dict
+    assert 'user3' not in multi
+    assert len(multi['user4']) == 3
+    np.testing.assert_allclose(multi['user4'][0], snapshot.pose_encodings(snapshot.row_of('user4'))[0])
+
+
+def test_int8_gallery_widens_scales_instead_of_clipping():
+    snapshot = _compact_gallery()
+    before = snapshot.pose_encodings(snapshot.row_of('user0'))
+    outlier = np.full(128, 1.0, dtype=np.float32)
+
+    updated = snapshot.with_identity('outlier', '99', outlier, [outlier])
+
+    assert updated.pose_codec.dtype == 'int8'
+    np.testing.assert_allclose(updated.pose_encodings(updated.row_of('outlier'))[0], outlier, atol=0.01)
+    np.testing.assert_allclose(updated.pose_encodings(updated.row_of('user0')), before, atol=0.01)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from FaceStore import FaceRecord, FilesystemFaceStore
+from Gallery import GallerySnapshot
+from GalleryCache import GalleryCache
+
+
+def _records(count):
+    rng = np.random.default_rng(0)
+    records = []
+    for i in range(count):
+        poses = list(rng.standard_normal((3, 128)).astype(np.float32) * 0.1)
+        records.append(FaceRecord(f'user{i}', str(100 + i), np.mean(poses, axis=0), poses))
+    return records
+
+
+def _cache(tmp_path, count=12):
+    store = FilesystemFaceStore(str(tmp_path / 'face_db'))
+    store.add_users(_records(count))
+    return store, GalleryCache(store)
+
+
+def test_snapshot_is_served_from_the_mapped_artifact(tmp_path):
+    store, cache = _cache(tmp_path)
+    snapshot = cache.load_snapshot()
+    reference = GallerySnapshot.from_gallery_data(store.load_gallery())
+
+    assert isinstance(snapshot.avg_encodings, np.memmap)
+    assert len(snapshot) == 12
+    assert snapshot.emp_id_of('user7') == '107'
+    assert snapshot.row_of('nobody') is None
+    np.testing.assert_array_equal(snapshot.pose_encodings(snapshot.row_of('user3')),
+                                  reference.pose_encodings(reference.row_of('user3')))
+    query = _records(12)[5].multi_encodings[1]
+    assert snapshot.nearest_identities(query, k=3) == reference.nearest_identities(query, k=3)
+
+    # A second load opens the same version instead of rebuilding it
+    with open(tmp_path / 'face_db' / '.gallery' / 'CURRENT') as f:
+        version = f.read()
+    cache.load_snapshot()
+    with open(tmp_path / 'face_db' / '.gallery' / 'CURRENT') as f:
+        assert f.read() == version
+
+
+def test_appending_copies_the_mapped_storage(tmp_path):
+    _, cache = _cache(tmp_path)
+    snapshot = cache.load_snapshot()
+    encoding = np.full(128, 0.05, dtype=np.float32)
+
+    added = snapshot.with_identity('newcomer', '999', encoding, [encoding])
+    replaced = added.with_identity('user2', '555', encoding, [encoding])
+    removed = replaced.without_identity('user4')
+
+    assert added.emp_id_of('newcomer') == '999'
+    assert replaced.emp_id_of('user2') == '555'
+    assert removed.row_of('user4') is None
+    assert snapshot.emp_id_of('user2') == '102'
+    assert snapshot.row_of('newcomer') is None
+    assert len(removed) == 12
@@ -0,0 +1,51 @@
+from LoadGovernor import LEVELS, LoadGovernor
+
+
+def _feed(governor, latency_ms, count):
+    for _ in range(count):
+        governor.record(latency_ms)
+    return governor.level
+
+
+def test_steps_down_one_level_per_slow_window():
+    governor = LoadGovernor(slo_ms=1000, window=5)
+
+    assert _feed(governor, 1500, 4) == 0
+    assert _feed(governor, 1500, 1) == 1
+    assert governor.detection_scale == 0.5
+    # Samples are cleared on a change, so one more slow check does not move it again
+    assert _feed(governor, 1500, 1) == 1
+    assert _feed(governor, 1500, 4) == 2
+    assert governor.skip_recent_liveness
+
+
+def test_stops_at_the_lowest_level():
+    governor = LoadGovernor(slo_ms=1000, window=5)
+    assert _feed(governor, 5000, 5 * (len(LEVELS) + 2)) == len(LEVELS) - 1
+    assert governor.anti_spoof_models == 1
+
+    capped = LoadGovernor(slo_ms=1000, window=5, max_level=1)
+    assert _feed(capped, 5000, 20) == 1
+
+
+def test_steps_back_up_when_fast_again():
+    governor = LoadGovernor(slo_ms=1000, window=5)
+    _feed(governor, 1500, 10)
+    assert governor.level == 2
+
+    # Between recover_ratio * slo and slo: stays where it is
+    assert _feed(governor, 700, 5) == 2
+    assert _feed(governor, 200, 5) == 1
+    assert _feed(governor, 200, 5) == 0
+    assert _feed(governor, 200, 5) == 0
+    assert governor.transitions == 4
+
+
+def test_metrics():
+    governor = LoadGovernor(slo_ms=1000, window=5)
+    _feed(governor, 1500, 5)
+    metrics = governor.metrics()
+    assert metrics['level_name'] == 'reduced_scale'
+    assert metrics['checks'] == 5
+    assert metrics['over_slo'] == 5
+    assert metrics['recent_p95_ms'] is None
@@ -0,0 +1,102 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from DatabaseModel import DBInstanceProvider, MethodProvider
+
+
+def test_attendance_batch_checks_fields_before_connecting():
+    # No pool is needed: nothing here reaches the database
+    assert MethodProvider.upsert_attendance_batch([]) == 0
+    with pytest.raises(ValueError, match="shift"):
+        MethodProvider.upsert_attendance_batch([(1, datetime.date.today(), 'x')], fields=('shift',))
+
+
+# The tests below run MethodProvider's SQL, which is PostgreSQL-only (psycopg2 placeholders,
+# execute_values, server-side cursors, information_schema), so the sqlite stand-in pool cannot
+# serve them. They need a scratch PostgreSQL database, e.g. FR_TEST_DB_NAME=fr_test (FR_DB_* for
+# host/user/password); the tables are dropped and recreated in it.
+@pytest.fixture
+def database(monkeypatch):
+    pytest.importorskip("psycopg2")
+    if not os.environ.get("FR_TEST_DB_NAME"):
+        pytest.skip("FR_TEST_DB_NAME not set")
+    monkeypatch.setenv("FR_DB_NAME", os.environ["FR_TEST_DB_NAME"])
+    DBInstanceProvider.set_pool(DBInstanceProvider.ConnectionPool())
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS attendance, users;")
+            cur.execute("CREATE TABLE users (user_id integer PRIMARY KEY, name text, face_encoding bytea);")
+            cur.execute("""
+                CREATE TABLE attendance (user_id integer, date date, status text, time_in timestamp,
+                                         time_out timestamp, worked_time integer, absent_time integer,
+                                         PRIMARY KEY (user_id, date));
+            """)
+    yield
+    DBInstanceProvider.set_pool(None)
+
+
+def test_users_round_trip(database):
+    rng = np.random.default_rng(0)
+    encodings = rng.standard_normal((3, 128)).astype(np.float32)
+    for user_id, encoding in enumerate(encodings, start=1):
+        MethodProvider.add_user_with_id(user_id, f"user{user_id}", encoding)
+
+    assert MethodProvider.get_user_name_by_id(2) == "user2"
+    assert MethodProvider.get_user_name_by_id(99) is None
+    ids, matrix = MethodProvider.load_gallery(itersize=2)
+    assert ids.tolist() == [1, 2, 3]
+    np.testing.assert_array_equal(matrix, encodings)
+
+
+def test_attendance_batch_upsert(database):
+    MethodProvider.add_user_with_id(1, "alice", np.zeros(128, dtype=np.float32))
+    day = datetime.date.today()
+    MethodProvider.upsert_attendance_batch([(1, day, 'present', None, None, 60, 0)])
+    MethodProvider.upsert_attendance_batch([(1, day, 'present', None, None, 120, 5)])
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT worked_time, absent_time FROM attendance;")
+            assert cur.fetchall() == [(120, 5)]
+
+
+def test_migrate_float_array_column_to_bytea(database):
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE users CASCADE;")
+            cur.execute("CREATE TABLE users (user_id integer PRIMARY KEY, name text, face_encoding float8[]);")
+            cur.execute("INSERT INTO users VALUES (1, 'alice', %s);", ([0.25] * 128,))
+
+    assert MethodProvider.migrate_encodings_to_binary() == 1
+    ids, matrix = MethodProvider.load_gallery()
+    assert ids.tolist() == [1]
+    np.testing.assert_array_equal(matrix[0], np.full(128, 0.25, dtype=np.float32))
+
+
+def test_migrate_refuses_unknown_column_type(database):
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ALTER TABLE users ALTER COLUMN face_encoding TYPE text;")
+    with pytest.raises(RuntimeError, match="type text"):
+        MethodProvider.migrate_encodings_to_binary()
+
+
+def test_migrate_legacy_float64_bytea(database):
+    encoding = np.random.default_rng(2).standard_normal(128)
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO users VALUES (1, 'alice', %s);", (encoding.astype(np.float64).tobytes(),))
+
+    assert MethodProvider.migrate_encodings_to_binary() == 1
+    ids, matrix = MethodProvider.load_gallery()
+    np.testing.assert_allclose(matrix[0], encoding.astype(np.float32))
+
+
+def test_migrate_refuses_legacy_bytea_of_unknown_size(database):
+    with DBInstanceProvider.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO users VALUES (1, 'alice', %s);", (b'\x00' * 100,))
+    with pytest.raises(RuntimeError, match="user 1"):
+        MethodProvider.migrate_encodings_to_binary()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from Gallery import GallerySnapshot
+from ShardedGallery import ShardedGallery
+
+
+def _snapshot(size, seed=0):
+    rng = np.random.default_rng(seed)
+    snapshot = GallerySnapshot.empty()
+    for i in range(size):
+        snapshot = snapshot.with_identity(f"user{i}", str(100 + i), rng.normal(size=128).astype(np.float32))
+    return snapshot
+
+
+def _assert_same(sharded, snapshot, queries, k):
+    for query, result in zip(queries, sharded.nearest_batch(queries, k)):
+        expected = snapshot.nearest(query, k)
+        assert [(name, emp_id) for name, emp_id, _ in result] == [(name, emp_id) for name, emp_id, _ in expected]
+        np.testing.assert_allclose([d for _, _, d in result], [d for _, _, d in expected], rtol=1e-4)
+
+
+@pytest.fixture
+def gallery():
+    snapshot = _snapshot(40)
+    sharded = ShardedGallery.from_snapshot(snapshot, 3)
+    try:
+        yield snapshot, sharded
+    finally:
+        sharded.close()
+
+
+def test_matches_single_process_search(gallery):
+    snapshot, sharded = gallery
+    queries = np.random.default_rng(1).normal(size=(10, 128)).astype(np.float32)
+
+    assert len(sharded) == len(snapshot)
+    _assert_same(sharded, snapshot, queries, k=5)
+    assert sharded.nearest(queries[0]) == sharded.nearest_batch(queries[:1])[0]
+
+
+def test_matches_single_process_search_after_churn(gallery):
+    snapshot, sharded = gallery
+    rng = np.random.default_rng(2)
+    # Empty one shard's worth of identities so the shards have to rebalance
+    for i in range(0, 40, 3):
+        sharded.remove_identity(f"user{i}")
+        snapshot = snapshot.without_identity(f"user{i}")
+    for i in range(40, 45):
+        encoding = rng.normal(size=128).astype(np.float32)
+        sharded.add_identity(f"user{i}", str(100 + i), encoding)
+        snapshot = snapshot.with_identity(f"user{i}", str(100 + i), encoding)
+    encoding = rng.normal(size=128).astype(np.float32)
+    sharded.add_identity("user1", "999", encoding)
+    snapshot = snapshot.with_identity("user1", "999", encoding)
+
+    assert len(sharded) == len(snapshot)
+    assert max(sharded.sizes) - min(sharded.sizes) <= 1
+    _assert_same(sharded, snapshot, np.vstack([rng.normal(size=(5, 128)), encoding[None]]).astype(np.float32), k=3)
+
+
+def test_handler_updates_shards_under_the_publisher_lock(tmp_path):
+    pytest.importorskip('face_recognition')
+    from RecognitionHandler import RecognitionHandler
+
+    handler = RecognitionHandler(str(tmp_path), known_encodings=[], known_names=[], shards=2)
+    try:
+        held = []
+
+        def recording(method):
+            return lambda *args: held.append(handler._publisher._lock.locked()) or method(*args)
+        handler.sharded.add_identity = recording(handler.sharded.add_identity)
+        handler.sharded.remove_identity = recording(handler.sharded.remove_identity)
+
+        encoding = np.random.default_rng(3).normal(size=128).astype(np.float32)
+        handler.add_identity('alice', '100', encoding)
+        assert handler.sharded.nearest(encoding)[0][:2] == handler.gallery.nearest(encoding)[0][:2] == ('alice', '100')
+        handler.remove_identity('alice')
+        assert held == [True, True]
+        assert len(handler.sharded) == len(handler.gallery) == 0
+    finally:
+        handler.close()
@@ -0,0 +1,120 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from AdaptiveScheduler import frame_signature
+from SpeculativeRecognizer import SpeculativeRecognizer, Verdict
+
+
+class FakeOrchestrator:
+    QUEUED = 'queued'
+    BUSY = 'busy'
+
+    def __init__(self, frame=None):
+        self.frame = frame
+        self.jobs = []
+
+    def submit(self, kind, work, on_result, on_error=None, deadline=None):
+        self.jobs.append((kind, work, on_result))
+        return self.QUEUED
+
+    def latest_frame(self):
+        return self.frame
+
+
+class FakeWindow:
+    def after(self, delay_ms, callback):
+        return 1
+
+    def after_cancel(self, job_id):
+        pass
+
+
+def _frame(person):
+    # A bright figure in front of a dark background; each person stands somewhere else
+    frame = np.full((240, 320, 3), 40, dtype=np.uint8)
+    frame[40:220, 20 + person * 150:150 + person * 150] = 200
+    return frame
+
+
+def _speculative(frame, result=('alice', '100'), age_ms=0):
+    app = SimpleNamespace(current_user=None, main_window=FakeWindow(), orchestrator=FakeOrchestrator(frame))
+    speculative = SpeculativeRecognizer(app, recognition_handler=None)
+    speculative.running = True
+    speculative.latest = Verdict(result, time.monotonic() - age_ms / 1000.0, frame_signature(frame))
+    return app, speculative
+
+
+def test_fresh_verdict_for_the_same_scene():
+    frame = _frame(0)
+    _, speculative = _speculative(frame)
+    assert speculative.fresh_verdict(frame).result == ('alice', '100')
+    assert speculative.fresh_verdict().result == ('alice', '100')
+
+
+def test_stale_verdict_is_discarded():
+    frame = _frame(0)
+    _, speculative = _speculative(frame, age_ms=5000)
+    assert speculative.fresh_verdict(frame) is None
+
+
+def test_verdict_for_someone_else_is_discarded():
+    # A different person in front of the camera changes the frame signature
+    _, speculative = _speculative(_frame(0))
+    assert speculative.fresh_verdict(_frame(1)) is None
+
+
+def test_verdict_is_cleared_while_someone_is_logged_in():
+    app, speculative = _speculative(_frame(0))
+    app.current_user = 'alice'
+    speculative._perform_update()
+    assert speculative.latest is None
+    assert app.orchestrator.jobs == []
+
+
+@pytest.fixture
+def login():
+    pytest.importorskip('face_recognition')
+    import util
+    from LoginHandler import LoginHandler
+
+    def make(camera_frame, **verdict):
+        app, speculative = _speculative(_frame(0), **verdict)
+        app.orchestrator.frame = camera_frame
+        app.speculative_recognizer = speculative
+        app.logged_in_emp_ids = set()
+        app.attendance = []
+        app.event_journal = SimpleNamespace(log_attendance=lambda *args: app.attendance.append(args))
+        app.record_attendance = lambda *args, **kwargs: None
+        app.timer_manager = SimpleNamespace(start=lambda: None)
+        return app, LoginHandler(app, recognition_handler=None)
+
+    original = util.msg_box
+    util.msg_box = lambda *args: None
+    try:
+        yield make
+    finally:
+        util.msg_box = original
+
+
+def test_login_uses_fresh_verdict(login):
+    app, handler = login(_frame(0))
+    handler.login()
+    assert app.current_user == 'alice'
+    assert app.attendance == [('alice', '100', 'in')]
+    assert handler.time_to_welcome_ms['speculative']
+    assert app.orchestrator.jobs == []
+
+
+@pytest.mark.parametrize('camera_frame, verdict', [
+    (_frame(0), {'age_ms': 5000}),
+    (_frame(1), {}),
+    (_frame(0), {'result': ('unknown_person', None)}),
+])
+def test_login_recognizes_again_without_a_usable_verdict(login, camera_frame, verdict):
+    app, handler = login(camera_frame, **verdict)
+    handler.login()
+    assert app.current_user is None
+    assert [kind for kind, _, _ in app.orchestrator.jobs] == ['login']
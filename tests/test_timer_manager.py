@@ -0,0 +1,137 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('face_recognition')
+
+from LoadGovernor import LoadGovernor
+from RecognitionHandler import Verification
+from TimerManager import TimerManager
+from WorkScheduler import JobDropped
+
+
+class FakeWindow:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay_ms, callback):
+        self.scheduled.append((delay_ms, callback))
+        return len(self.scheduled)
+
+    def after_cancel(self, job_id):
+        pass
+
+
+class FakeOrchestrator:
+    QUEUED = 'queued'
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, kind, work, on_result, on_error=None):
+        self.jobs.append((kind, work, on_result, on_error))
+        return self.QUEUED
+
+
+def _timer_manager():
+    app = SimpleNamespace(current_user='alice', main_window=FakeWindow(), orchestrator=FakeOrchestrator(),
+                          load_governor=LoadGovernor())
+    manager = TimerManager(app, recognition_handler=None, users_file_path=None)
+    manager.debug_mode = False
+    return app, manager
+
+
+def test_dropped_presence_check_schedules_the_next_one():
+    app, manager = _timer_manager()
+    manager.start()
+    _, _, _, on_error = app.orchestrator.jobs[-1]
+
+    on_error(JobDropped('presence job missed its deadline'))
+
+    assert len(app.main_window.scheduled) == 1
+    assert app.load_governor.total_samples == 1
+    app.main_window.scheduled[0][1]()
+    assert len(app.orchestrator.jobs) == 2
+
+
+def test_dropped_check_from_a_stopped_session_does_not_reschedule():
+    app, manager = _timer_manager()
+    manager.start()
+    _, _, _, on_error = app.orchestrator.jobs[-1]
+    manager.stop()
+
+    on_error(JobDropped('presence job missed its deadline'))
+
+    assert app.main_window.scheduled == []
+
+
+class FakeRecognition:
+    def __init__(self):
+        self.box = (100, 300, 300, 100)
+        self.last_face_location = None
+
+    def verify(self, frame, identity, detection_scale=1.0):
+        self.last_face_location = (self.box, frame.shape, time.time())
+        return Verification('verified', identity, '7', 0.3, True)
+
+    def get_emp_id(self, name):
+        return '7'
+
+
+class FakeAntiSpoof:
+    def __init__(self):
+        self.calls = 0
+
+    def check_frame_authenticity(self, frame, max_models=None):
+        self.calls += 1
+        return {'is_authentic': True, 'confidence': 0.9, 'status': 'authentic', 'error': None}
+
+
+def _overloaded_manager():
+    app, manager = _timer_manager()
+    app.load_governor.level = 2  # skip_liveness
+    app.frame_selector = SimpleNamespace(pick=lambda frame: (frame, None))
+    app.anti_spoof_handler = FakeAntiSpoof()
+    manager.recognition = FakeRecognition()
+    manager._update_presence_ui = lambda result: None
+    manager.start()
+    return app, manager
+
+
+def _check(app, manager):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    result = manager._check_presence(frame, 'alice')
+    manager._apply_presence_result(result, manager.generation)
+    return result
+
+
+def test_liveness_is_reused_along_a_continuous_track():
+    app, manager = _overloaded_manager()
+    _check(app, manager)
+    manager.recognition.box = (105, 305, 305, 105)
+    result = _check(app, manager)
+
+    assert app.anti_spoof_handler.calls == 1
+    assert result['spoof_result']['status'] == 'authentic_reused'
+
+
+def test_liveness_is_checked_again_when_the_face_jumps():
+    app, manager = _overloaded_manager()
+    _check(app, manager)
+    manager.recognition.box = (100, 600, 300, 400)
+    result = _check(app, manager)
+
+    assert app.anti_spoof_handler.calls == 2
+    assert result['spoof_result']['status'] == 'authentic'
+
+
+def test_liveness_is_checked_again_after_a_dropped_check():
+    app, manager = _overloaded_manager()
+    _check(app, manager)
+    _, _, _, on_error = app.orchestrator.jobs[-1]
+    on_error(JobDropped('presence job missed its deadline'))
+    _check(app, manager)
+
+    assert app.anti_spoof_handler.calls == 2
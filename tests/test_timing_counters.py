@@ -0,0 +1,64 @@
+import datetime
+import time
+
+import timing_counters
+from AttendanceJournal import AttendanceJournal
+
+
+def _midnight():
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    return time.mktime(tomorrow.timetuple())
+
+
+def test_counters_reset_at_day_rollover(tmp_path):
+    journal = AttendanceJournal(str(tmp_path), flush_interval=0.05)
+    journal.recover()
+    timing_counters.attach_journal(journal)
+    journal.start()
+    try:
+        midnight = _midnight()
+        for t in range(-60, 0, 5):
+            timing_counters.update_attendance('alice', True, midnight + t)
+        assert timing_counters.get_user_timer_data('alice')['presentCounter'] == 55
+
+        for t in range(1, 40, 5):
+            timing_counters.update_attendance('alice', True, midnight + t)
+        live = timing_counters.get_user_timer_data('alice')
+        assert live['presentCounter'] == 35
+    finally:
+        journal.stop()
+        timing_counters.attach_journal(None)
+
+    # A process restarted on the new day recovers the same daily totals
+    AttendanceJournal(str(tmp_path)).recover(timing_counters.day_of(midnight + 1))
+    assert timing_counters.get_user_timer_data('alice') == live
+
+
+def _totals(timeline, times):
+    """Feed one observation per time; timeline(t) says whether the user was present in the interval ending at t"""
+    timers = {}
+    for t in times:
+        timing_counters.apply_observation(timers, 'alice', timeline(t), 1000.0 + t)
+    return timers['alice']['presentCounter'], timers['alice']['absentTimeCounter']
+
+
+def _absent_between(start, end):
+    return lambda t: not (start < t <= end)
+
+
+BURSTY = [0, 1, 2, 3, 60, 100, 101, 102, 149, 150, 151, 152, 200]
+
+
+def test_long_absence_totals_do_not_depend_on_sampling_rate():
+    timeline = _absent_between(100, 150)
+    expected = (150, 50)
+    assert _totals(timeline, range(0, 201, 5)) == expected
+    assert _totals(timeline, range(0, 201, 25)) == expected
+    assert _totals(timeline, range(0, 201, 50)) == expected
+    assert _totals(timeline, BURSTY) == expected
+
+
+def test_short_absence_is_forgiven_at_any_sampling_rate():
+    timeline = _absent_between(100, 120)
+    for times in (range(0, 201, 5), range(0, 201, 20), [0, 100, 101, 119, 120, 121, 200]):
+        assert _totals(timeline, times) == (200, 0)
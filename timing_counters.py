@@ -1,50 +1,122 @@
+import datetime
 import time
 
+# Absences shorter than this are forgiven and counted as present time
+ABSENCE_GRACE_SECONDS = 30
+
 # Dictionary to store timer values for each user
 userTimers = {}
 
+# Local date (YYYY-MM-DD) the counters in userTimers belong to
+current_day = None
+
+
+# Optional AttendanceJournal that persists every applied observation
+_journal = None
+
+
+def attach_journal(journal):
+    global _journal
+    _journal = journal
+
+
+def day_of(timestamp):
+    """Local date of an observation; counters (and the journal) start over on every new day"""
+    return datetime.date.fromtimestamp(timestamp).isoformat()
+
+
+def set_current_day(day):
+    """Start a new day: the counters are cleared whenever the day changes (see AttendanceJournal)"""
+    global current_day
+    if day != current_day:
+        userTimers.clear()
+        current_day = day
+
+
 # Called when a user is recognized or not
-def update_attendance(user_id, is_present):
-    if user_id not in userTimers:
-        userTimers[user_id] = {
+def update_attendance(user_id, is_present, timestamp=None):
+    """
+    Credit the time elapsed since the previous observation of user_id.
+
+    Accounting is event-time based: each observation carries a timestamp
+    (defaults to now) and the interval since the previous one is credited
+    to the state seen in this observation. Nothing depends on how often we
+    are called, so sparse or bursty sampling gives the same totals as a
+    steady 5 s poll. Observations older than the last one applied are ignored.
+
+    - present: the interval is added to presentCounter; a pending absence
+      shorter than ABSENCE_GRACE_SECONDS is forgiven and added back as well,
+      and the absence ends
+    - absent: the interval extends the current absence (absentCounter); once
+      it reaches ABSENCE_GRACE_SECONDS all of it is missed time
+      (absentTimeCounter), and so is the rest of it until the user is seen
+      again - none of a confirmed absence is ever forgiven
+
+    Counters are daily: the first observation of a new day clears them, at
+    the same point where AttendanceJournal starts a new journal file.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    set_current_day(day_of(timestamp))
+
+    if apply_observation(userTimers, user_id, is_present, timestamp) and _journal is not None:
+        _journal.append(user_id, is_present, timestamp)
+
+
+def apply_observation(timers_by_user, user_id, is_present, timestamp):
+    """
+    Apply one observation to a userTimers-style dict.
+    Returns False if the observation was out of order and ignored.
+    """
+    if user_id not in timers_by_user:
+        # First observation only establishes the start of the interval
+        timers_by_user[user_id] = {
             'presentCounter': 0,
             'absentCounter': 0,
             'absentTimeCounter': 0,
-            'lastUpdateTime': time.time()
+            'lastUpdateTime': timestamp
         }
+        return True
 
-    currentTime = time.time()
-    elapsedTime = currentTime - userTimers[user_id]['lastUpdateTime']
+    timers = timers_by_user[user_id]
+    elapsedTime = timestamp - timers['lastUpdateTime']
+    if elapsedTime <= 0:
+        # Out-of-order or duplicate observation
+        return False
 
-    # Only update every 5 seconds
-    if elapsedTime >= 5:
-        timers = userTimers[user_id]
+    if is_present:
+        # If user was absent for less than the grace period, add that back to present time
+        if 0 < timers['absentCounter'] < ABSENCE_GRACE_SECONDS:
+            timers['presentCounter'] += timers['absentCounter']
+        timers['presentCounter'] += elapsedTime
+        # Reset absence counter
+        timers['absentCounter'] = 0
+    else:
+        # Accumulate absence; the run stays open until the user is seen again
+        confirmed = timers['absentCounter'] >= ABSENCE_GRACE_SECONDS
+        timers['absentCounter'] += elapsedTime
+        if confirmed:
+            # Already missed time, so is the rest of this absence
+            timers['absentTimeCounter'] += elapsedTime
+        elif timers['absentCounter'] >= ABSENCE_GRACE_SECONDS:
+            # Absence reaches the grace period: count all of it as missed time
+            timers['absentTimeCounter'] += timers['absentCounter']
 
-        if is_present:
-            # If user was absent for < 30s, add that back to present time
-            if 0 < timers['absentCounter'] < 30:
-                timers['presentCounter'] += timers['absentCounter']
-            # Add the current 5 seconds of presence
-            timers['presentCounter'] += 5
-            # Reset absence counter
-            timers['absentCounter'] = 0
-        else:
-            # Accumulate absence
-            timers['absentCounter'] += 5
-            # If absence reaches 30s, count it as missed time
-            if timers['absentCounter'] >= 30:
-                timers['absentTimeCounter'] += 30
-                timers['absentCounter'] = 0  # reset
-
-        timers['lastUpdateTime'] = currentTime
+    timers['lastUpdateTime'] = timestamp
+    return True
 
 
 # Get user timer data for UI display
 def get_user_timer_data(user_id):
     if user_id in userTimers:
-        return userTimers[user_id]
+        timers = userTimers[user_id]
+        return {
+            'presentCounter': int(timers['presentCounter']),
+            'absentCounter': int(timers['absentCounter']),
+            'absentTimeCounter': int(timers['absentTimeCounter'])
+        }
     return {
         'presentCounter': 0,
         'absentCounter': 0,
         'absentTimeCounter': 0
-    }
\ No newline at end of file
+    }
@@ -1,11 +1,8 @@
-import os
-import json
 import tkinter as tk
 from tkinter import messagebox
 import face_recognition
 import cv2
 import numpy as np
-import pickle
 
 
 def match_face(current_encoding, known_encodings, known_names, tolerance=0.40):
@@ -21,16 +18,6 @@ def match_face(current_encoding, known_encodings, known_names, tolerance=0.40):
         return "Unknown"
 
 
-def match_face_multi(current_encoding, multi_encodings_dict, tolerance=0.62):
-    for name, encodings in multi_encodings_dict.items():
-        if not encodings:
-            continue
-        matches = face_recognition.compare_faces(encodings, current_encoding, tolerance)
-        if any(matches):
-            return name
-    return "Unknown"
-
-
 def get_button(window, text, color, command, fg='white'):
     return tk.Button(
         window, text=text, fg=fg, bg=color,
@@ -58,135 +45,85 @@ def msg_box(title, description):
     messagebox.showinfo(title, description)
 
 
-def recognize(frame, db_dir, known_encodings=None, known_names=None, use_multi_encodings=False):
+def detect_faces(rgb_frame, detection_scale=1.0):
     """
-    Enhanced face recognition with proper error handling
+    Face boxes in rgb_frame. With detection_scale < 1 the detector runs on a
+    downscaled copy (much cheaper) and the boxes are mapped back to full size,
+    so encodings are still computed from the full-resolution pixels.
     """
+    if detection_scale >= 1.0:
+        return face_recognition.face_locations(rgb_frame)
+    small = cv2.resize(rgb_frame, (0, 0), fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_AREA)
+    height, width = rgb_frame.shape[:2]
+    return [(max(0, int(top / detection_scale)), min(width, int(right / detection_scale)),
+             min(height, int(bottom / detection_scale)), max(0, int(left / detection_scale)))
+            for top, right, bottom, left in face_recognition.face_locations(small)]
+
+
+def encode_single_face(frame, on_face=None, detection_scale=1.0):
+    """
+    Detect and encode the one face in front of the camera.
+    Returns (None, encoding) or (status, None) with status
+    'no_persons_found' / 'multiple_faces_detected'.
+    on_face(location, frame_shape) is called with the detected face box.
+    """
+    if frame is None:
+        return 'no_persons_found', None
+
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
+    face_locations = detect_faces(rgb_frame, detection_scale)
 
     if len(face_locations) == 0:
         return 'no_persons_found', None
     if len(face_locations) > 1:
         return 'multiple_faces_detected', None
+    if on_face is not None:
+        on_face(face_locations[0], frame.shape)
 
     face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
     if not face_encodings:
         return 'no_persons_found', None
 
-    encoding = face_encodings[0]
-
-    if use_multi_encodings:
-        # Load multi-encodings for better accuracy during timer checks
-        multi_encodings_dict = {}
-
-        for user in os.listdir(db_dir):
-            user_path = os.path.join(db_dir, user)
-            if not os.path.isdir(user_path):
-                continue
-
-            # Load multi_encodings.pkl (contains 5 poses)
-            multi_path = os.path.join(user_path, 'multi_encodings.pkl')
-            if os.path.exists(multi_path):
-                try:
-                    with open(multi_path, 'rb') as f:
-                        encodings = pickle.load(f)
-                        multi_encodings_dict[user] = encodings
-                except:
-                    pass
-
-        # Find match using multi encodings
-        matched_user = match_face_multi(encoding, multi_encodings_dict, tolerance=0.62)
-
-        if matched_user != "Unknown":
-            # Get emp_id
-            users_file = os.path.join(db_dir, 'users.json')
-            try:
-                with open(users_file, 'r') as f:
-                    users_data = json.load(f)
-                emp_id = users_data.get(matched_user, "N/A")
-            except:
-                emp_id = "N/A"
-            return matched_user, emp_id
-        else:
-            return 'unknown_person', None
+    return None, face_encodings[0]
 
-    else:
-        # Original single encoding logic for login/logout - FIXED
-        if not known_encodings or not known_names:
-            return 'unknown_person', None
-
-        # Ensure both lists have the same length
-        if len(known_encodings) != len(known_names):
-            print(f"Warning: Mismatch between encodings ({len(known_encodings)}) and names ({len(known_names)})")
-            return 'unknown_person', None
-
-        matches = face_recognition.compare_faces(known_encodings, encoding, tolerance=0.41)
-
-        if not any(matches):
-            return 'unknown_person', None
-
-        # Find the first True match
-        try:
-            matched_idx = matches.index(True)
-            matched_user = known_names[matched_idx]
-
-            # Get emp_id
-            users_file = os.path.join(db_dir, 'users.json')
-            try:
-                with open(users_file, 'r') as f:
-                    users_data = json.load(f)
-                emp_id = users_data.get(matched_user, "N/A")
-            except:
-                emp_id = "N/A"
-            return matched_user, emp_id
-        except (ValueError, IndexError) as e:
-            print(f"Error finding match: {e}")
-            return 'unknown_person', None
-
-
-def load_known_faces(db_path):
+
+def encode_all_faces(frame, detection_scale=1.0):
+    """Encodings of every face in the frame (CCTV mode)"""
+    if frame is None:
+        return []
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    face_locations = detect_faces(rgb_frame, detection_scale)
+    if not face_locations:
+        return []
+    return face_recognition.face_encodings(rgb_frame, face_locations)
+
+
+def encode_faces_batch(rgb_frames, face_locations):
     """
-    Enhanced to load both average and multi encodings with proper error handling
+    One encoding per (frame, face location), e.g. the five registration poses.
+    Uses dlib's batched descriptor call when available and falls back to one
+    face_encodings() call per frame. Both paths align faces with the 5-point
+    landmark model, like face_encodings() does for login and presence checks,
+    so enrolled and live encodings are comparable.
     """
-    known_avg_encodings = []
-    known_names = []
-    multi_encodings_dict = {}
-
-    if not os.path.exists(db_path):
-        print(f"Database path {db_path} does not exist")
-        return known_avg_encodings, known_names, multi_encodings_dict
-
-    for user_folder in os.listdir(db_path):
-        user_path = os.path.join(db_path, user_folder)
-        if not os.path.isdir(user_path):
-            continue
-
-        # Load average encoding (for login/logout)
-        encoding_path = os.path.join(user_path, 'avg_encoding.pkl')
-        if os.path.exists(encoding_path):
-            try:
-                with open(encoding_path, 'rb') as f:
-                    avg_encoding = pickle.load(f)
-                    known_avg_encodings.append(avg_encoding)
-                    known_names.append(user_folder)
-                    print(f"Loaded average encoding for user: {user_folder}")
-            except Exception as e:
-                print(f"Error loading average encoding for {user_folder}: {e}")
-
-        # Load multi-encodings (for timer accuracy)
-        multi_path = os.path.join(user_path, 'multi_encodings.pkl')
-        if os.path.exists(multi_path):
-            try:
-                with open(multi_path, 'rb') as f:
-                    multi_encodings = pickle.load(f)
-                    multi_encodings_dict[user_folder] = multi_encodings
-                    print(f"Loaded {len(multi_encodings)} multi-encodings for user: {user_folder}")
-            except Exception as e:
-                print(f"Error loading multi-encodings for {user_folder}: {e}")
-
-    print(f"Total users loaded: {len(known_names)}")
-    print(f"Average encodings: {len(known_avg_encodings)}")
-    print(f"Multi-encodings dict: {len(multi_encodings_dict)}")
-
-    return known_avg_encodings, known_names, multi_encodings_dict
\ No newline at end of file
+    if not rgb_frames:
+        return []
+    try:
+        import dlib
+        from face_recognition import api
+        shapes = []
+        for frame, (top, right, bottom, left) in zip(rgb_frames, face_locations):
+            detections = dlib.full_object_detections()
+            detections.append(api.pose_predictor_5_point(frame, dlib.rectangle(left, top, right, bottom)))
+            shapes.append(detections)
+        batches = api.face_encoder.compute_face_descriptor(list(rgb_frames), shapes, 1)
+        return [np.array(batch[0]) for batch in batches]
+    except (ImportError, AttributeError, TypeError) as e:
+        # No dlib, or a dlib build without the batched overload
+        print(f"Batched encoding unavailable, encoding frames one by one: {e}")
+    encodings = []
+    for frame, location in zip(rgb_frames, face_locations):
+        found = face_recognition.face_encodings(frame, [location])
+        if found:
+            encodings.append(found[0])
+    return encodings